@@ -1,8 +1,43 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import hmac
+import math
+import os
+import threading
+import time
+from typing import Optional
+from fastapi import Depends, FastAPI, HTTPException, Path, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from helper import get_conversation_history, process_chat_message
-from models import ChatRequest, ChatResponse, ResumeRequest
-from graph import check_for_interruption, graph
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from batch import run_batch
+from breakers import circuit_breakers
+from cassettes import cassettes
+from export import conversation_exporter, pq
+from helper import (
+    get_conversation_history, get_failed_turn, get_turn_usage, process_chat_message, resume_failed_turn,
+    stream_chat_message, update_thread_registry,
+)
+from models import (
+    BatchChatRequest, BulkResumeRequest, BulkResumeResponse, CassetteConfig, ChatRequest, ChatResponse,
+    ConversationResponse, GuestImportRequest, InterruptListResponse, JobResponse, ProfilingConfig, ResumeRequest,
+    TenantResponse, ThreadListResponse,
+)
+from graph import check_for_interruption, graph, replay_cassette, router, turn_config
+from drafting import invitation_drafter
+from inbox import interrupt_inbox
+from loops import loop_guard
+from retries import node_retries
+from intents import intent_router
+from jobs import job_manager
+from limits import rate_limiter, thread_budget
+from profiling import folded, request_profiler
+from registry import thread_registry
+from speculation import speculative_retrieval
+from tenants import TENANT_PATTERN, tenant_indexes
+from serialization import CompressionMiddleware, FastJSONResponse, dumps
+from config import (
+    ADMIN_OPEN, ADMIN_TOKEN, API_KEYS, BATCH_MAX_ITEMS, COMPRESS_MIN_SIZE, DEFAULT_TENANT, INBOX_POLL_INTERVAL,
+    PRELOAD_RETRIEVER,
+)
 
 
 
@@ -15,15 +50,107 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Profile-Id", "X-Export-Watermark"],
 )
+if COMPRESS_MIN_SIZE:
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_SIZE)
+
+
+def client_key(request: Request) -> str:
+    """Identify the caller by a configured API key, falling back to client IP."""
+    api_key = request.headers.get("X-API-Key")
+    if api_key and api_key in API_KEYS:
+        return f"key:{api_key}"
+    # An unknown key would let a caller get a fresh bucket per request by changing it.
+    return request.client.host if request.client else "unknown"
+
+def enforce_rate_limit(request: Request):
+    """Reject the request with 429 when the client's token bucket is empty."""
+    allowed, retry_after = rate_limiter.acquire(client_key(request))
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded. Please slow down.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+def enforce_thread_budget(thread_id: str):
+    """Reject the request with 429 when the thread has used up its token or tool-call budget."""
+    reason = thread_budget.check(thread_id)
+    if reason:
+        raise HTTPException(status_code=429, detail=reason)
+
+
+def is_admin(request: Request) -> bool:
+    """True when the request carries ADMIN_TOKEN; with no token configured, only if ADMIN_OPEN is set."""
+    if not ADMIN_TOKEN:
+        return ADMIN_OPEN
+    return hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN)
+
+def require_admin(request: Request):
+    """Reject /admin requests without the admin token."""
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+async def profile_request(request: Request, response: Response):
+    """Profile this request when it sends `X-Profile: 1` (admin only) or is sampled."""
+    forced = request.headers.get("X-Profile") == "1" and is_admin(request)
+    if not request_profiler.should_profile(forced):
+        yield
+        return
+    sampler = request_profiler.start()
+    response.headers["X-Profile-Id"] = sampler.profile_id
+    try:
+        yield
+    finally:
+        request_profiler.finish(sampler, request.url.path)
+
+
+@app.on_event("startup")
+async def recover_jobs():
+    """Start job leases and re-queue jobs left unfinished by a stopped worker."""
+    job_manager.start()
+
+@app.on_event("startup")
+async def preload_retriever():
+    """Warm up the retriever off the request path so startup stays fast."""
+    if PRELOAD_RETRIEVER:
+        threading.Thread(target=_load_retriever, name="retriever-preload", daemon=True).start()
+
+def _load_retriever():
+    try:
+        from retriver import get_retriever
+        get_retriever()
+    except Exception as e:
+        print(f"Error preloading retriever: {e}")
 
 
 @app.get("/")
 async def root():
-    """Health check endpoint."""
-    return {"message": "Party Planning Chatbot API is running!", "status": "healthy"}
+    """Health check endpoint; "degraded" while any dependency's circuit breaker is not closed."""
+    dependencies = {name: b["state"] for name, b in circuit_breakers.snapshot().items()}
+    return {
+        "message": "Party Planning Chatbot API is running!",
+        "status": "healthy" if all(state == "closed" for state in dependencies.values()) else "degraded",
+        "dependencies": dependencies,
+    }
 
-@app.post("/chat", response_model=ChatResponse)
+@app.get("/metrics")
+async def get_metrics():
+    """Per-tier model counters, fast-path and speculation hit rates, agent loop stops, node retries, invitation fan-outs, tenant index pool, exports and circuit breakers."""
+    return FastJSONResponse({
+        "model_tiers": router.get_stats(),
+        "intent_fast_path": intent_router.get_stats(),
+        "agent_loops": loop_guard.get_stats(),
+        "node_retries": node_retries.get_stats(),
+        "invitation_drafts": invitation_drafter.get_stats(),
+        "speculative_retrieval": speculative_retrieval.get_stats(),
+        "tenant_indexes": tenant_indexes.get_stats(),
+        "exports": conversation_exporter.get_stats(),
+        "circuit_breakers": circuit_breakers.snapshot(),
+    })
+
+@app.post("/chat", response_model=ChatResponse, dependencies=[Depends(enforce_rate_limit), Depends(profile_request)])
 async def chat_endpoint(request: ChatRequest):
     """
     Main chat endpoint for processing user messages.
@@ -34,24 +161,55 @@ async def chat_endpoint(request: ChatRequest):
     Returns:
         ChatResponse with the assistant's response and conversation history
     """
+    enforce_thread_budget(request.thread_id)
     try:
         # Process the chat message
-        response_text, status = process_chat_message(request.message, request.thread_id)
+        response_text, status = process_chat_message(request.message, request.thread_id, request.tenant)
         
         # Get conversation history
         history = get_conversation_history(request.thread_id)
+        usage = get_turn_usage(request.thread_id)
+        thread_budget.record(request.thread_id, usage)
+        update_thread_registry(request.thread_id, request.owner)
         
         return ChatResponse(
             response=response_text,
             thread_id=request.thread_id,
             status=status,
-            conversation_history=history
+            conversation_history=history,
+            usage=usage
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
-@app.post("/resume")
+@app.post("/chat/stream", dependencies=[Depends(enforce_rate_limit)])
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Chat turn streamed as JSON lines.
+    
+    Args:
+        request: ChatRequest containing message and optional thread_id
+        
+    Returns:
+        application/x-ndjson stream: when the turn drafts invitations for
+        everyone, one `draft` event per guest as each draft finishes; then a
+        `response` event with the response, status and usage
+    """
+    enforce_thread_budget(request.thread_id)
+
+    def lines():
+        for event in stream_chat_message(request.message, request.thread_id, request.tenant):
+            if event["event"] == "response":
+                usage = get_turn_usage(request.thread_id)
+                thread_budget.record(request.thread_id, usage)
+                update_thread_registry(request.thread_id, request.owner)
+                event = {**event, "thread_id": request.thread_id, "usage": usage}
+            yield dumps(event) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/resume", response_model=ChatResponse, dependencies=[Depends(enforce_rate_limit), Depends(profile_request)])
 async def resume_endpoint(request: ResumeRequest):
     """
     Resume conversation after human-in-the-loop interruption.
@@ -62,6 +220,7 @@ async def resume_endpoint(request: ResumeRequest):
     Returns:
         ChatResponse with the continued conversation
     """
+    enforce_thread_budget(request.thread_id)
     try:
         # Check if there's actually an interruption to resume
         if not check_for_interruption(request.thread_id):
@@ -72,7 +231,7 @@ async def resume_endpoint(request: ResumeRequest):
         from langgraph.types import Command
         
         human_command = Command(resume={"data": request.response_data})
-        events = list(graph.stream(human_command, config, stream_mode="values"))
+        events = list(graph.stream(human_command, turn_config(config, human_command), stream_mode="values"))
         
         # Get the final response
         final_state = graph.get_state(config)
@@ -85,12 +244,16 @@ async def resume_endpoint(request: ResumeRequest):
         
         # Get updated conversation history
         history = get_conversation_history(request.thread_id)
+        usage = get_turn_usage(request.thread_id)
+        thread_budget.record(request.thread_id, usage)
+        update_thread_registry(request.thread_id)
         
         return ChatResponse(
             response=response_text,
             thread_id=request.thread_id,
             status="completed",
-            conversation_history=history
+            conversation_history=history,
+            usage=usage
         )
         
     except HTTPException:
@@ -98,7 +261,386 @@ async def resume_endpoint(request: ResumeRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error resuming conversation: {str(e)}")
 
-@app.get("/conversation/{thread_id}")
+@app.post("/retry/{thread_id}", response_model=ChatResponse,
+          dependencies=[Depends(enforce_rate_limit), Depends(profile_request)])
+async def retry_endpoint(thread_id: str):
+    """
+    Finish a turn that failed part-way, from its last successful checkpoint.
+    
+    Args:
+        thread_id: Thread whose latest turn failed
+        
+    Returns:
+        ChatResponse for the finished turn; model and tool calls that had
+        already succeeded aren't repeated
+    """
+    enforce_thread_budget(thread_id)
+    try:
+        result = resume_failed_turn(thread_id)
+        if result is None:
+            raise HTTPException(status_code=400, detail="No failed turn to retry")
+        response_text, status = result
+        
+        history = get_conversation_history(thread_id)
+        usage = get_turn_usage(thread_id)
+        thread_budget.record(thread_id, usage)
+        update_thread_registry(thread_id)
+        
+        return ChatResponse(
+            response=response_text,
+            thread_id=thread_id,
+            status=status,
+            conversation_history=history,
+            usage=usage
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrying turn: {str(e)}")
+
+@app.post("/chat/batch", dependencies=[Depends(enforce_rate_limit)])
+async def chat_batch_endpoint(request: BatchChatRequest):
+    """
+    Run many chat turns concurrently and stream the results as JSON lines.
+    
+    Args:
+        request: BatchChatRequest with (thread_id, message) items. Items for the
+            same thread run in order; different threads run in parallel.
+        
+    Returns:
+        application/x-ndjson stream with one result per item, in completion order
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch has no items")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch is limited to {BATCH_MAX_ITEMS} items")
+
+    items = [(item.thread_id, item.message) for item in request.items]
+    lines = (dumps(result) + b"\n" for result in run_batch(items, request.owner, request.tenant))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@app.post("/chat/jobs", response_model=JobResponse, status_code=202, dependencies=[Depends(enforce_rate_limit)])
+async def create_chat_job(request: ChatRequest):
+    """
+    Queue a chat turn to run in the background.
+    
+    Args:
+        request: ChatRequest containing message and optional thread_id
+        
+    Returns:
+        JobResponse with the job id to poll
+    """
+    enforce_thread_budget(request.thread_id)
+    return job_manager.submit("chat", request.thread_id, request.message, request.owner, request.tenant)
+
+@app.post("/resume/jobs", response_model=JobResponse, status_code=202, dependencies=[Depends(enforce_rate_limit)])
+async def create_resume_job(request: ResumeRequest):
+    """
+    Queue a resume after human-in-the-loop interruption.
+    
+    Args:
+        request: ResumeRequest containing response_data and thread_id
+        
+    Returns:
+        JobResponse with the job id to poll
+    """
+    enforce_thread_budget(request.thread_id)
+    if not check_for_interruption(request.thread_id):
+        raise HTTPException(status_code=400, detail="No interruption to resume")
+    return job_manager.submit("resume", request.thread_id, request.response_data)
+
+@app.get("/chat/jobs/{job_id}", response_model=JobResponse)
+async def get_chat_job(job_id: str):
+    """
+    Get status and, once completed, the result of a background job.
+    
+    Args:
+        job_id: Job ID returned by /chat/jobs
+        
+    Returns:
+        JobResponse
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/chat/jobs/{job_id}/cancel", response_model=JobResponse)
+async def cancel_chat_job(job_id: str):
+    """
+    Cancel a background job, stopping its graph run.
+    
+    Args:
+        job_id: Job ID returned by /chat/jobs
+        
+    Returns:
+        JobResponse
+    """
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/threads", response_model=ThreadListResponse)
+async def list_threads(
+    owner: Optional[str] = None,
+    status: Optional[str] = None,
+    active_since: Optional[float] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """
+    List threads from the thread registry, most recently active first.
+    
+    Args:
+        owner: Only threads of this owner
+        status: "waiting_for_input" or "ready"
+        active_since: Only threads active at or after this Unix timestamp
+        limit: Page size
+        offset: Number of threads to skip
+        
+    Returns:
+        ThreadListResponse with the page and the offset of the next page
+    """
+    if status not in (None, "waiting_for_input", "ready"):
+        raise HTTPException(status_code=400, detail="status must be 'waiting_for_input' or 'ready'")
+    interrupted = None if status is None else status == "waiting_for_input"
+    threads = thread_registry.list(owner, interrupted, active_since, limit, offset)
+    return ThreadListResponse(
+        threads=threads,
+        next_offset=offset + limit if len(threads) == limit else None
+    )
+
+@app.get("/interrupts", response_model=InterruptListResponse)
+async def list_interrupts(
+    owner: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """
+    List threads waiting for human input across all threads, oldest first.
+    
+    Args:
+        owner: Only interrupts on this owner's threads
+        limit: Page size
+        offset: Number of interrupts to skip
+        
+    Returns:
+        InterruptListResponse with each thread's query and age
+    """
+    interrupts = interrupt_inbox.list(owner, limit, offset)
+    return InterruptListResponse(
+        interrupts=interrupts,
+        next_offset=offset + limit if len(interrupts) == limit else None
+    )
+
+@app.get("/interrupts/stream")
+async def stream_interrupts(request: Request):
+    """
+    Server-sent events feed of the interrupt inbox.
+    
+    Starts with an `interrupt` event per pending interrupt, then sends
+    `interrupt` and `resolved` events as threads stop and are resumed.
+    Reconnecting clients send Last-Event-ID to continue where they left off.
+    
+    Returns:
+        text/event-stream response
+    """
+    last_event_id = request.headers.get("Last-Event-ID")
+
+    async def events():
+        if last_event_id and last_event_id.isdigit():
+            seq = int(last_event_id)
+        else:
+            seq = interrupt_inbox.last_seq()
+            for entry in interrupt_inbox.list(limit=10_000):
+                yield _sse(seq, "interrupt", entry)
+        idle = 0.0
+        while not await request.is_disconnected():
+            changes = interrupt_inbox.events_since(seq)
+            for seq, kind, data in changes:
+                yield _sse(seq, kind, data)
+            idle = 0.0 if changes else idle + INBOX_POLL_INTERVAL
+            if idle >= 15:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(INBOX_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def _sse(seq: int, kind: str, data: dict) -> str:
+    return f"id: {seq}\nevent: {kind}\ndata: {dumps(data).decode()}\n\n"
+
+@app.post("/interrupts/resume", response_model=BulkResumeResponse, status_code=202, dependencies=[Depends(enforce_rate_limit)])
+async def bulk_resume(request: BulkResumeRequest):
+    """
+    Answer many pending interrupts at once.
+    
+    Args:
+        request: BulkResumeRequest with one (thread_id, response_data) per thread
+        
+    Returns:
+        BulkResumeResponse with a background job per resumed thread, and the
+        threads that could not be resumed
+    """
+    jobs, errors, seen = [], [], set()
+    for item in request.items:
+        if item.thread_id in seen:
+            errors.append({"thread_id": item.thread_id, "error": "Duplicate thread in request"})
+            continue
+        seen.add(item.thread_id)
+        reason = thread_budget.check(item.thread_id)
+        if reason:
+            errors.append({"thread_id": item.thread_id, "error": reason})
+        elif not check_for_interruption(item.thread_id):
+            errors.append({"thread_id": item.thread_id, "error": "No interruption to resume"})
+        else:
+            jobs.append(job_manager.submit("resume", item.thread_id, item.response_data))
+    return BulkResumeResponse(jobs=jobs, errors=errors)
+
+@app.post("/tenants/{tenant}/guests", response_model=TenantResponse, status_code=202,
+          dependencies=[Depends(enforce_rate_limit)])
+async def import_guests(request: GuestImportRequest, tenant: str = Path(..., pattern=TENANT_PATTERN)):
+    """
+    Add guests to a host's guest list in the background.
+    
+    Args:
+        request: GuestImportRequest with the guest records
+        tenant: Host whose list to add to (chat requests select it with `tenant`)
+        
+    Returns:
+        TenantResponse with the ingestion status to poll
+    """
+    if tenant == DEFAULT_TENANT:
+        raise HTTPException(status_code=400, detail="The default guest list comes from the invitee dataset")
+    ingestion = tenant_indexes.submit_ingest(tenant, [guest.model_dump() for guest in request.guests])
+    return TenantResponse(tenant=tenant, open=tenant_indexes.is_open(tenant), ingestion=ingestion)
+
+@app.get("/tenants/{tenant}", response_model=TenantResponse)
+async def get_tenant(tenant: str = Path(..., pattern=TENANT_PATTERN)):
+    """Whether a host's guest index is open and the status of its latest guest import."""
+    return TenantResponse(tenant=tenant, open=tenant_indexes.is_open(tenant), ingestion=tenant_indexes.ingestion(tenant))
+
+@app.get("/admin/profiling", dependencies=[Depends(require_admin)])
+async def get_profiling():
+    """Current request-profiling settings."""
+    return request_profiler.settings()
+
+@app.post("/admin/profiling", dependencies=[Depends(require_admin)])
+async def configure_profiling(config: ProfilingConfig):
+    """
+    Switch sampled profiling of /chat and /resume on or off.
+    
+    Args:
+        config: enabled, sample_rate (share of requests profiled), interval_ms
+            (stack sampling interval) and max_profiles (ring buffer size)
+        
+    Returns:
+        The updated settings
+    """
+    return request_profiler.configure(**config.model_dump())
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Summaries of the most recent request profiles, newest first."""
+    return FastJSONResponse({"profiles": request_profiler.list()})
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str, format: str = Query("folded", pattern="^(folded|json)$")):
+    """
+    Get one request profile.
+    
+    Args:
+        profile_id: Id from /admin/profiles or the X-Profile-Id response header
+        format: "folded" stacks for flamegraph.pl / speedscope, or "json"
+        
+    Returns:
+        The profile
+    """
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        return PlainTextResponse(folded(profile))
+    return FastJSONResponse({**profile, "stacks": dict(profile["stacks"])})
+
+@app.get("/admin/cassettes", dependencies=[Depends(require_admin)])
+async def list_cassettes():
+    """Current cassette mode and the recorded cassettes."""
+    return FastJSONResponse({**cassettes.settings(), "cassettes": cassettes.list()})
+
+@app.post("/admin/cassettes", dependencies=[Depends(require_admin)])
+async def configure_cassettes(config: CassetteConfig):
+    """
+    Switch cassette recording or replay of model, Tavily and MCP calls.
+    
+    Args:
+        config: mode ("off", "record" or "replay") and simulate_latency
+            (sleep for each call's recorded latency when replaying)
+        
+    Returns:
+        The updated settings
+    """
+    return cassettes.configure(**config.model_dump())
+
+@app.get("/admin/cassettes/{thread_id}", dependencies=[Depends(require_admin)])
+async def download_cassette(thread_id: str):
+    """Download a thread's cassette (gzipped JSONL) for replay elsewhere."""
+    path = cassettes.path(thread_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Cassette not found")
+    return FileResponse(path, media_type="application/gzip", filename=os.path.basename(path))
+
+@app.post("/admin/cassettes/{thread_id}/replay", dependencies=[Depends(require_admin)])
+def replay_thread(thread_id: str, simulate_latency: bool = False):
+    """
+    Replay a recorded thread into a new thread without live calls.
+    
+    Args:
+        thread_id: Recorded thread to replay
+        simulate_latency: Sleep for each call's recorded latency
+        
+    Returns:
+        Per-turn latencies of the replay next to the recorded ones
+    """
+    if not os.path.exists(cassettes.path(thread_id)):
+        raise HTTPException(status_code=404, detail="Cassette not found")
+    return FastJSONResponse(replay_cassette(thread_id, simulate_latency=simulate_latency))
+
+@app.get("/admin/export", dependencies=[Depends(require_admin)])
+async def export_conversations(
+    kind: str = Query("messages", pattern="^(messages|guests)$"),
+    format: str = Query("jsonl", pattern="^(jsonl|parquet)$"),
+    since: Optional[float] = None,
+):
+    """
+    Stream all threads' messages, or the guests each thread looked up, as JSONL or Parquet.
+    
+    Args:
+        kind: "messages" or "guests"
+        format: "jsonl" or "parquet"
+        since: Watermark of the previous export; only what changed after it is exported
+        
+    Returns:
+        The export as a stream; the X-Export-Watermark header is the `since` for the next one
+    """
+    if format == "parquet" and pq is None:
+        raise HTTPException(status_code=400, detail="Parquet export needs pyarrow; use format=jsonl")
+    until = time.time()
+    headers = {
+        "X-Export-Watermark": repr(until),
+        "Content-Disposition": f'attachment; filename="{kind}-{int(until)}.{format}"',
+    }
+    if format == "parquet":
+        # Row groups are already zstd-compressed; keep the compression middleware off them.
+        headers["Content-Encoding"] = "identity"
+    media_type = "application/x-ndjson" if format == "jsonl" else "application/vnd.apache.parquet"
+    # A sync iterator: Starlette pulls each chunk in its thread pool, off the event loop.
+    chunks = conversation_exporter.stream(kind, format, since, until)
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+@app.get("/conversation/{thread_id}", response_model=ConversationResponse)
 async def get_conversation(thread_id: str, max_messages: int = 10):
     """
     Get conversation history for a specific thread.
@@ -112,18 +654,14 @@ async def get_conversation(thread_id: str, max_messages: int = 10):
     """
     try:
         history = get_conversation_history(thread_id, max_messages)
-        return {
-            "thread_id": thread_id,
-            "conversation_history": history,
-            "message_count": len(history)
-        }
+        return ConversationResponse(thread_id=thread_id, conversation_history=history, message_count=len(history))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving conversation: {str(e)}")
 
 @app.get("/status/{thread_id}")
 async def get_thread_status(thread_id: str):
     """
-    Check if a thread is waiting for human input.
+    Check if a thread is waiting for human input or has a failed turn to retry.
     
     Args:
         thread_id: Thread ID to check
@@ -133,14 +671,22 @@ async def get_thread_status(thread_id: str):
     """
     try:
         is_waiting = check_for_interruption(thread_id)
+        pending = interrupt_inbox.get(thread_id) if is_waiting else None
+        failed = None if is_waiting else get_failed_turn(thread_id)
         return {
             "thread_id": thread_id,
             "waiting_for_input": is_waiting,
-            "status": "waiting_for_input" if is_waiting else "ready"
+            "status": "waiting_for_input" if is_waiting else "failed" if failed else "ready",
+            "query": pending["query"] if pending else None,
+            "failed_node": failed["node"] if failed else None,
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error checking thread status: {str(e)}")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    from config import API_WORKERS, CHECKPOINT_DB
+
+    if API_WORKERS > 1 and not CHECKPOINT_DB:
+        raise SystemExit("WEB_CONCURRENCY > 1 needs CHECKPOINT_DB so workers share thread state")
+    uvicorn.run("api:app", host="0.0.0.0", port=8000, workers=API_WORKERS)
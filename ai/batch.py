@@ -0,0 +1,122 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import BATCH_WORKERS
+from helper import get_turn_usage, process_chat_message, update_thread_registry
+from limits import thread_budget
+
+
+# One pool for all batches, so concurrent batch requests share the bound.
+_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="chat-batch")
+
+
+def run_batch(items: List[Tuple[str, str]], owner: Optional[str] = None,
+              tenant: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Run many chat turns concurrently, yielding each result as it completes.
+
+    Items for the same thread run in order on one worker; different threads
+    run in parallel on the shared batch pool, using the same graph, model
+    clients and retriever as single requests. When a turn stops at a
+    human_assistance interrupt, or fails, the thread's remaining items are
+    reported as skipped and the other threads carry on.
+
+    Args:
+        items: (thread_id, message) pairs in submission order
+        owner: Owner recorded in the thread registry
+        tenant: Guest list for the batch's threads (None keeps each thread's)
+
+    Returns:
+        Iterator of result dicts (index, thread_id, status, response, usage, error)
+    """
+    by_thread: "OrderedDict[str, List[Tuple[int, str]]]" = OrderedDict()
+    for index, (thread_id, message) in enumerate(items):
+        by_thread.setdefault(thread_id, []).append((index, message))
+
+    results: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+    stop = threading.Event()
+    futures = [
+        _executor.submit(_run_thread, thread_id, thread_items, owner, tenant, results, stop)
+        for thread_id, thread_items in by_thread.items()
+    ]
+    try:
+        # Each worker reports every one of its items, then None, even if it fails outside a turn.
+        running = len(futures)
+        while running:
+            result = results.get()
+            if result is None:
+                running -= 1
+            else:
+                yield result
+    finally:
+        # Client went away: drop threads that haven't started and stop the rest between turns.
+        stop.set()
+        for future in futures:
+            future.cancel()
+
+
+def _run_thread(thread_id: str, thread_items: List[Tuple[int, str]], owner: Optional[str], tenant: Optional[str],
+                results: "queue.Queue", stop: threading.Event):
+    pending = [index for index, _ in thread_items]
+    try:
+        for result in _thread_results(thread_id, thread_items, owner, tenant, stop):
+            pending.remove(result["index"])
+            results.put(result)
+    except Exception as e:
+        # E.g. the budget store is locked: fail the turn that was running and skip the rest.
+        for position, index in enumerate(pending):
+            results.put(_result(index, thread_id, "error", error=f"Batch worker failed: {e}") if position == 0
+                        else _result(index, thread_id, "skipped", error="An earlier turn in this thread failed"))
+    finally:
+        results.put(None)
+
+
+def _thread_results(thread_id: str, thread_items: List[Tuple[int, str]], owner: Optional[str],
+                    tenant: Optional[str], stop: threading.Event) -> Iterator[Dict[str, Any]]:
+    blocked = None
+    for index, message in thread_items:
+        if blocked is None and stop.is_set():
+            blocked = "Batch cancelled"
+        if blocked is not None:
+            yield _result(index, thread_id, "skipped", error=blocked)
+            continue
+
+        reason = thread_budget.check(thread_id)
+        if reason:
+            blocked = reason
+            yield _result(index, thread_id, "budget_exceeded", error=reason)
+            continue
+
+        start = time.perf_counter()
+        response_text, status = process_chat_message(message, thread_id, tenant)
+        usage = get_turn_usage(thread_id)
+        thread_budget.record(thread_id, usage)
+        update_thread_registry(thread_id, owner)
+        yield _result(
+            index, thread_id, status, response=response_text, usage=usage,
+            latency=round(time.perf_counter() - start, 4),
+            error=response_text if status == "error" else None,
+        )
+
+        if status == "waiting_for_input":
+            blocked = "Thread is waiting for human input; resume it to continue"
+        elif status == "error":
+            blocked = "An earlier turn in this thread failed"
+
+
+def _result(index: int, thread_id: str, status: str, response: Optional[str] = None,
+            usage: Optional[Dict[str, Any]] = None, latency: Optional[float] = None,
+            error: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "index": index,
+        "thread_id": thread_id,
+        "status": status,
+        "response": response,
+        "usage": usage,
+        "latency": latency,
+        "error": error,
+    }
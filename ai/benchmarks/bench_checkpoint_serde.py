@@ -0,0 +1,98 @@
+"""
+Checkpoint serializer benchmark: default vs compact.
+
+Builds a thread of N messages in which each turn is a question, a tool call,
+a long retrieval/web_search result (the same few results recur across
+turns, as they do for real guest lookups) and an answer. Every turn writes
+a checkpoint holding the whole message list, like the checkpointer does.
+
+Reports bytes written per turn (blob table included for the compact
+serializer) and the time to serialize and deserialize the final checkpoint.
+
+Run from the ai directory:
+    python benchmarks/bench_checkpoint_serde.py [--sizes 10 100 1000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from checkpoint_serde import BlobStore, CompactSerializer
+
+GUESTS = ["Ada Lovelace", "Marie Curie", "Nikola Tesla", "Grace Hopper", "Alan Turing"]
+
+
+def tool_result(i: int) -> str:
+    guest = GUESTS[i % len(GUESTS)]
+    return "\n\n".join(
+        f"Name: {guest}\nRelation: guest #{j}\nDescription: {guest} is attending the gala. " * 6 for j in range(8)
+    )
+
+
+def build_thread(n_messages: int):
+    messages = []
+    for i in range(n_messages // 4 + 1):
+        call_id = f"call_{i}"
+        messages += [
+            HumanMessage(content=f"Tell me about {GUESTS[i % len(GUESTS)]}", id=f"h{i}"),
+            AIMessage(content="", id=f"a{i}", tool_calls=[
+                {"name": "retrieval", "args": {"query": GUESTS[i % len(GUESTS)]}, "id": call_id}
+            ]),
+            ToolMessage(content=tool_result(i), tool_call_id=call_id, name="retrieval", id=f"t{i}"),
+            AIMessage(content=f"{GUESTS[i % len(GUESTS)]} is on the guest list.", id=f"r{i}"),
+        ]
+    return messages[:n_messages]
+
+
+def blob_bytes(store: BlobStore) -> int:
+    return sum(len(data) for data in store._memory.values())
+
+
+def run(serde, n_messages: int, blob_store: BlobStore = None):
+    messages = build_thread(n_messages)
+    turns = max(1, n_messages // 4)
+    written = 0
+    for turn in range(1, turns + 1):
+        _, data = serde.dumps_typed({"channel_values": {"messages": messages[: turn * 4]}})
+        written += len(data)
+    if blob_store is not None:
+        written += blob_bytes(blob_store)
+
+    checkpoint = {"channel_values": {"messages": messages}}
+    start = time.perf_counter()
+    typed = serde.dumps_typed(checkpoint)
+    dump_ms = (time.perf_counter() - start) * 1000
+
+    if blob_store is not None:
+        blob_store._cache.clear()  # measure a cold read
+    start = time.perf_counter()
+    loaded = serde.loads_typed(typed)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    assert [m.content for m in loaded["channel_values"]["messages"]] == [m.content for m in messages]
+    return written / turns, len(typed[1]), dump_ms, load_ms
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    print(f"{'messages':>8} {'serializer':>10} {'bytes/turn':>12} {'last ckpt':>11} {'dump ms':>9} {'load ms':>9}")
+    for n in args.sizes:
+        store = BlobStore()
+        for name, serde, blobs in [
+            ("default", JsonPlusSerializer(), None),
+            ("compact", CompactSerializer(store), store),
+        ]:
+            per_turn, size, dump_ms, load_ms = run(serde, n, blobs)
+            print(f"{n:>8} {name:>10} {per_turn:>12,.0f} {size:>11,} {dump_ms:>9.2f} {load_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
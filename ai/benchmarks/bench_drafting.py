@@ -0,0 +1,156 @@
+"""
+Invitation drafting benchmark: sequential ReAct loop vs the per-guest fan-out.
+
+Drafts an invitation for every guest of a synthetic list of `--sizes`
+guests (10 and 100 by default) with a stand-in chat model. Each call takes
+`--llm-ms` plus `--ms-per-1k-tokens` for every 1,000 prompt tokens
+(4 characters each), so calls carrying a longer conversation take longer.
+
+  - sequential: a ReAct agent, as `chatbot` runs one, that pages through
+    the guests with a retrieval tool five at a time and then writes one
+    draft per model call (a `save_draft` tool call, so the loop goes on),
+    each call carrying the conversation so far. The production agent runs
+    out of its planning budget (AGENT_ITERATIONS) before any draft of even
+    10 guests; here the limit is lifted so it finishes.
+  - fan-out: the graph's `draft_invitations` node, reading the guests once
+    and drafting them in parallel, `--concurrency` calls at a time.
+
+It reports model calls (hedged requests, which the router sends when a
+call runs past the tier's p95, included and also shown on their own), the
+time to the first finished draft and the wall-clock time for all drafts.
+DRAFT_CONCURRENCY is set to the largest `--concurrency`, which sizes the
+router's thread pool for it.
+
+Run from the ai directory:
+    python benchmarks/bench_drafting.py [--sizes 10 100] [--llm-ms 800] [--concurrency 4 8 16]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+REQUEST = "Draft personalized invitations for everyone for my birthday dinner on Saturday"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--llm-ms", type=float, default=800, help="Latency of each model call")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=20, help="Added latency per 1,000 prompt tokens")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8, 16], help="Fan-out concurrency limits")
+    args = parser.parse_args()
+
+    os.environ.update({"OPENAI_API_KEY": "stand-in", "CHECKPOINT_DB": "", "PRELOAD_RETRIEVER": "false",
+                       "CASSETTE_MODE": "off", "SPECULATIVE_RETRIEVAL": "false",
+                       "DRAFT_CONCURRENCY": str(max(args.concurrency))})
+
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from langchain_core.tools import tool
+    from langgraph.prebuilt import create_react_agent
+
+    from drafting import invitation_drafter
+    from graph import graph, router
+
+    calls = {"count": 0}
+    guests = []
+
+    def draft_text(name: str) -> str:
+        return (f"Dear {name}, it would mean a lot to have you at my birthday dinner this Saturday. "
+                "There will be good food, better company and a toast or two. Hope you can make it!")
+
+    class StandInModel(BaseChatModel):
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            calls["count"] += 1
+            prompt_tokens = sum(len(str(m.content)) + len(str(getattr(m, "tool_calls", ""))) for m in messages) / 4
+            time.sleep((args.llm_ms + prompt_tokens / 1000 * args.ms_per_1k_tokens) / 1000)
+            last = messages[-1]
+            if isinstance(last, HumanMessage) and "Guest:\nName: " in last.content:
+                # One fan-out drafting call.
+                message = AIMessage(draft_text(last.content.split("Name: ")[1].split("\n")[0]))
+            else:
+                message = self._next_step(messages)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        def _next_step(self, messages):
+            """The sequential agent: page through the guests, then one draft per call, then a summary."""
+            found = [line[6:] for m in messages if isinstance(m, ToolMessage) and m.name == "retrieval"
+                     for line in str(m.content).splitlines() if line.startswith("Name: ")]
+            saved = sum(1 for m in messages if isinstance(m, ToolMessage) and m.name == "save_draft")
+            step = len(messages)
+            if len(found) < len(guests):
+                return AIMessage("", tool_calls=[{"name": "retrieval", "args": {"query": "guests", "page": len(found) // 5},
+                                                  "id": f"r{step}"}])
+            if saved < len(found):
+                name = found[saved]
+                return AIMessage("", tool_calls=[{"name": "save_draft", "args": {"name": name, "draft": draft_text(name)},
+                                                  "id": f"d{step}"}])
+            return AIMessage(f"I drafted invitations for all {saved} guests.")
+
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+        @property
+        def _llm_type(self):
+            return "stand-in"
+
+    first_draft = {"at": None}
+
+    @tool
+    def retrieval(query: str, page: int = 0) -> str:
+        """Search the guest list, five guests per page."""
+        return "\n---\n".join(f"Name: {g['name']}\nRelation: {g['relation']}\nDescription: {g['description']}"
+                              for g in guests[page * 5:page * 5 + 5])
+
+    @tool
+    def save_draft(name: str, draft: str) -> str:
+        """Save one guest's invitation draft."""
+        first_draft["at"] = first_draft["at"] or time.perf_counter()
+        return f"Saved {name}'s draft."
+
+    model = StandInModel()
+    for tier in router.tiers.values():
+        tier.model, tier.fallback = model, None
+    sequential_agent = create_react_agent(model=model, tools=[retrieval, save_draft])
+    invitation_drafter.guest_loader = lambda tenant, relation: guests
+    invitation_drafter.guest_counter = lambda tenant, relation: len(guests)
+
+    def hedged() -> int:
+        return sum(tier["hedges"] for tier in router.get_stats().values())
+
+    print(f"Stand-in model: {args.llm_ms:.0f} ms per call + {args.ms_per_1k_tokens:.0f} ms per 1k prompt tokens\n")
+    print(f"{'guests':>6}  {'path':<22} {'model calls':>11} {'hedged':>6} {'first draft s':>13} {'total s':>8} "
+          f"{'speedup':>8}")
+    for n in args.sizes:
+        guests[:] = [{"name": f"Guest {i}", "relation": "friend", "description": f"Loves topic {i % 7}.",
+                      "email": f"guest{i}@example.com"} for i in range(n)]
+
+        calls["count"], first_draft["at"], hedges = 0, None, hedged()
+        start = time.perf_counter()
+        sequential_agent.invoke({"messages": [HumanMessage(REQUEST)]}, {"recursion_limit": 4 * n + 50})
+        sequential = time.perf_counter() - start
+        print(f"{n:>6}  {'sequential ReAct':<22} {calls['count']:>11} {hedged() - hedges:>6} "
+              f"{first_draft['at'] - start:>13.2f} {sequential:>8.2f} {'1.0x':>8}")
+
+        for concurrency in args.concurrency:
+            invitation_drafter.max_concurrency = concurrency
+            calls["count"], first, hedges = 0, None, hedged()
+            config = {"configurable": {"thread_id": f"fan-out-{n}-{concurrency}"}}
+            start = time.perf_counter()
+            for _, event in graph.stream({"messages": [HumanMessage(REQUEST)]}, config, stream_mode="custom",
+                                         subgraphs=True):
+                first = first or time.perf_counter()
+            elapsed = time.perf_counter() - start
+            drafts = len(graph.get_state(config).values.get("invitation_drafts", {}))
+            assert drafts == n, (drafts, n)
+            print(f"{n:>6}  {f'fan-out ({concurrency} at once)':<22} {calls['count']:>11} {hedged() - hedges:>6} "
+                  f"{first - start:>13.2f} "
+                  f"{elapsed:>8.2f} {sequential / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
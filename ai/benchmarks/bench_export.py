@@ -0,0 +1,236 @@
+"""
+Bulk export throughput benchmark.
+
+Builds a SQLite checkpoint store of `--threads` conversations with
+`--turns` turns of four messages each (human, a `retrieval` call, its
+result with three guests, the answer), 1,000,000 messages by default,
+with two checkpoints per thread and a thread registry next to it. Then,
+each in a fresh process:
+
+  - full exports of messages as JSONL and Parquet, and of guests as JSONL,
+    reporting rows/s, output size and resident memory sampled during the
+    export (flat when memory doesn't grow with the store)
+  - an incremental export after one more turn on 1% of the threads,
+    starting from the full export's watermark
+  - live traffic (a checkpoint read and write per "turn", as the graph
+    does) with and without an export running alongside, p50/p99 latency
+
+Run from the ai directory:
+    python benchmarks/bench_export.py [--threads 25000] [--turns 10] [--data-dir DIR]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+AI_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AI_DIR))
+
+TOPICS = ["mathematics", "music", "physics", "cooking", "poetry", "chess", "film", "gardening"]
+RELATIONS = ["best friend", "colleague from work", "cousin", "neighbor"]
+# Store timestamps start here so the incremental turn is clearly after the watermark.
+EPOCH = 1_700_000_000.0
+
+
+def rss_mb() -> float:
+    """Current resident set size (peak size where /proc isn't available)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def turn_messages(rng: random.Random, thread: int, turn: int):
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+    topic = rng.choice(TOPICS)
+    call_id = f"call-{thread}-{turn}"
+    guests = "\n---\n".join(
+        f"Result {i}:\nContent: Name: Guest {thread}-{turn}-{i}\nRelation: {rng.choice(RELATIONS)}\n"
+        f"Description: Loves {topic}.\nEmail: guest{i}@host{thread}.example.com\nRelevance Score: 0.8{i}"
+        for i in range(1, 4)
+    )
+    return [
+        HumanMessage(f"Which of my friends like {topic}? (turn {turn})", id=f"h-{thread}-{turn}"),
+        AIMessage("", tool_calls=[{"name": "retrieval", "args": {"query": topic}, "id": call_id}],
+                  id=f"c-{thread}-{turn}"),
+        ToolMessage(guests, name="retrieval", tool_call_id=call_id, id=f"t-{thread}-{turn}"),
+        AIMessage(f"Three of your guests are into {topic}; you could seat them together. " * 3,
+                  id=f"a-{thread}-{turn}"),
+    ]
+
+
+def put_checkpoint(saver, thread_id: str, messages, ts: float, parent=None):
+    from langgraph.checkpoint.base import empty_checkpoint
+    from langgraph.checkpoint.base.id import uuid6
+
+    checkpoint = empty_checkpoint()
+    checkpoint.update(id=str(uuid6()), ts=datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+                      channel_values={"messages": messages}, channel_versions={"messages": len(messages)})
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    if parent:
+        config["configurable"]["checkpoint_id"] = parent
+    return saver.put(config, checkpoint, {"source": "loop", "step": len(messages)}, {"messages": len(messages)})
+
+
+def build(args):
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    from storage import connect
+
+    conn = connect(os.environ["CHECKPOINT_DB"])
+    saver = SqliteSaver(conn)
+    conn.execute("CREATE TABLE IF NOT EXISTS threads (thread_id TEXT PRIMARY KEY, owner TEXT, created_at REAL, "
+                 "last_activity REAL, message_count INTEGER, interrupted INTEGER)")
+    conn.execute("CREATE INDEX IF NOT EXISTS threads_activity ON threads (last_activity)")
+    start = time.perf_counter()
+    for thread in range(args.threads):
+        rng = random.Random(thread)
+        messages = [m for turn in range(args.turns) for m in turn_messages(rng, thread, turn)]
+        ts = EPOCH + thread
+        # Two checkpoints per thread: halfway through and after the last turn.
+        first = put_checkpoint(saver, f"thread-{thread}", messages[:len(messages) // 2], ts - 0.5)
+        put_checkpoint(saver, f"thread-{thread}", messages, ts, first["configurable"]["checkpoint_id"])
+        conn.execute("INSERT OR REPLACE INTO threads VALUES (?, ?, ?, ?, ?, 0)",
+                     (f"thread-{thread}", f"host-{thread % 100}", ts - 1, ts + 0.1, len(messages)))
+        if thread % 1000 == 999:
+            conn.commit()
+    conn.commit()
+    print(f"Built {args.threads} threads x {args.turns * 4} messages in {time.perf_counter() - start:.0f} s, "
+          f"{os.path.getsize(os.environ['CHECKPOINT_DB']) / 1e6:.0f} MB")
+
+
+def export(args):
+    from export import conversation_exporter
+
+    samples = []
+    stream = conversation_exporter.stream(args.kind, args.format, args.since, report=(report := {}))
+    out = os.path.join(os.path.dirname(os.environ["CHECKPOINT_DB"]), f"export.{args.format}")
+    with open(out, "wb") as f:
+        for chunk in stream:
+            f.write(chunk)
+            samples.append(rss_mb())
+    quartiles = [round(samples[min(len(samples) - 1, len(samples) * q // 4)]) for q in range(1, 5)] if samples else []
+    print(json.dumps({**report, "bytes": os.path.getsize(out), "rss_mb": quartiles}))
+
+
+def append_turns(args):
+    """One more turn on every 100th thread, after the full export's watermark."""
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    from storage import connect
+
+    conn = connect(os.environ["CHECKPOINT_DB"])
+    saver = SqliteSaver(conn)
+    now = time.time()
+    for thread in range(0, args.threads, 100):
+        config = {"configurable": {"thread_id": f"thread-{thread}", "checkpoint_ns": ""}}
+        latest = saver.get_tuple(config)
+        messages = latest.checkpoint["channel_values"]["messages"]
+        messages = messages + turn_messages(random.Random(-thread), thread, args.turns)
+        put_checkpoint(saver, f"thread-{thread}", messages, now, latest.config["configurable"]["checkpoint_id"])
+        conn.execute("UPDATE threads SET last_activity = ?, message_count = ? WHERE thread_id = ?",
+                     (now + 0.1, len(messages), f"thread-{thread}"))
+    conn.commit()
+    print(f"Added a turn to {len(range(0, args.threads, 100))} threads")
+
+
+def live(args):
+    """Checkpoint read + write per simulated turn, optionally with an export running alongside."""
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    from export import conversation_exporter
+    from storage import connect
+
+    saver = SqliteSaver(connect(os.environ["CHECKPOINT_DB"]))
+    rng = random.Random(3)
+    exporting = None
+    if args.with_export:
+        exporting = threading.Thread(target=lambda: sum(1 for _ in conversation_exporter.stream("messages", "jsonl")))
+        exporting.start()
+    latencies, deadline = [], time.perf_counter() + args.live_seconds
+    while time.perf_counter() < deadline:
+        thread_id = f"live-{rng.randrange(200)}"
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        start = time.perf_counter()
+        latest = saver.get_tuple(config)
+        messages = latest.checkpoint["channel_values"]["messages"][-40:] if latest else []
+        messages = messages + turn_messages(rng, 0, len(messages))
+        put_checkpoint(saver, thread_id, messages, time.time(), latest.config["configurable"]["checkpoint_id"] if latest else None)
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.005)
+    ordered = sorted(latencies)
+    print(json.dumps({"turns": len(ordered), "p50_ms": round(statistics.median(ordered), 2),
+                      "p99_ms": round(ordered[int(len(ordered) * 0.99)], 2),
+                      "export_running_at_end": bool(exporting and exporting.is_alive())}))
+    if exporting:
+        exporting.join()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=25000)
+    parser.add_argument("--turns", type=int, default=10, help="Turns of four messages per thread")
+    parser.add_argument("--data-dir", help="Reuse (or keep) the store here")
+    parser.add_argument("--live-seconds", type=float, default=10)
+    parser.add_argument("--phase", choices=["all", "build", "export", "append", "live"], default="all",
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--kind", default="messages", help=argparse.SUPPRESS)
+    parser.add_argument("--format", default="jsonl", help=argparse.SUPPRESS)
+    parser.add_argument("--since", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--with-export", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase != "all":
+        return {"build": build, "export": export, "append": append_turns, "live": live}[args.phase](args)
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="bench-export-")
+    env = {**os.environ, "CHECKPOINT_DB": os.path.join(data_dir, "store.db"), "CHECKPOINT_SERIALIZER": "default",
+           "PYTHONPATH": os.pathsep.join(filter(None, [str(AI_DIR), os.environ.get("PYTHONPATH")]))}
+    common = [sys.executable, __file__, "--threads", str(args.threads), "--turns", str(args.turns)]
+
+    def run(*extra):
+        out = subprocess.run(common + list(extra), cwd=data_dir, env=env, check=True,
+                             capture_output=True, text=True).stdout
+        return out.strip().splitlines()[-1]
+
+    if not os.path.exists(os.path.join(data_dir, "built")):
+        print(run("--phase", "build"))
+        Path(data_dir, "built").touch()
+
+    print(f"{'export':<22} {'threads':>8} {'rows':>9} {'seconds':>8} {'rows/s':>8} {'MB':>7}  RSS MB at 25/50/75/100%")
+    watermark = None
+    for label, kind, fmt in [("messages jsonl", "messages", "jsonl"), ("messages parquet", "messages", "parquet"),
+                             ("guests jsonl", "guests", "jsonl")]:
+        report = json.loads(run("--phase", "export", "--kind", kind, "--format", fmt))
+        watermark = watermark or report["until"]
+        print(f"{label:<22} {report['threads']:>8} {report['rows']:>9} {report['seconds']:>8.1f} "
+              f"{report['rows'] / report['seconds']:>8.0f} {report['bytes'] / 1e6:>7.1f}  {report['rss_mb']}")
+
+    run("--phase", "append")
+    report = json.loads(run("--phase", "export", "--since", repr(watermark)))
+    print(f"{'incremental jsonl':<22} {report['threads']:>8} {report['rows']:>9} {report['seconds']:>8.2f} "
+          f"{report['rows'] / max(report['seconds'], 1e-9):>8.0f} {report['bytes'] / 1e6:>7.2f}  {report['rss_mb']}")
+
+    print(f"\n{'live traffic':<14} {'turns':>6} {'p50 ms':>7} {'p99 ms':>7}")
+    for label, extra in [("alone", []), ("with export", ["--with-export"])]:
+        report = json.loads(run("--phase", "live", "--live-seconds", str(args.live_seconds), *extra))
+        print(f"{label:<14} {report['turns']:>6} {report['p50_ms']:>7} {report['p99_ms']:>7}")
+    print(f"\nStore kept in {data_dir}")
+
+
+if __name__ == "__main__":
+    main()
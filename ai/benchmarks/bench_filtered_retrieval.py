@@ -0,0 +1,130 @@
+"""
+Filtered guest retrieval benchmark: Chroma `where` pushdown vs post-filtering.
+
+Builds a synthetic collection of guests (100k by default) with the same
+metadata fields the ingestion stores (relation_category, email_domain) and
+clustered 384-d embeddings, the size of bge-small vectors. For filtered
+queries it reports latency and recall@k against an exact NumPy search over
+the matching guests for:
+
+  - pushdown: `collection.query(..., where=...)`, as the retrieval tool does
+  - post-filter: unfiltered top-k, then drop non-matching guests (the old
+    behaviour, relying on the vector search to surface them)
+  - post-filter x10: the same with 10x over-fetch
+
+Run from the ai directory:
+    python benchmarks/bench_filtered_retrieval.py [--guests 100000] [--queries 200]
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+DIM = 384
+CATEGORIES = ["family", "friend", "colleague", "other"]
+CATEGORY_WEIGHTS = [0.05, 0.45, 0.35, 0.15]
+DOMAINS = ["gmail.com", "example.com", "outlook.com", "university.edu", "company.com"]
+
+FILTERS = {
+    "family": {"relation_category": "family"},
+    "colleague@company.com": {"$and": [{"relation_category": "colleague"}, {"email_domain": "company.com"}]},
+    "gmail.com": {"email_domain": "gmail.com"},
+}
+
+
+# Text embeddings cluster by topic; uniform random vectors would understate HNSW recall.
+CENTERS = np.random.default_rng(42).standard_normal((500, DIM)).astype(np.float32)
+
+
+def clustered_vectors(rng, n: int):
+    vectors = CENTERS[rng.integers(len(CENTERS), size=n)] + 0.5 * rng.standard_normal((n, DIM), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_collection(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = clustered_vectors(rng, n)
+    categories = rng.choice(CATEGORIES, size=n, p=CATEGORY_WEIGHTS)
+    domains = rng.choice(DOMAINS, size=n)
+
+    client = chromadb.PersistentClient(path=tempfile.mkdtemp(prefix="bench_guests_"))
+    collection = client.create_collection("guests", metadata={"hnsw:space": "cosine", "hnsw:search_ef": 100})
+    batch = 5000
+    for start in range(0, n, batch):
+        end = min(start + batch, n)
+        collection.add(
+            ids=[f"guest-{i}" for i in range(start, end)],
+            embeddings=vectors[start:end].tolist(),
+            metadatas=[
+                {"name": f"Guest {i}", "relation_category": str(categories[i]), "email_domain": str(domains[i])}
+                for i in range(start, end)
+            ],
+        )
+    return collection, vectors, categories, domains
+
+
+def matches(where, category, domain) -> bool:
+    if "$and" in where:
+        return all(matches(clause, category, domain) for clause in where["$and"])
+    key, value = next(iter(where.items()))
+    return (category if key == "relation_category" else domain) == value
+
+
+def exact_top_k(query, vectors, mask, k):
+    scores = vectors @ query
+    scores[~mask] = -np.inf
+    top = np.argpartition(-scores, k)[:k]
+    return {f"guest-{i}" for i in top}
+
+
+def run(collection, query_vectors, where, truth, k, fetch, pushdown):
+    latencies, recalls = [], []
+    for query, expected in zip(query_vectors, truth):
+        start = time.perf_counter()
+        if pushdown:
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k, where=where)
+            ids = result["ids"][0]
+        else:
+            result = collection.query(query_embeddings=[query.tolist()], n_results=fetch, include=["metadatas"])
+            ids = [
+                id_ for id_, meta in zip(result["ids"][0], result["metadatas"][0])
+                if matches(where, meta["relation_category"], meta["email_domain"])
+            ][:k]
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(expected & set(ids)) / k)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95)], statistics.mean(recalls)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--guests", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    collection, vectors, categories, domains = build_collection(args.guests)
+    print(f"built {args.guests:,} guests in {time.perf_counter() - start:.1f}s")
+
+    rng = np.random.default_rng(1)
+    query_vectors = clustered_vectors(rng, args.queries)
+
+    print(f"{'filter':>22} {'selectivity':>11} {'strategy':>14} {'p50 ms':>8} {'p95 ms':>8} {'recall@k':>9}")
+    for label, where in FILTERS.items():
+        mask = np.array([matches(where, c, d) for c, d in zip(categories, domains)])
+        truth = [exact_top_k(q, vectors, mask, args.k) for q in query_vectors]
+        for strategy, pushdown, fetch in [
+            ("pushdown", True, args.k),
+            ("post-filter", False, args.k),
+            ("post-filter x10", False, args.k * 10),
+        ]:
+            p50, p95, recall = run(collection, query_vectors, where, truth, args.k, fetch, pushdown)
+            print(f"{label:>22} {mask.mean():>11.1%} {strategy:>14} {p50:>8.2f} {p95:>8.2f} {recall:>9.2%}")
+
+
+if __name__ == "__main__":
+    main()
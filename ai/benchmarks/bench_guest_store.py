@@ -0,0 +1,192 @@
+"""
+Guest loading benchmark: `datasets.load_dataset` + Python records vs the memory-mapped guest store.
+
+For each size in `--sizes` (10,000 and 1,000,000 guests by default) it
+writes a synthetic guest dataset as Parquet, imports it into a GuestStore
+once, and then measures in a fresh process each:
+
+  - dataset:      `load_dataset("parquet", ...)` (from its Arrow cache, as on
+                  every start after the first download) + a tuple of dicts,
+                  what `load_guests` did before
+  - dataset+docs: the above plus building Documents, what every retriever
+                  initialization did before
+  - store:        mapping the guest store and counting rows, what startup
+                  does now once the vectors exist
+  - store+docs:   the store plus `build_documents`, only needed when the
+                  vectors are first built
+
+It reports wall time and the resident memory the step added, then filter
+latency (family members, one email domain, one exact name) with Arrow
+compute over the store against a Python scan of the records.
+
+Run from the ai directory (needs `datasets` for the dataset rows):
+    python benchmarks/bench_guest_store.py [--sizes 10000 1000000]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+AI_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AI_DIR))
+
+RELATIONS = ["best friend", "colleague from work", "cousin", "old friend from university", "neighbor", "sister",
+             "business partner", "mentor"]
+DOMAINS = ["gmail.com", "example.com", "outlook.com", "university.edu", "company.com"]
+TOPICS = ["mathematics", "music", "physics", "cooking", "poetry", "chess", "film", "gardening"]
+
+
+def rss_mb() -> float:
+    """Current resident set size (peak size where /proc isn't available)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_dataset(path: str, n: int):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rng = random.Random(n)
+    columns = {"name": [], "relation": [], "description": [], "email": []}
+    for i in range(n):
+        columns["name"].append(f"Guest Number {i}")
+        columns["relation"].append(rng.choice(RELATIONS))
+        columns["description"].append(f"Guest {i} loves {rng.choice(TOPICS)} and {rng.choice(TOPICS)}, "
+                                      f"and once gave a toast about {rng.choice(TOPICS)}.")
+        columns["email"].append(f"guest{i}@{rng.choice(DOMAINS)}")
+    pq.write_table(pa.table(columns), path)
+
+
+def measure(args):
+    """One loading path in a fresh process; prints seconds and RSS added."""
+    import_start = rss_mb()
+    # Import cost is the same for both paths; measure from after the imports.
+    import retriver
+    from guest_store import GuestStore
+
+    if args.path.startswith("dataset"):
+        import datasets
+
+        datasets.disable_progress_bars()
+    before = rss_mb()
+    start = time.perf_counter()
+    if args.path.startswith("dataset"):
+        dataset = datasets.load_dataset("parquet", data_files=args.source, split="train", cache_dir=args.cache_dir)
+        guests = tuple(dict(guest) for guest in dataset)
+        count = len(guests)
+        if args.path == "dataset+docs":
+            docs = retriver.build_documents(guests)
+    else:
+        store = GuestStore(args.store)
+        count = store.count
+        if args.path == "store+docs":
+            docs = retriver.build_documents(store.table)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"count": count, "seconds": elapsed, "rss_mb": rss_mb() - before,
+                      "imports_mb": before - import_start}))
+
+
+def filters(args):
+    """Filter latency: Arrow compute over the store vs a Python scan of the records."""
+    from guest_store import GuestStore, relation_category
+
+    store = GuestStore(args.store)
+    records = store.records()
+    name = records[len(records) // 2]["name"]
+    cases = {
+        "family": (lambda: store.filter(relation="family").num_rows,
+                   lambda: sum(1 for g in records if relation_category(g["relation"]) == "family")),
+        "email domain": (lambda: store.filter(email_domain="gmail.com").num_rows,
+                         lambda: sum(1 for g in records if g["email"].rsplit("@", 1)[-1].lower() == "gmail.com")),
+        "exact name": (lambda: store.lookup(name) is not None,
+                       lambda: any(g["name"] == name for g in records)),
+    }
+    report = {}
+    for label, (arrow, python) in cases.items():
+        timings = []
+        for fn in (arrow, python):
+            runs = []
+            for _ in range(5):
+                start = time.perf_counter()
+                result = fn()
+                runs.append((time.perf_counter() - start) * 1000)
+            timings.append((statistics.median(runs), result))
+        assert timings[0][1] == timings[1][1], (label, timings)
+        report[label] = {"arrow_ms": timings[0][0], "python_ms": timings[1][0], "matches": timings[0][1]}
+    print(json.dumps(report))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--data-dir", help="Reuse (or keep) the datasets and stores here")
+    parser.add_argument("--phase", choices=["all", "measure", "filters"], default="all", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--source", help=argparse.SUPPRESS)
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase == "measure":
+        return measure(args)
+    if args.phase == "filters":
+        return filters(args)
+
+    from guest_store import GuestStore, read_source
+
+    try:
+        import datasets  # noqa: F401
+        paths = ["dataset", "dataset+docs", "store", "store+docs"]
+    except ImportError:
+        print("`datasets` is not installed; measuring the guest store only")
+        paths = ["store", "store+docs"]
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="bench-guests-")
+    os.makedirs(data_dir, exist_ok=True)
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(AI_DIR), os.environ.get("PYTHONPATH")]))}
+    for n in args.sizes:
+        source = os.path.join(data_dir, f"guests-{n}.parquet")
+        store_path = os.path.join(data_dir, f"guests-{n}.arrow")
+        cache_dir = os.path.join(data_dir, f"hf-cache-{n}")
+        if not os.path.exists(source):
+            write_dataset(source, n)
+        if not os.path.exists(store_path):
+            start = time.perf_counter()
+            GuestStore(store_path).write(read_source(source))
+            print(f"Imported {n:,} guests into the store in {time.perf_counter() - start:.2f} s "
+                  f"({os.path.getsize(store_path) / 1e6:.0f} MB)")
+
+        def run(*extra):
+            out = subprocess.run([sys.executable, __file__, "--source", source, "--store", store_path,
+                                  "--cache-dir", cache_dir, *extra], env=env, check=True,
+                                 capture_output=True, text=True).stdout
+            return json.loads(out.strip().splitlines()[-1])
+
+        if "dataset" in paths:
+            run("--phase", "measure", "--path", "dataset")  # first load converts to the Arrow cache
+        print(f"\n{n:,} guests{'':<8} {'seconds':>8} {'RSS MB':>7}")
+        for path in paths:
+            report = run("--phase", "measure", "--path", path)
+            print(f"  {path:<20} {report['seconds']:>8.3f} {report['rss_mb']:>7.0f}")
+        report = run("--phase", "filters")
+        print(f"  {'filter':<20} {'arrow ms':>8} {'python ms':>9} {'matches':>8}")
+        for label, row in report.items():
+            print(f"  {label:<20} {row['arrow_ms']:>8.2f} {row['python_ms']:>9.2f} {row['matches']!s:>8}")
+    print(f"\nData kept in {data_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Intent fast-path benchmark.
+
+Runs a labelled set of prompts through the IntentRouter against a guest
+store holding sample invitee records (plus `--padding` synthetic guests, to
+show lookups don't scale with the guest count) and reports the fast-path hit rate, misroutes (prompts that
+need the agent but were answered by the fast path, and lookups that fell
+through), the MUST_NOT_MATCH prompts the fast path answered anyway (exit
+status 1 if any), and fast-path latency. Agent latency for comparison is measured
+on live traffic and exposed under `intent_fast_path` in GET /metrics;
+`--agent-ms` sets the per-round-trip figure used for the estimate here.
+
+Run from the ai directory:
+    python benchmarks/bench_intents.py [--agent-ms 900] [--padding 100000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from guest_store import GuestStore, from_records
+from intents import IntentRouter
+
+GUESTS = [
+    {"name": "Ada Lovelace", "relation": "best friend",
+     "description": "Lady Ada Lovelace is my best friend. She is an esteemed mathematician.",
+     "email": "ada.lovelace@example.com"},
+    {"name": "Dr. Nikola Tesla", "relation": "old friend from university days",
+     "description": "Dr. Nikola Tesla is an old friend from your university days.",
+     "email": "nikola.tesla@gmail.com"},
+    {"name": "Marie Curie", "relation": "no relation",
+     "description": "Marie Curie was a groundbreaking physicist and chemist.",
+     "email": "marie.curie@example.com"},
+    {"name": "Grace Hopper", "relation": "cousin",
+     "description": "Grace Hopper is your cousin and a computer scientist.",
+     "email": "grace.hopper@example.com"},
+]
+
+# (prompt, expected route)
+PROMPTS = [
+    ("Give me email addresses of potential guests", "fast_path"),
+    ("What is Ada Lovelace's relation to me?", "fast_path"),
+    ("How am I related to Tesla?", "fast_path"),
+    ("What's Marie Curie's email?", "fast_path"),
+    ("Who is Grace Hopper?", "fast_path"),
+    ("Tell me about Nikola Tesla", "fast_path"),
+    ("Who can come to my party?", "fast_path"),
+    ("List all the guests", "fast_path"),
+    ("Search for family members in my guest list", "fast_path"),
+    ("contact details for Ada", "fast_path"),
+    ("What are the current party planning trends?", "agent"),
+    ("Draft an invitation email for Ada Lovelace", "agent"),
+    ("Should I invite Marie Curie and Tesla together?", "agent"),
+    ("Suggest a theme for a party with my university friends", "agent"),
+    ("What's the weather like this weekend?", "agent"),
+    ("Plan a dinner menu for Grace Hopper's birthday", "agent"),
+    ("Help me pick a venue", "agent"),
+    ("Thanks!", "agent"),
+]
+
+# Prompts the fast path must never answer, on a new thread or in a follow-up: they name
+# someone who isn't a guest, negate, filter on something it has no column for, or ask for
+# an action rather than a lookup.
+MUST_NOT_MATCH = [
+    "What is Bob Smith's email?",
+    "What is the email of my dentist?",
+    "What's Ada's and Bob's email?",
+    "list the guests who are not family",
+    "Show me everyone except my cousins",
+    "List the guests without an email",
+    "show me guests from Google",
+    "List guests at Microsoft",
+    "Give me the email addresses of guests with a gmail.com address",
+    "email Ada about the party",
+    "Invite Grace Hopper",
+    "contact Marie Curie for me",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agent-ms", type=float, default=900.0, help="Latency of one agent LLM round-trip")
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--padding", type=int, default=0, help="Synthetic guests added to the store")
+    args = parser.parse_args()
+
+    padding = [{"name": f"Person{i} Sample{i}", "relation": "friend from work", "description": "",
+                "email": f"person{i}@example.com"} for i in range(args.padding)]
+    store = GuestStore(os.path.join(tempfile.mkdtemp(prefix="bench_intents_"), "guests.arrow"))
+    store.write(from_records(GUESTS + padding))
+    router = IntentRouter(lambda: store)
+    hits, misroutes = 0, []
+    for prompt, expected in PROMPTS:
+        route = "fast_path" if router.answer(prompt) else "agent"
+        hits += route == "fast_path"
+        if route != expected:
+            misroutes.append((prompt, expected, route))
+
+    leaks = [(prompt, follow_up) for prompt in MUST_NOT_MATCH for follow_up in (False, True)
+             if router.answer(prompt, follow_up)]
+
+    latencies = []
+    for _ in range(args.repeat):
+        for prompt, _ in PROMPTS:
+            start = time.perf_counter()
+            router.answer(prompt)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    # An agent turn that answers a lookup is a tool call plus a synthesis call.
+    agent_turn_ms = 2 * args.agent_ms
+    fast_ms = statistics.median(latencies)
+    print(f"prompts: {len(PROMPTS)}  fast-path hit rate: {hits / len(PROMPTS):.0%}  misroutes: {len(misroutes)}")
+    for prompt, expected, route in misroutes:
+        print(f"  {prompt!r}: expected {expected}, got {route}")
+    print(f"must-not-match: {len(MUST_NOT_MATCH)} prompts, {len(leaks)} answered by the fast path")
+    for prompt, follow_up in leaks:
+        print(f"  {prompt!r} ({'follow-up' if follow_up else 'new thread'})")
+    print(f"fast path: p50 {fast_ms:.3f} ms, p95 {sorted(latencies)[int(len(latencies) * 0.95)]:.3f} ms")
+    print(f"agent path (2 LLM round-trips at {args.agent_ms:.0f} ms): ~{agent_turn_ms:.0f} ms")
+    print(f"speed-up on a fast-path hit: ~{agent_turn_ms / fast_ms:,.0f}x")
+    if leaks:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
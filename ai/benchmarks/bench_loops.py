@@ -0,0 +1,147 @@
+"""
+Agent loop benchmark: fixed recursion limit vs the loop guard.
+
+Runs five scripted turns through a ReAct agent whose stand-in model takes
+`--llm-ms` per call and whose stand-in `retrieval` and `web_search` tools
+take `--tool-ms` per run:
+
+  - looping lookup:   searches the guest list for the same thing on every call
+  - looping plan:     searches the web for the same thing on every call
+  - repeat once:      repeats its first search once, then answers from it
+  - plain lookup:     one search, then the answer
+  - planning:         two guest searches and two web searches, then the plan
+
+  - before: the agent as `chatbot` ran it, recursion_limit 7 (three model
+    calls) for every request; a turn that needs more raises
+    GraphRecursionError and the user gets an error.
+  - after:  the same agent with `loop_guard.post_model_hook` and the
+    per-request-type recursion limit from AGENT_ITERATIONS.
+
+It reports model calls, tool runs, how the turn ended (answer, partial
+answer or error) and its wall-clock time, then the loop guard's counters.
+
+Run from the ai directory:
+    python benchmarks/bench_loops.py [--llm-ms 800] [--tool-ms 300]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SCENARIOS = {
+    "looping lookup": "Who is my best friend from university?",
+    "looping plan": "Suggest a theme for my sister's party",
+    "repeat once": "Which of my friends like music?",
+    "plain lookup": "Give me email addresses of potential guests",
+    "planning": "Plan a music themed birthday dinner for my friends this weekend",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-ms", type=float, default=800, help="Latency of each model call")
+    parser.add_argument("--tool-ms", type=float, default=300, help="Latency of each tool run")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "stand-in")
+
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from langchain_core.tools import tool
+    from langgraph.errors import GraphRecursionError
+    from langgraph.prebuilt import create_react_agent
+
+    from loops import MEMO_NOTE, loop_guard
+
+    counts = {"model": 0, "tools": 0}
+
+    def call(name, query, step):
+        return AIMessage("", tool_calls=[{"name": name, "args": {"query": query}, "id": f"{name}-{step}"}])
+
+    class StandInModel(BaseChatModel):
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            counts["model"] += 1
+            time.sleep(args.llm_ms / 1000)
+            return ChatResult(generations=[ChatGeneration(message=self._next_step(messages))])
+
+        def _next_step(self, messages):
+            request = next(m.content for m in reversed(messages) if isinstance(m, HumanMessage))
+            results = [m for m in messages if isinstance(m, ToolMessage)]
+            step = len(messages)
+            if request == SCENARIOS["looping lookup"]:
+                return call("retrieval", "best friend university", step)
+            if request == SCENARIOS["looping plan"]:
+                return call("web_search", "party themes", step)
+            if request == SCENARIOS["repeat once"]:
+                if any(MEMO_NOTE in str(m.content) for m in results) or len(results) >= 2:
+                    return AIMessage("Ada and Grace both love music.")
+                return call("retrieval", "friends who like music", step)
+            if request == SCENARIOS["plain lookup"]:
+                if results:
+                    return AIMessage("Here are their email addresses: ada@example.com, grace@example.com.")
+                return call("retrieval", "guest email addresses", step)
+            plan = [("retrieval", "friends"), ("web_search", "music themed dinner ideas"),
+                    ("retrieval", "friends dietary preferences"), ("web_search", "live music venues this weekend")]
+            if len(results) < len(plan):
+                return call(*plan[len(results)], step)
+            return AIMessage("Here is the plan: a jazz dinner at the corner bistro with a vegetarian menu.")
+
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+        @property
+        def _llm_type(self):
+            return "stand-in"
+
+    @tool
+    def retrieval(query: str) -> str:
+        """Search the guest list."""
+        counts["tools"] += 1
+        time.sleep(args.tool_ms / 1000)
+        return f"Name: Ada Lovelace\nRelation: best friend\nDescription: Loves music. (matched '{query}')"
+
+    @tool
+    def web_search(query: str) -> str:
+        """Search the web."""
+        counts["tools"] += 1
+        time.sleep(args.tool_ms / 1000)
+        return f"Top result for '{query}'."
+
+    model, tools = StandInModel(), [retrieval, web_search]
+    before = create_react_agent(model=model, tools=tools)
+    after = create_react_agent(model=model, tools=tools, post_model_hook=loop_guard.post_model_hook)
+
+    def run(agent, messages, recursion_limit):
+        counts["model"] = counts["tools"] = 0
+        start = time.perf_counter()
+        try:
+            final = agent.invoke({"messages": messages}, {"recursion_limit": recursion_limit})["messages"][-1]
+            outcome = f"partial ({final.response_metadata['stopped']})" if "stopped" in final.response_metadata \
+                else "answer"
+        except GraphRecursionError:
+            outcome = "error"
+        return counts["model"], counts["tools"], outcome, time.perf_counter() - start
+
+    print(f"Stand-in model: {args.llm_ms:.0f} ms per call, tools: {args.tool_ms:.0f} ms per run\n")
+    print(f"{'scenario':<16} {'path':<7} {'budget':>6} {'model calls':>11} {'tool runs':>9} {'outcome':<18} "
+          f"{'seconds':>7}")
+    for label, request in SCENARIOS.items():
+        messages = [HumanMessage(request)]
+        for path, agent, limit, budget in (
+            ("before", before, 7, 3),
+            ("after", after, loop_guard.recursion_limit(messages), loop_guard.budget(messages)),
+        ):
+            calls, runs, outcome, elapsed = run(agent, messages, limit)
+            print(f"{label:<16} {path:<7} {budget:>6} {calls:>11} {runs:>9} {outcome:<18} {elapsed:>7.2f}")
+
+    stats = loop_guard.get_stats()
+    print(f"\nLoop guard: {stats['memo_hits']} memo hits, {stats['loops_stopped']} loops and "
+          f"{stats['budget_stopped']} budgets stopped, {stats['llm_calls_saved']} model calls saved")
+
+
+if __name__ == "__main__":
+    main()
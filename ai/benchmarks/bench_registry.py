@@ -0,0 +1,56 @@
+"""
+Thread registry benchmark: listing cost at a million threads.
+
+Registers `--threads` threads (every 1000th owner shared, every 97th waiting
+for input) in a ThreadRegistry, then times `list(limit=50)` for the most
+recent threads, the most recent of one owner and the most recent waiting
+for input. `--db` puts the registry in a SQLite file, as with CHECKPOINT_DB
+when several API workers share it, instead of in memory.
+
+Run from the ai directory:
+    python benchmarks/bench_registry.py [--threads 1000000] [--calls 1000] [--db /tmp/registry.db]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from registry import ThreadRegistry
+from storage import connect
+
+QUERIES = [
+    ("50 most recent", {}),
+    ("50 most recent of one owner", {"owner": "host-7"}),
+    ("50 most recent waiting for input", {"interrupted": True}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=1_000_000)
+    parser.add_argument("--calls", type=int, default=1000, help="list() calls timed per query")
+    parser.add_argument("--db", help="SQLite file for a shared registry (removed first)")
+    args = parser.parse_args()
+
+    if args.db and os.path.exists(args.db):
+        os.remove(args.db)
+    registry = ThreadRegistry(conn=connect(args.db) if args.db else None)
+
+    start = time.perf_counter()
+    for i in range(args.threads):
+        registry.touch(f"thread-{i}", message_count=i % 40, interrupted=i % 97 == 0, owner=f"host-{i % 1000}")
+    print(f"registered {args.threads:,} threads in {time.perf_counter() - start:.1f} s"
+          f" ({'SQLite ' + args.db if args.db else 'in memory'})")
+
+    for label, kwargs in QUERIES:
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            registry.list(limit=50, **kwargs)
+        print(f"{label}: {(time.perf_counter() - start) * 1000 / args.calls:.3f} ms per call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Response serialization benchmark for /chat, /resume and /conversation payloads.
+
+Builds a ChatResponse-shaped payload with a 10/100/1000-message history
+(alternating guest questions and ~600-character assistant answers) and
+reports the CPU time per response and the bytes on the wire for:
+
+  - jsonable_encoder + json: FastAPI's path for endpoints without a
+    response_model (what /resume and /conversation used)
+  - pydantic dict history: `conversation_history: List[Dict[str, Any]]`
+    serialized by Pydantic (what /chat used)
+  - pydantic typed history: HistoryItem TypedDicts, validated from the
+    helper's dicts and serialized by Pydantic's Rust core (what the
+    response_model endpoints do now)
+  - orjson dict: FastJSONResponse
+
+and the size and CPU cost of gzip (level 6) and br (quality 4) on top.
+
+Run from the ai directory:
+    python benchmarks/bench_serialization.py [--sizes 10 100 1000]
+"""
+import argparse
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models import ChatResponse
+from serialization import brotli, dumps
+
+ANSWER = (
+    "Here are the guests who match: Ada Lovelace (ada.lovelace@example.com), a close friend from "
+    "university who loves mathematics; Charles Babbage (charles@example.com), a former colleague; "
+    "and Grace Hopper (grace.hopper@navy.mil), family friend. "
+) * 2
+
+
+class LegacyChatResponse(BaseModel):
+    response: str
+    thread_id: str
+    status: str
+    conversation_history: List[Dict[str, Any]]
+    usage: Optional[Dict[str, Any]] = None
+
+
+def payload(n: int) -> Dict[str, Any]:
+    history = [
+        {"type": "human", "content": f"Who from my friends list could help with the party? ({i})",
+         "timestamp": "2026-10-19T14:07:21.123456"}
+        if i % 2 == 0 else
+        {"type": "assistant", "content": ANSWER, "timestamp": "2026-10-19T14:07:21.123456"}
+        for i in range(n)
+    ]
+    usage = {"llm_calls": 2, "input_tokens": 1830, "cached_tokens": 1024, "output_tokens": 212,
+             "tool_calls": 1, "cached_ratio": 0.5596}
+    return {"response": ANSWER, "thread_id": "birthday2024", "status": "completed",
+            "conversation_history": history, "usage": usage}
+
+
+def per_call_ms(fn, min_time: float = 0.5) -> float:
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time and runs >= 5:
+            return elapsed / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    legacy = TypeAdapter(LegacyChatResponse)
+    typed = TypeAdapter(ChatResponse)
+
+    print(f"{'messages':>8} {'strategy':>26} {'ms':>8} {'bytes':>9}")
+    for n in args.sizes:
+        data = payload(n)
+        strategies = {
+            "jsonable_encoder + json": lambda: json.dumps(jsonable_encoder(LegacyChatResponse(**data))).encode(),
+            "pydantic dict history": lambda: legacy.dump_json(LegacyChatResponse(**data)),
+            "pydantic typed history": lambda: typed.dump_json(ChatResponse(**data)),
+            "orjson dict": lambda: dumps(data),
+        }
+        for name, fn in strategies.items():
+            body = fn()
+            print(f"{n:>8} {name:>26} {per_call_ms(fn):>8.3f} {len(body):>9,}")
+
+        body = typed.dump_json(ChatResponse(**data))
+        codecs = {"gzip 6": lambda: gzip.compress(body, compresslevel=6)}
+        if brotli is not None:
+            codecs["br 4"] = lambda: brotli.compress(body, quality=4)
+        for name, fn in codecs.items():
+            print(f"{n:>8} {'+ ' + name:>26} {per_call_ms(fn):>8.3f} {len(fn()):>9,}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Speculative retrieval benchmark.
+
+Runs guest-related and other turns through the graph with a stand-in chat
+model (each call takes `--llm-ms`) that answers the way the agent does:
+a first call deciding on a `retrieval` call with its own query, then an
+answer from the results. Retrieval is a stand-in taking `--retrieval-ms`
+(embedding plus vector search). Each turn runs with speculation off and
+on; the report shows per-turn wall-clock, the speculation outcome, the
+latency saved and the overall hit rate.
+
+Run from the ai directory:
+    python benchmarks/bench_speculation.py [--llm-ms 800] [--retrieval-ms 150]
+"""
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# (user message, the model's retrieval call or None when it doesn't retrieve)
+TURNS = [
+    ("Which of my friends are mathematicians?", {"query": "friends mathematicians"}),
+    ("Who could give a toast about science at the party?", {"query": "science toast"}),
+    ("Tell me about Ada Lovelace and her email", {"query": "Ada Lovelace email"}),
+    ("Who should sit next to Nikola Tesla at dinner?", {"query": "Nikola Tesla seating"}),
+    ("Which invitees are scientists?", {"query": "physicist chemist inventor"}),
+    ("Who in my family is coming?", {"query": "family members", "relation": "family"}),
+    ("Suggest a party theme for autumn", None),
+    ("What's the weather like for an outdoor party?", None),
+]
+
+
+@dataclass
+class Node:
+    text: str
+    score: float = 0.9
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-ms", type=float, default=800, help="Latency of each model call")
+    parser.add_argument("--retrieval-ms", type=float, default=150, help="Latency of each guest search")
+    args = parser.parse_args()
+
+    os.environ.update({"OPENAI_API_KEY": "stand-in", "CHECKPOINT_DB": "", "INTENT_FAST_PATH": "false",
+                       "PRELOAD_RETRIEVER": "false", "CASSETTE_MODE": "off"})
+
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, HumanMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    import retriver
+    from graph import graph, router
+    from speculation import speculative_retrieval
+
+    calls = dict(TURNS)
+
+    class StandInModel(BaseChatModel):
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            time.sleep(args.llm_ms / 1000)
+            last = messages[-1]
+            if isinstance(last, HumanMessage) and calls.get(last.content):
+                message = AIMessage("", tool_calls=[{"name": "retrieval", "args": calls[last.content], "id": "r1"}])
+            else:
+                message = AIMessage(f"Answer to: {str(last.content)[:40]}")
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+        @property
+        def _llm_type(self):
+            return "stand-in"
+
+    def search(query, **kwargs):
+        time.sleep(args.retrieval_ms / 1000)
+        return [Node(f"Guest matching {query}")]
+
+    for tier in router.tiers.values():
+        tier.model, tier.fallback = StandInModel(), None
+    retriver.retrieve = search
+    speculative_retrieval.retrieve = search
+
+    def run(message: str, thread_id: str):
+        config = {"configurable": {"thread_id": thread_id}}
+        start = time.perf_counter()
+        for _ in graph.stream({"messages": [HumanMessage(content=message)]}, config, stream_mode="values"):
+            pass
+        elapsed = time.perf_counter() - start
+        final = graph.get_state(config).values["messages"][-1]
+        return elapsed * 1000, final.response_metadata.get("speculative_retrieval")
+
+    print(f"{'off ms':>8} {'on ms':>8} {'outcome':>8} {'saved ms':>9}  message")
+    for i, (message, _) in enumerate(TURNS):
+        speculative_retrieval.enabled = False
+        off_ms, _ = run(message, f"off-{i}")
+        speculative_retrieval.enabled = True
+        on_ms, speculation = run(message, f"on-{i}")
+        print(f"{off_ms:>8.1f} {on_ms:>8.1f} {speculation['outcome']:>8} {speculation['saved_ms']:>9.1f}  {message}")
+
+    stats = speculative_retrieval.get_stats()
+    print(f"\nHit rate (turns that called retrieval): {stats['hit_rate']:.0%} "
+          f"({stats['hits']} hits, {stats['misses']} misses, {stats['unused']} turns without retrieval)")
+    print(f"Latency saved: {stats['saved_seconds'] * 1000:.0f} ms total, p50 {stats['saved_p50'] * 1000:.0f} ms per hit")
+    print(f"Background retrieval spent on misses and unused turns: {stats['wasted_seconds'] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
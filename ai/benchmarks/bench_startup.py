@@ -0,0 +1,92 @@
+"""
+Startup-time budget for the API process.
+
+Imports `api` in a fresh interpreter under `python -X importtime`, prints
+the slowest top-level imports and fails if the total exceeds the budget or
+if any heavy dependency was imported eagerly.
+
+Run from the ai directory:
+    python benchmarks/bench_startup.py [--budget-ms 1500]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+AI_DIR = Path(__file__).resolve().parent.parent
+
+# Modules that must only load on the code paths that use them.
+LAZY_MODULES = [
+    "torch",
+    "datasets",
+    "chromadb",
+    "llama_index",
+    "langchain_openai",
+    "langchain_tavily",
+    "langchain_mcp_adapters",
+    "retriver",
+]
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure():
+    """
+    Import the API in a subprocess.
+
+    Returns:
+        (total_us, {module imported by api: cumulative_us}, eagerly imported lazy modules)
+    """
+    probe = (
+        "import sys, api; "
+        f"print('EAGER:' + ','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    env = {**os.environ, "PRELOAD_RETRIEVER": "false"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=AI_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr[-2000:])
+
+    total_us, children = 0, {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        depth = len(match.group(3))
+        if depth == 1:
+            total_us += int(match.group(2))
+        elif depth == 3:
+            # Direct imports of a top-level module; for `api` these are our modules and frameworks
+            children[match.group(4)] = int(match.group(2))
+    eager = result.stdout.strip().split("EAGER:")[-1]
+    return total_us, children, [m for m in eager.split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "1500")))
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    total_us, children, eager = measure()
+    total_ms = total_us / 1000
+    print(f"Total import time: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for module, us in sorted(children.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"  {us / 1000:8.1f} ms  {module}")
+
+    failed = False
+    if eager:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: startup import time over budget by {total_ms - args.budget_ms:.0f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
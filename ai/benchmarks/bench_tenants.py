@@ -0,0 +1,183 @@
+"""
+Multi-tenant guest index scaling benchmark.
+
+Ingests `--tenants` guest lists (default 1,000 hosts with 20 guests each)
+through `retriver.ingest_guests`, then runs `--queries` retrievals spread
+over all tenants (a few popular hosts get most traffic, as in production)
+through `retriver.retrieve`, in a fresh process per configuration:
+
+  - bounded:   TENANT_POOL_SIZE=--pool and CHROMA_MEMORY_LIMIT_BYTES set
+  - unbounded: every tenant's index stays open and Chroma keeps every
+               collection it loaded (the pool sized to all tenants)
+
+For each it reports resident memory and p50/p95 query latency per window
+of queries, the pool's hit rate and evictions. Embeddings come from a
+deterministic hash model so the run measures the stores, not the
+embedding model (`--embed bge` uses the real one).
+
+Run from the ai directory:
+    python benchmarks/bench_tenants.py [--tenants 1000] [--guests 20] [--queries 5000] [--pool 32]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+AI_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AI_DIR))
+
+RELATIONS = ["best friend", "colleague from work", "cousin", "old friend from university", "neighbor", "sister"]
+TOPICS = ["mathematics", "music", "physics", "cooking", "poetry", "chess", "film", "gardening"]
+QUERIES = ["friends who like {}", "who could talk about {}", "guests into {}", "{} enthusiasts"]
+
+
+def rss_mb() -> float:
+    """Current resident set size (peak size where /proc isn't available)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def guests_for(tenant: int, count: int):
+    rng = random.Random(tenant)
+    return [
+        {"name": f"Guest {tenant}-{i}", "relation": rng.choice(RELATIONS),
+         "description": f"Guest {i} of host {tenant} loves {rng.choice(TOPICS)} and {rng.choice(TOPICS)}.",
+         "email": f"guest{i}@host{tenant}.example.com"}
+        for i in range(count)
+    ]
+
+
+def embed_model(kind: str):
+    from llama_index.core.embeddings import BaseEmbedding
+
+    if kind == "bge":
+        import retriver
+
+        return retriver.get_embed_model()
+
+    class HashEmbedding(BaseEmbedding):
+        """Deterministic pseudo-embeddings: same text, same vector."""
+
+        dim: int = 384
+
+        def _vector(self, text: str):
+            rng = random.Random(hashlib.sha1(text.encode("utf-8")).digest())
+            return [rng.gauss(0, 1) for _ in range(self.dim)]
+
+        def _get_query_embedding(self, query):
+            return self._vector(query)
+
+        async def _aget_query_embedding(self, query):
+            return self._vector(query)
+
+        def _get_text_embedding(self, text):
+            return self._vector(text)
+
+    return HashEmbedding()
+
+
+def use_embed_model(kind: str):
+    import retriver
+
+    model = embed_model(kind)
+    retriver.get_embed_model = lambda: model
+
+
+def ingest(args):
+    import retriver
+
+    use_embed_model(args.embed)
+    start = time.perf_counter()
+    for tenant in range(args.tenants):
+        retriver.ingest_guests(f"host{tenant}", guests_for(tenant, args.guests))
+    elapsed = time.perf_counter() - start
+    print(f"Ingested {args.tenants} tenants x {args.guests} guests in {elapsed:.1f} s "
+          f"({args.tenants * args.guests / elapsed:.0f} guests/s), RSS {rss_mb():.0f} MB")
+
+
+def query(args):
+    import retriver
+    from tenants import tenant_indexes
+
+    use_embed_model(args.embed)
+    rng = random.Random(7)
+    # Zipf-like popularity: host k gets traffic proportional to 1 / (k + 1).
+    weights = [1 / (k + 1) for k in range(args.tenants)]
+    tenants = rng.choices(range(args.tenants), weights=weights, k=args.queries)
+    window = max(1, args.queries // 5)
+    rows, latencies = [], []
+    for i, tenant in enumerate(tenants, 1):
+        text = rng.choice(QUERIES).format(rng.choice(TOPICS))
+        start = time.perf_counter()
+        retriver.retrieve(text, tenant=f"host{tenant}")
+        latencies.append((time.perf_counter() - start) * 1000)
+        if i % window == 0:
+            ordered = sorted(latencies)
+            rows.append({"queries": i, "rss_mb": round(rss_mb()), "p50_ms": round(statistics.median(ordered), 2),
+                         "p95_ms": round(ordered[int(len(ordered) * 0.95)], 2),
+                         "open": tenant_indexes.get_stats()["open"]})
+            latencies = []
+    print(json.dumps({"rows": rows, "pool": tenant_indexes.get_stats()}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenants", type=int, default=1000)
+    parser.add_argument("--guests", type=int, default=20, help="Guests per tenant")
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--pool", type=int, default=32, help="TENANT_POOL_SIZE for the bounded run")
+    parser.add_argument("--chroma-memory-mb", type=int, default=64, help="CHROMA_MEMORY_LIMIT_BYTES for the bounded run")
+    parser.add_argument("--backend", choices=["auto", "chroma", "numpy"], default="auto")
+    parser.add_argument("--embed", choices=["hash", "bge"], default="hash")
+    parser.add_argument("--data-dir", help="Reuse (or keep) the ingested stores here")
+    parser.add_argument("--phase", choices=["all", "ingest", "query"], default="all", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase == "ingest":
+        return ingest(args)
+    if args.phase == "query":
+        return query(args)
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="bench-tenants-")
+    common = [sys.executable, __file__, "--tenants", str(args.tenants), "--guests", str(args.guests),
+              "--queries", str(args.queries), "--embed", args.embed]
+    env = {**os.environ, "VECTOR_BACKEND": args.backend, "TENANT_VECTOR_DIR": os.path.join(data_dir, "vectors"),
+           "GUEST_STORE_DIR": os.path.join(data_dir, "guests"),
+           "PYTHONPATH": os.pathsep.join(filter(None, [str(AI_DIR), os.environ.get("PYTHONPATH")]))}
+    if not os.path.exists(os.path.join(data_dir, "ingested")):
+        subprocess.run(common + ["--phase", "ingest"], cwd=data_dir, env=env, check=True)
+        Path(data_dir, "ingested").touch()
+
+    configs = {
+        "bounded": {"TENANT_POOL_SIZE": str(args.pool), "CHROMA_MEMORY_LIMIT_BYTES": str(args.chroma_memory_mb << 20)},
+        "unbounded": {"TENANT_POOL_SIZE": str(args.tenants + 1), "CHROMA_MEMORY_LIMIT_BYTES": "0"},
+    }
+    for name, overrides in configs.items():
+        out = subprocess.run(common + ["--phase", "query"], cwd=data_dir, env={**env, **overrides},
+                             check=True, capture_output=True, text=True).stdout
+        report = json.loads(out.strip().splitlines()[-1])
+        pool = report["pool"]
+        print(f"\n{name}: pool {pool['capacity']}, hit rate {pool['hit_rate']:.1%}, "
+              f"{pool['opens']} opens, {pool['evictions']} evictions")
+        print(f"{'queries':>8} {'RSS MB':>7} {'open':>5} {'p50 ms':>7} {'p95 ms':>7}")
+        for row in report["rows"]:
+            print(f"{row['queries']:>8} {row['rss_mb']:>7} {row['open']:>5} {row['p50_ms']:>7} {row['p95_ms']:>7}")
+    print(f"\nStores kept in {data_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Vector store benchmark: memory-mapped NumPy engine vs Chroma.
+
+For each size (1k/100k/1M 384-d vectors, the size of bge-small) it builds a
+NumPy snapshot and a Chroma collection from the same clustered embeddings,
+then opens each store in a fresh process and reports top-5 query latency
+and resident memory after the queries. RSS is split into anonymous memory
+(private to the process) and file-backed memory (page cache, shared by
+every worker that maps the same snapshot).
+
+Run from the ai directory:
+    python benchmarks/bench_vector_engine.py [--sizes 1000 100000 1000000] [--chroma-max 1000000]
+"""
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+AI_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AI_DIR))
+
+DIM = 384
+CENTERS = np.random.default_rng(42).standard_normal((500, DIM)).astype(np.float32)
+
+
+def clustered_vectors(rng, n: int):
+    vectors = CENTERS[rng.integers(len(CENTERS), size=n)] + 0.5 * rng.standard_normal((n, DIM), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def rss_kb():
+    """(anonymous, file-backed) resident memory of this process in KB."""
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("RssAnon", "RssFile"):
+                fields[key] = int(value.split()[0])
+    return fields.get("RssAnon", 0), fields.get("RssFile", 0)
+
+
+def build(n: int, workdir: str, dtype: str, with_chroma: bool):
+    from vector_engine import write_snapshot
+
+    vectors = clustered_vectors(np.random.default_rng(0), n)
+    metadatas = [{"relation_category": ("family", "friend", "colleague", "other")[i % 4]} for i in range(n)]
+    ids = [f"guest-{i}" for i in range(n)]
+    texts = [f"Guest {i}" for i in range(n)]
+
+    start = time.perf_counter()
+    write_snapshot(f"{workdir}/numpy", ids, vectors, texts, metadatas, dtype=dtype)
+    print(f"  numpy snapshot built in {time.perf_counter() - start:.1f}s")
+
+    if with_chroma:
+        import chromadb
+
+        start = time.perf_counter()
+        collection = chromadb.PersistentClient(path=f"{workdir}/chroma").create_collection(
+            "guests", metadata={"hnsw:space": "cosine"}
+        )
+        for i in range(0, n, 5000):
+            collection.add(ids=ids[i:i + 5000], embeddings=vectors[i:i + 5000].tolist(),
+                           documents=texts[i:i + 5000], metadatas=metadatas[i:i + 5000])
+        print(f"  chroma collection built in {time.perf_counter() - start:.1f}s")
+
+
+def child(backend: str, workdir: str, queries: int):
+    """Open one store and query it; prints a JSON result line."""
+    if backend == "numpy":
+        from vector_engine import MemmapVectorIndex
+    else:
+        import chromadb
+
+    base_anon, base_file = rss_kb()
+    query_vectors = clustered_vectors(np.random.default_rng(1), queries)
+
+    start = time.perf_counter()
+    if backend == "numpy":
+        index = MemmapVectorIndex(f"{workdir}/numpy")
+        search = lambda q: [record["text"] for record in index.query_records(q, 5)[0]]
+    else:
+        collection = chromadb.PersistentClient(path=f"{workdir}/chroma").get_collection("guests")
+        search = lambda q: collection.query(query_embeddings=[q.tolist()], n_results=5)["documents"][0]
+    search(query_vectors[0])
+    open_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for query in query_vectors:
+        start = time.perf_counter()
+        search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    anon, file_ = rss_kb()
+    print(json.dumps({
+        "open_ms": open_ms,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "anon_mb": (anon - base_anon) / 1024,
+        "file_mb": (file_ - base_file) / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dtype", default="float32")
+    parser.add_argument("--chroma-max", type=int, default=1_000_000, help="Skip Chroma above this size")
+    parser.add_argument("--child", nargs=2, metavar=("BACKEND", "WORKDIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], args.queries)
+        return
+
+    rows = []
+    for n in args.sizes:
+        workdir = tempfile.mkdtemp(prefix="bench_vectors_")
+        print(f"{n:,} vectors:")
+        build(n, workdir, args.dtype, n <= args.chroma_max)
+        for backend in ["numpy", "chroma"] if n <= args.chroma_max else ["numpy"]:
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", backend, workdir, "--queries", str(args.queries)],
+                capture_output=True, text=True, check=True, cwd=AI_DIR,
+            ).stdout.strip().splitlines()[-1]
+            rows.append((n, backend, json.loads(out)))
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'vectors':>10} {'backend':>8} {'open ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'anon MB':>9} {'file MB':>9}")
+    for n, backend, r in rows:
+        print(f"{n:>10,} {backend:>8} {r['open_ms']:>9.1f} {r['p50']:>8.3f} {r['p95']:>8.3f} "
+              f"{r['anon_mb']:>9.1f} {r['file_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Chaos run for the circuit breakers, against local stand-ins.
+
+Starts one local HTTP server that stands in for Tavily (`/search`), the
+primary and secondary OpenAI endpoints (`/primary/v1`, `/secondary/v1`) and
+the GitHub MCP endpoint (`/mcp`), points the app at it, and injects
+latency and errors per dependency:
+
+  1. healthy   - calls go through and results are cached
+  2. outage    - every call waits `--latency` seconds, then fails with a 503;
+                 the breaker opens after its threshold and later calls fail
+                 fast or serve the cached result marked as stale
+  3. recovered - after the recovery timeout a half-open probe closes it
+
+Run from the ai directory:
+    python benchmarks/chaos_breakers.py [--latency 2] [--calls 6]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# target -> {"latency": seconds, "status": HTTP status}
+FAULTS = {"tavily": {}, "primary": {}, "secondary": {}, "mcp": {}}
+
+
+class StandIn(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        target = "tavily" if self.path == "/search" else self.path.strip("/").split("/")[0]
+        fault = FAULTS.get(target, {})
+        time.sleep(fault.get("latency", 0))
+        status = fault.get("status", 200) if target != "mcp" else fault.get("status", 503)
+        if status != 200:
+            self._send(status, {"error": {"message": "injected failure"}, "detail": "injected failure"})
+        elif target == "tavily":
+            self._send(200, {"query": body.get("query"), "response_time": 0.01, "results": [
+                {"title": "Venue guide", "url": "https://example.com/venues", "content": "Rooftop venues", "score": 0.9},
+            ]})
+        else:
+            self._send(200, {
+                "id": "chatcmpl-standin", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "stand-in"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": f"answer from {target}"}}],
+                "usage": {"prompt_tokens": 5, "completion_tokens": 3, "total_tokens": 8},
+            })
+
+    do_GET = do_POST
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed(fn):
+    start = time.perf_counter()
+    try:
+        result = str(fn())
+    except Exception as e:
+        result = f"raised {type(e).__name__}: {e}"
+    return (time.perf_counter() - start) * 1000, result
+
+
+def outcome(text: str) -> str:
+    if text.startswith("[STALE"):
+        return "stale"
+    if "temporarily unavailable" in text or "CircuitOpenError" in text:
+        return "fail fast"
+    if text.startswith("raised") or "Error" in text:
+        return "error"
+    return "fresh"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=2.0, help="Seconds each failing call takes")
+    parser.add_argument("--calls", type=int, default=6, help="Calls per phase during the outage")
+    parser.add_argument("--recovery", type=float, default=3.0, help="Breaker recovery timeout in seconds")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    os.environ.update({
+        "TAVILY_API_KEY": "stand-in", "TAVILY_API_BASE_URL": base,
+        "OPENAI_API_KEY": "stand-in", "OPENAI_BASE_URL": f"{base}/primary/v1",
+        "FALLBACK_OPENAI_BASE_URL": f"{base}/secondary/v1",
+        "GITHUB_MCP_URL": f"{base}/mcp/", "GITHUB_TOKEN": "stand-in",
+        "CHECKPOINT_DB": "", "PRELOAD_RETRIEVER": "false",
+        **{f"{name}_BREAKER_RECOVERY_SECONDS": str(args.recovery) for name in ("OPENAI", "TAVILY", "MCP")},
+    })
+
+    from langchain_core.messages import HumanMessage
+
+    from breakers import circuit_breakers
+    from graph import router
+    from tools import get_mcp_tools, web_search
+
+    scenarios = {
+        "tavily": (["tavily"], lambda: web_search.invoke({"query": "party venues"})),
+        "openai": (["primary"], lambda: router.invoke_tier(router.tiers["fast"], [HumanMessage("hi")]).content),
+        "mcp": (["mcp"], lambda: get_mcp_tools("list tools")),
+    }
+
+    print(f"{'dependency':>10} {'phase':>10} {'call':>4} {'ms':>8} {'outcome':>10} {'breaker':>10}  result")
+    for name, (targets, call) in scenarios.items():
+        breaker = circuit_breakers.get(name)
+        phases = [("healthy", 2, {}), ("outage", args.calls, {"latency": args.latency, "status": 503})]
+        if name == "mcp":
+            # No MCP stand-in protocol: the endpoint is always down, so there is no healthy phase.
+            phases = [("outage", args.calls, {"latency": args.latency})]
+        for phase, calls, fault in phases:
+            for target in targets:
+                FAULTS[target] = fault
+            for i in range(calls):
+                ms, text = timed(call)
+                print(f"{name:>10} {phase:>10} {i + 1:>4} {ms:>8.1f} {outcome(text):>10} {breaker.state:>10}  "
+                      f"{text.splitlines()[0][:60]}")
+        if name != "mcp":
+            for target in targets:
+                FAULTS[target] = {}
+            time.sleep(args.recovery)
+            for i in range(2):
+                ms, text = timed(call)
+                time.sleep(0.2)  # let a background revalidation finish
+                print(f"{name:>10} {'recovered':>10} {i + 1:>4} {ms:>8.1f} {outcome(text):>10} "
+                      f"{breaker.state:>10}  {text.splitlines()[0][:60]}")
+        print()
+
+    print(json.dumps({name: {k: v for k, v in snap.items() if k in ("state", "opened", "rejected", "stale_served")}
+                      for name, snap in circuit_breakers.snapshot().items()}, indent=2))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
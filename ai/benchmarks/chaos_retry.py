@@ -0,0 +1,176 @@
+"""
+Chaos run for node retries and resuming failed turns, against stand-ins.
+
+Runs turns through the graph with a stand-in chat model (`--llm-ms` per
+call), guest search and web search (`--tool-ms` per call), and injects
+connection errors at one point of the turn at a time:
+
+  - routing model:    the agent's first model call
+  - web_search:       the agent's tool step (it searches guests and the web)
+  - synthesis model:  the agent's model call after the tools
+  - guest list:       reading the guests for "draft invitations for everyone"
+
+Each point fails for a `blip` (one call) and for an `outage` (as many calls
+as NODE_RETRY_ATTEMPTS, so the turn fails even with retries), then
+recovers:
+
+  - before: no node retries; the user sends the message again until the
+    turn completes, as they did after "An error occurred"
+  - after:  node retries with backoff; a turn that still fails is finished
+    with `resume_failed_turn`, what `POST /retry/{thread_id}` runs
+
+It reports the turns the user had to retry, the external calls that
+succeeded more often than a clean run needs (repeated work), the user
+messages the thread ended up with and the wall-clock time (without the
+time a user takes to notice the error and resend). Breakers are set not
+to open so the failures reach the nodes. The fast path makes no external
+calls and is left out.
+
+Run from the ai directory:
+    python benchmarks/chaos_retry.py [--llm-ms 800] [--tool-ms 300] [--guests 5]
+"""
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+POINTS = ["routing model", "web_search", "synthesis model", "guest list"]
+PLAN = "Plan a music night for my friends"
+DRAFT = "Draft personalized invitations for everyone"
+
+
+@dataclass
+class Node:
+    text: str
+    score: float = 0.9
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-ms", type=float, default=800, help="Latency of each model call")
+    parser.add_argument("--tool-ms", type=float, default=300, help="Latency of each guest or web search")
+    parser.add_argument("--guests", type=int, default=5, help="Guests in the drafting turns")
+    args = parser.parse_args()
+
+    os.environ.update({"OPENAI_API_KEY": "stand-in", "CHECKPOINT_DB": "", "INTENT_FAST_PATH": "false",
+                       "PRELOAD_RETRIEVER": "false", "CASSETTE_MODE": "off", "SPECULATIVE_RETRIEVAL": "false",
+                       "OPENAI_BREAKER_FAILURES": "1000", "TAVILY_BREAKER_FAILURES": "1000"})
+
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    import retriver
+    import tools
+    from drafting import invitation_drafter
+    from graph import graph, router
+    from helper import resume_failed_turn
+    from retries import node_retries
+
+    fault = {"point": None, "left": 0}
+    succeeded: Dict[str, int] = {}
+
+    def call(point: str, seconds: float):
+        time.sleep(seconds)
+        if fault["point"] == point and fault["left"] > 0:
+            fault["left"] -= 1
+            raise ConnectionError(f"injected {point} failure")
+        succeeded[point] = succeeded.get(point, 0) + 1
+
+    class StandInModel(BaseChatModel):
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            last = messages[-1]
+            if isinstance(last, HumanMessage) and "Guest:\nName: " in last.content:
+                call("draft model", args.llm_ms / 1000)
+                message = AIMessage(f"Dear {last.content.split('Name: ')[1].splitlines()[0]}, please come!")
+            elif isinstance(last, ToolMessage):
+                call("synthesis model", args.llm_ms / 1000)
+                message = AIMessage("A vinyl listening night with your jazz-loving friends.")
+            else:
+                call("routing model", args.llm_ms / 1000)
+                request = next(m.content for m in reversed(messages) if isinstance(m, HumanMessage))
+                message = AIMessage("", tool_calls=[
+                    {"name": "retrieval", "args": {"query": request}, "id": "r1"},
+                    {"name": "web_search", "args": {"query": request}, "id": "w1"},
+                ])
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+        @property
+        def _llm_type(self):
+            return "stand-in"
+
+    def search(query, **kwargs):
+        call("retrieval", args.tool_ms / 1000)
+        return [Node(f"Guest matching {query}")]
+
+    def search_web(query):
+        call("web_search", args.tool_ms / 1000)
+        return f"Ideas for {query}"
+
+    def load_guests(tenant, relation):
+        call("guest list", args.tool_ms / 1000)
+        return [{"name": f"Guest {i}", "relation": "friend", "description": "", "email": ""}
+                for i in range(args.guests)]
+
+    for tier in router.tiers.values():
+        tier.model, tier.fallback = StandInModel(), None
+    retriver.retrieve = search
+    tools.search_web = search_web
+    invitation_drafter.guest_loader = load_guests
+    invitation_drafter.guest_counter = lambda tenant, relation: args.guests
+
+    def run(point: str, failures: int, path: str, run_id: str):
+        """One turn until it completes; returns (user retries, repeated calls, user messages, seconds)."""
+        message = DRAFT if point == "guest list" else f"{PLAN} ({run_id})"
+        config = {"configurable": {"thread_id": run_id}}
+        node_retries.enabled = path == "after"
+        fault.update(point=point, left=failures)
+        succeeded.clear()
+        retries, start = 0, time.perf_counter()
+        try:
+            list(graph.stream({"messages": [HumanMessage(message)]}, config, stream_mode="values"))
+        except Exception:
+            while True:
+                retries += 1
+                if path == "after":
+                    if resume_failed_turn(run_id)[1] != "error":
+                        break
+                    continue
+                try:
+                    list(graph.stream({"messages": [HumanMessage(message)]}, config, stream_mode="values"))
+                    break
+                except Exception:
+                    pass
+        elapsed = time.perf_counter() - start
+        clean = {"guest list": 1, "draft model": args.guests} if point == "guest list" else \
+            {"routing model": 1, "retrieval": 1, "web_search": 1, "synthesis model": 1}
+        repeated = sum(count - clean.get(name, 0) for name, count in succeeded.items())
+        users = sum(1 for m in graph.get_state(config).values["messages"] if isinstance(m, HumanMessage))
+        return retries, repeated, users, elapsed
+
+    print(f"Stand-in model: {args.llm_ms:.0f} ms per call, searches: {args.tool_ms:.0f} ms, "
+          f"{node_retries.max_attempts} attempts per node, first backoff {node_retries.initial_interval:g} s\n")
+    print(f"{'failure at':<16} {'kind':<7} {'path':<7} {'user retries':>12} {'repeated calls':>14} "
+          f"{'user messages':>13} {'seconds':>7}")
+    for point in POINTS:
+        for kind, failures in (("blip", 1), ("outage", node_retries.max_attempts)):
+            for path in ("before", "after"):
+                retries, repeated, users, elapsed = run(point, failures, path, f"{point}-{kind}-{path}")
+                print(f"{point:<16} {kind:<7} {path:<7} {retries:>12} {repeated:>14} {users:>13} {elapsed:>7.2f}")
+
+    stats = node_retries.get_stats()
+    print(f"\nNode failures: {stats['transient_errors']} transient, {stats['permanent_errors']} permanent; "
+          f"turns resumed: {stats['turns_resumed']}")
+
+
+if __name__ == "__main__":
+    main()
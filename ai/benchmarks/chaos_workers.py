@@ -0,0 +1,203 @@
+"""
+Chaos run for several API workers sharing one CHECKPOINT_DB, against stand-ins.
+
+Starts `--workers` API processes (uvicorn, one per port) on the same SQLite
+file with a stand-in chat model, and spreads each conversation over them:
+
+  1. interrupt - `/chat` on one worker asks for human input; another
+                 worker reports the thread as waiting (`/status`,
+                 `/interrupts`, `/threads`) and answers it with `/resume`;
+                 a third `/chat` goes back to the first worker
+  2. agree     - every worker then reports the same conversation, and the
+                 thread registry's message count and status on each worker
+                 match the checkpointed state
+  3. cancel    - two background jobs are queued on one worker (the second
+                 waits behind the first on the same thread) and cancelled
+                 through another: the cancel answers "cancelling", both jobs
+                 end "cancelled" on every worker, and the queued job's
+                 message never reaches the thread
+
+Each check prints ok or FAILED; the exit status is 1 if any failed.
+
+Run from the ai directory:
+    python benchmarks/chaos_workers.py [--workers 3] [--threads 6] [--slow-ms 1500]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+ASK = "Ask the host which date works"
+SLOW = "Slowly plan the seating"
+
+
+def serve(port: int, slow_ms: float):
+    """Worker process: the API with a stand-in model."""
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    import uvicorn
+
+    import api
+    from graph import router
+
+    class StandInModel(BaseChatModel):
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            last = messages[-1]
+            request = next(m.content for m in reversed(messages) if isinstance(m, HumanMessage))
+            if SLOW in request:
+                time.sleep(slow_ms / 1000)
+            if isinstance(last, ToolMessage):
+                message = AIMessage(f"Noted: {last.content}")
+            elif isinstance(last, HumanMessage) and ASK in last.content:
+                message = AIMessage("", tool_calls=[{"name": "human_assistance", "args": {"query": "Which date?"},
+                                                     "id": "h1"}])
+            elif isinstance(last, HumanMessage) and SLOW in last.content:
+                message = AIMessage("", tool_calls=[{"name": "web_search", "args": {"query": "seating"},
+                                                     "id": "w1"}])
+            else:
+                message = AIMessage(f"Got it: {request}")
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+        def bind_tools(self, tools, **kwargs):
+            return self
+
+        @property
+        def _llm_type(self):
+            return "stand-in"
+
+    import tools
+
+    tools.search_web = lambda query: f"Ideas for {query}"
+    for tier in router.tiers.values():
+        tier.model, tier.fallback = StandInModel(), None
+    uvicorn.run(api.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+class Checks:
+    def __init__(self):
+        self.failed = 0
+
+    def __call__(self, label: str, ok: bool, detail: str = ""):
+        self.failed += not ok
+        print(f"  {'ok' if ok else 'FAILED':<6} {label}" + (f" ({detail})" if detail and not ok else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=6, help="Conversations spread over the workers")
+    parser.add_argument("--slow-ms", type=float, default=1500, help="Model latency in the cancelled jobs")
+    parser.add_argument("--port", type=int, default=8300, help="First worker's port")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve, args.slow_ms)
+        return
+
+    import httpx
+
+    data_dir = tempfile.mkdtemp(prefix="chaos_workers_")
+    env = {**os.environ, "OPENAI_API_KEY": "stand-in", "CHECKPOINT_DB": os.path.join(data_dir, "state.db"),
+           "INTENT_FAST_PATH": "false", "PRELOAD_RETRIEVER": "false", "CASSETTE_MODE": "off",
+           "SPECULATIVE_RETRIEVAL": "false", "DRAFT_FAN_OUT": "false", "JOB_LEASE_SECONDS": "6",
+           "RATE_LIMIT_PER_MINUTE": "100000", "RATE_LIMIT_BURST": "100000", "INBOX_POLL_INTERVAL": "0.2"}
+    ports = [args.port + i for i in range(args.workers)]
+    processes = [subprocess.Popen([sys.executable, __file__, "--serve", str(port), "--slow-ms", str(args.slow_ms)],
+                                  cwd=data_dir, env=env) for port in ports]
+    workers = [httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) for port in ports]
+    check = Checks()
+    try:
+        _wait_ready(workers)
+        print(f"{args.workers} workers on {env['CHECKPOINT_DB']}\n\n1. interrupt / resume across workers")
+        threads = [f"chaos-{i}" for i in range(args.threads)]
+        for i, thread_id in enumerate(threads):
+            first, second = workers[i % len(workers)], workers[(i + 1) % len(workers)]
+            asked = first.post("/chat", json={"thread_id": thread_id, "message": ASK, "owner": "chaos"}).json()
+            status = second.get(f"/status/{thread_id}").json()
+            interrupts = second.get("/interrupts", params={"owner": "chaos"}).json()["interrupts"]
+            waiting = {interrupt["thread_id"] for interrupt in interrupts}
+            check(f"{thread_id}: asked on :{first.base_url.port}, waiting on :{second.base_url.port}",
+                  asked["status"] == "waiting_for_input" and status["status"] == "waiting_for_input"
+                  and thread_id in waiting, f"chat {asked['status']}, status {status['status']}")
+            resumed = second.post("/resume", json={"thread_id": thread_id, "response_data": "Saturday"}).json()
+            final = first.post("/chat", json={"thread_id": thread_id, "message": "Thanks", "owner": "chaos"}).json()
+            check(f"{thread_id}: resumed on :{second.base_url.port}, next turn on :{first.base_url.port}",
+                  resumed["status"] == "completed" and final["status"] == "completed",
+                  f"resume {resumed['status']}, chat {final['status']}")
+
+        print("\n2. every worker agrees with the checkpointed state")
+        for worker in workers:
+            registry = {t["thread_id"]: t for t in worker.get("/threads", params={"owner": "chaos", "limit": 500})
+                        .json()["threads"]}
+            waiting = worker.get("/interrupts", params={"owner": "chaos"}).json()["interrupts"]
+            mismatched = []
+            for thread_id in threads:
+                conversation = worker.get(f"/conversation/{thread_id}", params={"max_messages": 1000}).json()
+                entry = registry.get(thread_id, {})
+                status = worker.get(f"/status/{thread_id}").json()["status"]
+                if (entry.get("message_count") != conversation["message_count"] or entry.get("status") != "ready"
+                        or status != "ready"):
+                    mismatched.append(f"{thread_id}: {conversation['message_count']} messages, registry "
+                                      f"{entry.get('message_count')} {entry.get('status')}, status {status}")
+            check(f":{worker.base_url.port} registry matches {len(threads)} threads, no interrupts left",
+                  not mismatched and not waiting, "; ".join(mismatched) or f"{len(waiting)} interrupts")
+
+        print("\n3. cancelling another worker's jobs")
+        owner, other = workers[0], workers[-1]
+        running = owner.post("/chat/jobs", json={"thread_id": "chaos-cancel", "message": SLOW}).json()
+        queued = owner.post("/chat/jobs", json={"thread_id": "chaos-cancel", "message": f"{SLOW} again"}).json()
+        _wait(lambda: other.get(f"/chat/jobs/{running['job_id']}").json()["status"] == "running", 10)
+        time.sleep(args.slow_ms / 2000)  # into its first model call
+        start = time.perf_counter()
+        # The queued job first, so it can't start in between when the running one stops.
+        answers = [other.post(f"/chat/jobs/{job['job_id']}/cancel").json()["status"] for job in (queued, running)]
+        check(f"cancel on :{other.base_url.port} answers cancelling", answers == ["cancelling", "cancelling"],
+              f"got {answers}")
+        done = _wait(lambda: all(other.get(f"/chat/jobs/{job['job_id']}").json()["status"] == "cancelled"
+                                 for job in (running, queued)), 30)
+        elapsed = time.perf_counter() - start
+        statuses = [[worker.get(f"/chat/jobs/{job['job_id']}").json()["status"] for job in (running, queued)]
+                    for worker in workers]
+        check(f"both jobs cancelled on every worker ({elapsed:.1f} s after the cancel)",
+              done and all(s == ["cancelled", "cancelled"] for s in statuses), f"got {statuses}")
+        history = owner.get("/conversation/chaos-cancel", params={"max_messages": 1000}).json()["conversation_history"]
+        check("the queued job never ran", all(m["content"] != f"{SLOW} again" for m in history))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    print(f"\n{check.failed} checks failed" if check.failed else "\nall checks passed")
+    sys.exit(1 if check.failed else 0)
+
+
+def _wait_ready(workers, timeout: float = 60):
+    def ready():
+        try:
+            return all(worker.get("/").status_code == 200 for worker in workers)
+        except Exception:
+            return False
+
+    if not _wait(ready, timeout):
+        raise SystemExit("Workers didn't start")
+
+
+def _wait(condition, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+if __name__ == "__main__":
+    main()
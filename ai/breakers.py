@@ -0,0 +1,272 @@
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from config import BREAKER_CACHE_SIZE, BREAKER_STALE_SECONDS, CIRCUIT_BREAKERS
+
+
+# Runs calls to dependencies whose clients have no timeout of their own
+# (`call_timeout`); a call that overruns is abandoned, not cancelled.
+_timeout_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="breaker-call")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open, retrying in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_dependency_failure(error: Exception) -> bool:
+    """Return False for 4xx responses other than 408/429: the service answered, the request was bad."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500:
+        return status in (408, 429)
+    return True
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker for one external dependency.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    calls are rejected without touching the dependency. Once
+    `recovery_timeout` seconds have passed it goes half-open and lets
+    `half_open_max_calls` probe calls through: a successful probe closes it,
+    a failed one opens it again. Calls slower than `slow_call_seconds` count
+    as failures even when they succeed, so a dependency that is degraded
+    rather than down still trips the breaker; with `call_timeout` set, the
+    caller stops waiting after that many seconds.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 slow_call_seconds: Optional[float] = None, call_timeout: Optional[float] = None,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.call_timeout = call_timeout
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.last_error: Optional[str] = None
+        self.stats = {"calls": 0, "failures": 0, "slow_calls": 0, "rejected": 0, "stale_served": 0, "opened": 0}
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a call may go through; moves an expired open breaker to half-open."""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    self.stats["rejected"] += 1
+                    return False
+                self.state = "half_open"
+                self._probes = 0
+            if self.state == "half_open":
+                if self._probes >= self.half_open_max_calls:
+                    self.stats["rejected"] += 1
+                    return False
+                self._probes += 1
+            return True
+
+    def record_success(self, elapsed: float = 0.0):
+        if self.slow_call_seconds is not None and elapsed > self.slow_call_seconds:
+            with self._lock:
+                self.stats["slow_calls"] += 1
+            self.record_failure(TimeoutError(f"slow call: {elapsed:.1f}s"))
+            return
+        with self._lock:
+            self.stats["calls"] += 1
+            self.consecutive_failures = 0
+            self.state = "closed"
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["failures"] += 1
+            self.consecutive_failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"[:200]
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.stats["opened"] += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def record_stale(self):
+        with self._lock:
+            self.stats["stale_served"] += 1
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call `fn` through the breaker; raises CircuitOpenError when rejected."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+        return self.invoke(fn, *args, **kwargs)
+
+    def invoke(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call `fn` and record the outcome; for callers already admitted by `allow()`."""
+        start = time.perf_counter()
+        try:
+            if self.call_timeout is None:
+                result = fn(*args, **kwargs)
+            else:
+                future = _timeout_executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+                try:
+                    result = future.result(timeout=self.call_timeout)
+                except FutureTimeoutError:
+                    raise TimeoutError(f"{self.name} did not answer within {self.call_timeout:.0f}s") from None
+        except Exception as e:
+            if is_dependency_failure(e):
+                self.record_failure(e)
+            else:
+                self.record_success()
+            raise
+        self.record_success(time.perf_counter() - start)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_after = self.retry_after()
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "recovery_timeout": self.recovery_timeout,
+                "retry_after": round(retry_after, 1),
+                "last_error": self.last_error,
+                **self.stats,
+            }
+
+
+class StaleCache:
+    """LRU of the last good result per call, kept for serving while a dependency is down."""
+
+    def __init__(self, max_entries: int = 256, max_age: float = 3600.0):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Return (value, age in seconds), or None if missing or older than max_age."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age > self.max_age:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value, age
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class CircuitBreakers:
+    """
+    Breakers and stale caches for every external dependency, by name.
+
+    `call_with_stale` is what the tools use: fresh results are cached, a
+    failure or an open breaker serves the cached result for the same call
+    (stale-if-error), and a half-open probe with a cached result runs in the
+    background while the caller gets the stale value (stale-while-revalidate).
+    """
+
+    def __init__(self, settings: Dict[str, Dict[str, Any]], cache_size: int = 256, stale_seconds: float = 3600.0):
+        self.settings = settings
+        self.cache_size = cache_size
+        self.stale_seconds = stale_seconds
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._caches: Dict[str, StaleCache] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="breaker-revalidate")
+        for name in settings:
+            self.get(name)
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name, **self.settings.get(name, {}))
+                self._caches[name] = StaleCache(self.cache_size, self.stale_seconds)
+            return self._breakers[name]
+
+    def call_with_stale(self, name: str, key: Hashable, fn: Callable[..., Any],
+                        *args, **kwargs) -> Tuple[Any, Optional[float]]:
+        """
+        Call a dependency, falling back to its last good result.
+
+        Args:
+            name: Dependency name (see config.CIRCUIT_BREAKERS)
+            key: Cache key identifying the call, e.g. the query
+            fn: The dependency call
+
+        Returns:
+            (result, None) for a fresh result, or (result, age in seconds) for a stale one
+
+        Raises:
+            CircuitOpenError: the breaker is open and nothing is cached for this key
+        """
+        breaker = self.get(name)
+        cache = self._caches[name]
+        if breaker.allow():
+            cached = cache.get(key) if breaker.state == "half_open" else None
+            if cached is not None:
+                self._executor.submit(self._probe, breaker, cache, key, fn, args, kwargs)
+                return self._serve_stale(breaker, cached)
+            try:
+                result = breaker.invoke(fn, *args, **kwargs)
+            except Exception:
+                cached = cache.get(key)
+                if cached is None:
+                    raise
+                return self._serve_stale(breaker, cached)
+            cache.put(key, result)
+            return result, None
+
+        cached = cache.get(key)
+        if cached is None:
+            raise CircuitOpenError(name, breaker.retry_after())
+        return self._serve_stale(breaker, cached)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+    def _probe(self, breaker: CircuitBreaker, cache: StaleCache, key: Hashable, fn, args, kwargs):
+        try:
+            cache.put(key, breaker.invoke(fn, *args, **kwargs))
+        except Exception:
+            pass
+
+    def _serve_stale(self, breaker: CircuitBreaker, cached: Tuple[Any, float]) -> Tuple[Any, float]:
+        breaker.record_stale()
+        return cached
+
+
+def mark_stale(result: Any, age: float, source: str) -> str:
+    """Prefix a cached tool result so the model knows it may be out of date."""
+    return f"[STALE: {source} is unavailable; this result was cached {age:.0f}s ago]\n{result}"
+
+
+circuit_breakers = CircuitBreakers(CIRCUIT_BREAKERS, cache_size=BREAKER_CACHE_SIZE, stale_seconds=BREAKER_STALE_SECONDS)
@@ -0,0 +1,252 @@
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from config import CASSETTE_DIR, CASSETTE_MODE, CASSETTE_SIMULATE_LATENCY
+
+
+MODES = ("off", "record", "replay")
+
+# Cassette replayed by `CassetteRecorder.replaying`, overriding the thread's own.
+_active_replay: contextvars.ContextVar[Optional["Cassette"]] = contextvars.ContextVar("active_replay", default=None)
+
+
+class CassetteExhausted(Exception):
+    """Raised in replay when the code asks for more interactions than were recorded."""
+
+
+class ReplayedError(Exception):
+    """An error recorded from a live call, raised again in replay."""
+
+
+class Cassette:
+    """
+    One thread's recorded interactions, consumed in order during replay.
+
+    Each entry has a `kind` ("model", "tavily", "mcp" or "turn"), a `key`
+    describing the request, its `latency` and either a `result` or an
+    `error`. Entries of one kind are replayed in recorded order; a request
+    whose key doesn't match the next entry takes the first unused entry
+    with a matching key, or else the next entry (counted as a mismatch),
+    so concurrent tool calls and small prompt changes still replay.
+    """
+
+    def __init__(self, thread_id: str, entries: List[Dict[str, Any]], simulate_latency: bool = False):
+        self.thread_id = thread_id
+        self.entries = entries
+        self.simulate_latency = simulate_latency
+        self.used = [False] * len(entries)
+        self.stats = {"replayed": 0, "mismatches": 0, "recorded_latency": 0.0}
+        self._lock = threading.Lock()
+
+    def next(self, kind: str, key: str) -> Dict[str, Any]:
+        with self._lock:
+            candidates = [i for i, e in enumerate(self.entries) if not self.used[i] and e["kind"] == kind]
+            if not candidates:
+                raise CassetteExhausted(f"No recorded {kind} interaction left in cassette {self.thread_id}")
+            index = next((i for i in candidates if self.entries[i]["key"] == key), None)
+            if index is None:
+                index = candidates[0]
+                self.stats["mismatches"] += 1
+            self.used[index] = True
+            self.stats["replayed"] += 1
+            self.stats["recorded_latency"] += self.entries[index]["latency"]
+            return self.entries[index]
+
+    def turns(self) -> List[Dict[str, Any]]:
+        return [e for e in self.entries if e["kind"] == "turn"]
+
+
+class CassetteRecorder:
+    """
+    Record or replay outbound model and tool I/O, per thread.
+
+    In "record" mode every model call (after routing, hedging and failover)
+    and every Tavily and MCP call is appended to `<directory>/<thread>.jsonl.gz`,
+    with its latency, along with the thread's user messages and resume
+    values ("turn" entries). In "replay" mode the same calls return the
+    recorded results instead of reaching the network, optionally sleeping
+    for the recorded latency. "off" calls straight through.
+    """
+
+    def __init__(self, directory: str, mode: str = "off", simulate_latency: bool = False):
+        self.directory = directory
+        self.mode = mode
+        self.simulate_latency = simulate_latency
+        self._replays: Dict[str, Cassette] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off" or _active_replay.get() is not None
+
+    def configure(self, mode: Optional[str] = None, simulate_latency: Optional[bool] = None) -> Dict[str, Any]:
+        """Switch mode; returns the current settings. Replay cassettes are reloaded on next use."""
+        if mode is not None:
+            if mode not in MODES:
+                raise ValueError(f"Cassette mode must be one of {', '.join(MODES)}")
+            self.mode = mode
+        if simulate_latency is not None:
+            self.simulate_latency = simulate_latency
+        with self._lock:
+            self._replays.clear()
+        return self.settings()
+
+    def settings(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "simulate_latency": self.simulate_latency, "directory": self.directory}
+
+    def call(self, kind: str, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run one outbound call through the recorder.
+
+        Args:
+            kind: "model", "tavily" or "mcp"
+            key: Short description of the request, used to match replays
+            fn: The live call
+
+        Returns:
+            The live result (off, record) or the recorded one (replay)
+        """
+        cassette = _active_replay.get()
+        if cassette is None and self.mode == "replay":
+            cassette = self._cassette(_current_thread_id())
+        if cassette is not None:
+            entry = cassette.next(kind, key)
+            if cassette.simulate_latency:
+                time.sleep(entry["latency"])
+            if "error" in entry:
+                raise ReplayedError(entry["error"])
+            return _decode(entry["result"])
+        if self.mode != "record":
+            return fn(*args, **kwargs)
+
+        thread_id = _current_thread_id()
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._append(thread_id, {"kind": kind, "key": key, "latency": _elapsed(start),
+                                     "error": f"{type(e).__name__}: {e}"})
+            raise
+        self._append(thread_id, {"kind": kind, "key": key, "latency": _elapsed(start), "result": _encode(result)})
+        return result
+
+    @staticmethod
+    def key(prefix: str, messages: Any) -> str:
+        """Key for a model call: the tier name plus a digest of the prompt messages."""
+        return messages_key(prefix, messages)
+
+    def wrap(self, kind: str, key: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """`fn` routed through `call`, for passing on to code that invokes it later."""
+        return lambda *args, **kwargs: self.call(kind, key, fn, *args, **kwargs)
+
+    def record_turn(self, turn_type: str, data: str):
+        """Record a user message ("message") or resume value ("resume") that starts a graph run."""
+        if self.mode == "record" and _active_replay.get() is None:
+            self._append(_current_thread_id(), {"kind": "turn", "key": turn_type, "latency": 0.0, "result": data})
+
+    @contextmanager
+    def replaying(self, thread_id: str, simulate_latency: bool = False) -> Iterator[Cassette]:
+        """Replay `thread_id`'s cassette for graph runs in this context, whatever thread they run on."""
+        cassette = Cassette(thread_id, self.load(thread_id), simulate_latency)
+        token = _active_replay.set(cassette)
+        try:
+            yield cassette
+        finally:
+            _active_replay.reset(token)
+
+    def load(self, thread_id: str) -> List[Dict[str, Any]]:
+        path = self.path(thread_id)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No cassette for thread {thread_id}")
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Recorded cassettes with their size and entry counts."""
+        if not os.path.isdir(self.directory):
+            return []
+        cassettes = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".jsonl.gz"):
+                continue
+            thread_id = name[:-len(".jsonl.gz")]
+            entries = self.load(thread_id)
+            counts: Dict[str, int] = {}
+            for entry in entries:
+                counts[entry["kind"]] = counts.get(entry["kind"], 0) + 1
+            cassettes.append({
+                "thread_id": thread_id,
+                "bytes": os.path.getsize(self.path(thread_id)),
+                "entries": counts,
+                "recorded_latency": round(sum(e["latency"] for e in entries), 4),
+            })
+        return cassettes
+
+    def path(self, thread_id: str) -> str:
+        return os.path.join(self.directory, f"{_safe_name(thread_id)}.jsonl.gz")
+
+    def _cassette(self, thread_id: str) -> Cassette:
+        with self._lock:
+            if thread_id not in self._replays:
+                self._replays[thread_id] = Cassette(thread_id, self.load(thread_id), self.simulate_latency)
+            return self._replays[thread_id]
+
+    def _append(self, thread_id: str, entry: Dict[str, Any]):
+        line = json.dumps(entry, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            # Each append is its own gzip member; readers see one continuous stream.
+            with gzip.open(self.path(thread_id), "at", encoding="utf-8") as f:
+                f.write(line)
+
+
+def messages_key(prefix: str, messages: Any) -> str:
+    """Key for a model call: the tier plus a digest of the prompt messages."""
+    digest = hashlib.sha1()
+    for message in messages if isinstance(messages, list) else [messages]:
+        content = getattr(message, "content", message)
+        tool_calls = [(c["name"], c["args"]) for c in getattr(message, "tool_calls", None) or []]
+        digest.update(f"{getattr(message, 'type', '')}:{content}:{tool_calls}\n".encode("utf-8"))
+    return f"{prefix}:{digest.hexdigest()[:16]}"
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, BaseMessage):
+        return {"__message__": message_to_dict(value)}
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict) and "__message__" in value:
+        return messages_from_dict([value["__message__"]])[0]
+    return value
+
+
+def _current_thread_id() -> str:
+    from langgraph.config import get_config
+
+    try:
+        return str(get_config()["configurable"].get("thread_id", "default"))
+    except RuntimeError:
+        return "default"
+
+
+def _safe_name(thread_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", thread_id)
+
+
+def _elapsed(start: float) -> float:
+    return round(time.perf_counter() - start, 4)
+
+
+cassettes = CassetteRecorder(CASSETTE_DIR, mode=CASSETTE_MODE, simulate_latency=CASSETTE_SIMULATE_LATENCY)
@@ -0,0 +1,178 @@
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from langchain_core.messages import BaseMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from config import CHECKPOINT_SERIALIZER
+
+try:
+    import zstandard
+except ImportError:  # zlib fallback keeps the serializer usable without the extra
+    zstandard = None
+
+
+# Message contents are replaced with this prefix + sha256 when stored as blobs.
+BLOB_REF = "\x00blob:"
+
+
+class BlobStore:
+    """
+    Content-addressed store for large message bodies.
+
+    Bodies are keyed by their sha256, so a retrieval result repeated in every
+    checkpoint of a thread is written once. Kept in memory, or in a `blobs`
+    table when a SQLite connection is given, with a small LRU read cache.
+    """
+
+    def __init__(self, conn=None, cache_size: int = 1024):
+        self._memory: Dict[str, bytes] = {}
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._conn = conn
+        if conn is not None:
+            conn.execute("CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, data BLOB)")
+            conn.commit()
+
+    def put(self, text: str, compress) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if digest in self._cache:
+                return digest
+            self._remember(digest, text)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO blobs (hash, data) VALUES (?, ?)", (digest, compress(text.encode("utf-8")))
+                )
+                self._conn.commit()
+            else:
+                self._memory.setdefault(digest, compress(text.encode("utf-8")))
+        return digest
+
+    def get(self, digest: str, decompress) -> str:
+        with self._lock:
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                return self._cache[digest]
+            if self._conn is not None:
+                row = self._conn.execute("SELECT data FROM blobs WHERE hash = ?", (digest,)).fetchone()
+                data = row[0] if row else None
+            else:
+                data = self._memory.get(digest)
+            if data is None:
+                raise KeyError(f"Missing checkpoint blob {digest}")
+            text = decompress(data).decode("utf-8")
+            self._remember(digest, text)
+            return text
+
+    def _remember(self, digest: str, text: str):
+        self._cache[digest] = text
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+
+class CompactSerializer:
+    """
+    Checkpoint serializer: msgpack (via JsonPlusSerializer) + zstd + blob dedup.
+
+    Message bodies of at least `min_blob_size` characters are moved to a
+    content-addressed BlobStore and replaced by a reference, then the
+    msgpack payload is zstd-compressed (zlib without `zstandard`). Payloads
+    written by the default serializer still load, so it can be switched on
+    for an existing database.
+    """
+
+    def __init__(self, blob_store: Optional[BlobStore] = None, min_blob_size: int = 1024,
+                 min_compress_size: int = 256, level: int = 3):
+        self.inner = JsonPlusSerializer()
+        self.blobs = blob_store or BlobStore()
+        self.min_blob_size = min_blob_size
+        self.min_compress_size = min_compress_size
+        if zstandard is not None:
+            self.codec = "zstd"
+            self._compressor = zstandard.ZstdCompressor(level=level)
+            self._decompressor = zstandard.ZstdDecompressor()
+        else:
+            self.codec = "zlib"
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(self._externalize(obj))
+        if len(data) < self.min_compress_size:
+            return type_, data
+        return f"{type_}+{self.codec}", self._compress(data)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        base, _, codec = type_.partition("+")
+        if codec:
+            payload = self._decompress(payload, codec)
+        return self._internalize(self.inner.loads_typed((base, payload)))
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return self._compressor.compress(data)
+        return zlib.compress(data, 6)
+
+    def _decompress(self, data: bytes, codec: Optional[str] = None) -> bytes:
+        if (codec or self.codec) == "zstd":
+            if zstandard is None:
+                raise RuntimeError("Checkpoint was written with zstd; install `zstandard` to read it")
+            return self._decompressor.decompress(data)
+        return zlib.decompress(data)
+
+    def _externalize(self, obj: Any) -> Any:
+        """Replace large message bodies with blob references (returns copies, never mutates)."""
+        if isinstance(obj, BaseMessage):
+            if isinstance(obj.content, str) and len(obj.content) >= self.min_blob_size:
+                digest = self.blobs.put(obj.content, self._compress)
+                return obj.model_copy(update={"content": BLOB_REF + digest})
+            return obj
+        if isinstance(obj, dict):
+            return {key: self._externalize(value) for key, value in obj.items()}
+        if isinstance(obj, list):
+            return [self._externalize(value) for value in obj]
+        if isinstance(obj, tuple) and not hasattr(obj, "_fields"):
+            return tuple(self._externalize(value) for value in obj)
+        return obj
+
+    def _internalize(self, obj: Any) -> Any:
+        """Resolve blob references back into message bodies (in place, objects are freshly loaded)."""
+        if isinstance(obj, BaseMessage):
+            if isinstance(obj.content, str) and obj.content.startswith(BLOB_REF):
+                obj.content = self.blobs.get(obj.content[len(BLOB_REF):], self._decompress)
+            return obj
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                obj[key] = self._internalize(value)
+            return obj
+        if isinstance(obj, list):
+            for i, value in enumerate(obj):
+                obj[i] = self._internalize(value)
+            return obj
+        if isinstance(obj, tuple) and not hasattr(obj, "_fields"):
+            return tuple(self._internalize(value) for value in obj)
+        return obj
+
+
+def build_serializer(db_path: str = "", conn=None) -> Optional[CompactSerializer]:
+    """
+    The checkpoint serializer CHECKPOINT_SERIALIZER selects.
+
+    Args:
+        db_path: SQLite file holding the blob table (empty keeps blobs in memory)
+        conn: Open connection to that file, used instead of opening a new one
+
+    Returns:
+        A CompactSerializer, or None for LangGraph's default
+    """
+    if CHECKPOINT_SERIALIZER != "compact":
+        return None
+    if conn is None and db_path:
+        from storage import connect
+
+        conn = connect(db_path)
+    return CompactSerializer(BlobStore(conn))
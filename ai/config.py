@@ -7,9 +7,249 @@ load_dotenv()
 MCP_CONFIG = {
     "github": {
         "transport": "streamable_http",
-        "url": "https://github.com/mcp/api",
+        "url": os.getenv("GITHUB_MCP_URL", "https://github.com/mcp/api"),
         "headers": {
             "Authorization": f"Bearer {os.getenv('GITHUB_TOKEN', '')}"
         }
     }
 }
+
+
+# Model tiers used by the chatbot router. Each tier has a primary model and an
+# optional secondary endpoint used on timeout/429 and for hedged requests.
+MODEL_TIERS = {
+    "fast": {
+        "model": os.getenv("FAST_MODEL", "gpt-4o-mini"),
+        "base_url": os.getenv("OPENAI_BASE_URL"),
+        "fallback_model": os.getenv("FAST_FALLBACK_MODEL", "gpt-4o-mini"),
+        "fallback_base_url": os.getenv("FALLBACK_OPENAI_BASE_URL"),
+        "timeout": float(os.getenv("FAST_MODEL_TIMEOUT", "20")),
+        "input_cost_per_1k": 0.00015,
+        "cached_input_cost_per_1k": 0.000075,
+        "output_cost_per_1k": 0.0006,
+        "breaker": "openai",
+        "fallback_breaker": "openai_fallback",
+    },
+    "strong": {
+        "model": os.getenv("STRONG_MODEL", "gpt-4o"),
+        "base_url": os.getenv("OPENAI_BASE_URL"),
+        "fallback_model": os.getenv("STRONG_FALLBACK_MODEL", "gpt-4o-mini"),
+        "fallback_base_url": os.getenv("FALLBACK_OPENAI_BASE_URL"),
+        "timeout": float(os.getenv("STRONG_MODEL_TIMEOUT", "30")),
+        "input_cost_per_1k": 0.0025,
+        "cached_input_cost_per_1k": 0.00125,
+        "output_cost_per_1k": 0.01,
+        "breaker": "openai",
+        "fallback_breaker": "openai_fallback",
+    },
+}
+
+# Agent step -> model tier. "routing" decides which tool to call,
+# "synthesis" writes the answer after tool results come back, "drafting"
+# writes each guest's invitation when drafting for everyone.
+MODEL_ROUTES = {
+    "routing": os.getenv("ROUTING_TIER", "fast"),
+    "synthesis": os.getenv("SYNTHESIS_TIER", "strong"),
+    "drafting": os.getenv("DRAFTING_TIER", os.getenv("SYNTHESIS_TIER", "strong")),
+}
+
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+
+# Model calls the agent may make per turn, by request type: "lookup" (plain
+# guest questions), "planning" (planning or outside information) and
+# "default". A turn that runs out, or keeps repeating a tool call it already
+# made, ends with what it found so far.
+AGENT_ITERATIONS = {
+    "lookup": int(os.getenv("AGENT_ITERATIONS_LOOKUP", "2")),
+    "default": int(os.getenv("AGENT_ITERATIONS", "3")),
+    "planning": int(os.getenv("AGENT_ITERATIONS_PLANNING", "5")),
+}
+
+# Graph nodes that fail on a transient error (timeout, connection error,
+# 429, 5xx) run again: up to NODE_RETRY_ATTEMPTS tries in all, waiting
+# NODE_RETRY_INITIAL_INTERVAL seconds and doubling up to NODE_RETRY_MAX_INTERVAL.
+# 1 turns retries off.
+NODE_RETRY_ATTEMPTS = int(os.getenv("NODE_RETRY_ATTEMPTS", "3"))
+NODE_RETRY_INITIAL_INTERVAL = float(os.getenv("NODE_RETRY_INITIAL_INTERVAL", "0.5"))
+NODE_RETRY_MAX_INTERVAL = float(os.getenv("NODE_RETRY_MAX_INTERVAL", "8"))
+
+# Path to a SQLite file for persistent checkpoints and background jobs.
+# Empty keeps everything in memory (lost on restart).
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "")
+
+# Worker threads for background chat jobs (/chat/jobs).
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+
+# Seconds a worker's claim on a running job lasts without a heartbeat. After a
+# worker stops, its unfinished jobs are picked up by another worker within this.
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "30"))
+
+# Seconds a finished job stays in its worker's memory. After that GET
+# /chat/jobs/{job_id} reads it from the shared jobs table (CHECKPOINT_DB), or
+# returns 404 without one.
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+
+# Number of API worker processes. More than one requires CHECKPOINT_DB so
+# every worker sees the same threads.
+API_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Requests per minute (and burst size) allowed per client API key or IP on
+# the chat endpoints.
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+
+# Comma-separated API keys clients may send in X-API-Key. Only a listed key
+# gets its own rate-limit bucket; any other caller is limited by IP.
+API_KEYS = frozenset(key.strip() for key in os.getenv("API_KEYS", "").split(",") if key.strip())
+
+# Lifetime LLM token and tool-call budget per thread.
+THREAD_TOKEN_BUDGET = int(os.getenv("THREAD_TOKEN_BUDGET", "500000"))
+THREAD_TOOL_CALL_BUDGET = int(os.getenv("THREAD_TOOL_CALL_BUDGET", "200"))
+
+# Keep limiter buckets and thread budgets in CHECKPOINT_DB so all workers
+# enforce the same limits.
+RATE_LIMIT_SHARED = os.getenv("RATE_LIMIT_SHARED", "true").lower() == "true"
+
+# Build the guest retriever (dataset, embedding model, Chroma) in a background
+# thread at startup instead of on the first retrieval call.
+PRELOAD_RETRIEVER = os.getenv("PRELOAD_RETRIEVER", "true").lower() == "true"
+
+# Checkpoint serializer: "default" (LangGraph's) or "compact" (msgpack + zstd
+# with large message bodies stored once in a content-addressed blob table).
+CHECKPOINT_SERIALIZER = os.getenv("CHECKPOINT_SERIALIZER", "default")
+
+# Answer plain guest lookups (emails, relations, the guest list) straight from
+# the invitee records instead of running the agent.
+INTENT_FAST_PATH = os.getenv("INTENT_FAST_PATH", "true").lower() == "true"
+
+# Worker threads shared by all /chat/batch requests, and the most items one
+# batch may contain.
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+
+# Seconds between inbox checks on the /interrupts/stream SSE feed.
+INBOX_POLL_INTERVAL = float(os.getenv("INBOX_POLL_INTERVAL", "1"))
+
+# Guest vector store: "numpy" (memory-mapped snapshot, shared by all workers),
+# "chroma", or "auto" (numpy up to NUMPY_MAX_VECTORS documents, Chroma above).
+# Brute force beats Chroma's HNSW up to roughly 10k vectors (see
+# benchmarks/bench_vector_engine.py).
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "auto")
+VECTOR_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", "./invites_vectors")
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+NUMPY_MAX_VECTORS = int(os.getenv("NUMPY_MAX_VECTORS", "10000"))
+
+# Per-request profiling: how many recent profiles to keep and the stack
+# sampling interval. Sampling is switched on at runtime via /admin/profiling
+# or per request with the `X-Profile: 1` header.
+PROFILE_MAX_PROFILES = int(os.getenv("PROFILE_MAX_PROFILES", "50"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+# Token required in X-Admin-Token for /admin endpoints and the X-Profile
+# header. Without a token those are refused, unless ADMIN_OPEN=true opens
+# them to every caller (local development only).
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ADMIN_OPEN = os.getenv("ADMIN_OPEN", "false").lower() == "true"
+
+# Tavily API endpoint; override to point web search at a proxy or local stand-in.
+TAVILY_API_BASE_URL = os.getenv("TAVILY_API_BASE_URL", "https://api.tavily.com")
+
+# Circuit breakers per external dependency. A breaker opens after
+# `failure_threshold` consecutive failures (calls slower than
+# `slow_call_seconds` count as failures, and callers give up after
+# `call_timeout`) and lets one probe call through after `recovery_timeout`
+# seconds. While it is open, tools answer from their last
+# good result for the same call, marked as stale, or fail fast.
+CIRCUIT_BREAKERS = {
+    "openai": {
+        "failure_threshold": int(os.getenv("OPENAI_BREAKER_FAILURES", "5")),
+        "recovery_timeout": float(os.getenv("OPENAI_BREAKER_RECOVERY_SECONDS", "30")),
+    },
+    "openai_fallback": {
+        "failure_threshold": int(os.getenv("OPENAI_BREAKER_FAILURES", "5")),
+        "recovery_timeout": float(os.getenv("OPENAI_BREAKER_RECOVERY_SECONDS", "30")),
+    },
+    "tavily": {
+        "failure_threshold": int(os.getenv("TAVILY_BREAKER_FAILURES", "3")),
+        "recovery_timeout": float(os.getenv("TAVILY_BREAKER_RECOVERY_SECONDS", "30")),
+        "slow_call_seconds": float(os.getenv("TAVILY_SLOW_CALL_SECONDS", "8")),
+        "call_timeout": float(os.getenv("TAVILY_TIMEOUT", "15")),
+    },
+    "mcp": {
+        "failure_threshold": int(os.getenv("MCP_BREAKER_FAILURES", "3")),
+        "recovery_timeout": float(os.getenv("MCP_BREAKER_RECOVERY_SECONDS", "60")),
+        "slow_call_seconds": float(os.getenv("MCP_SLOW_CALL_SECONDS", "8")),
+        "call_timeout": float(os.getenv("MCP_TIMEOUT", "15")),
+    },
+    "retrieval": {
+        "failure_threshold": int(os.getenv("RETRIEVAL_BREAKER_FAILURES", "3")),
+        "recovery_timeout": float(os.getenv("RETRIEVAL_BREAKER_RECOVERY_SECONDS", "30")),
+    },
+}
+
+# Last good results kept per dependency for serving while its breaker is
+# open, and the oldest result that may still be served.
+BREAKER_CACHE_SIZE = int(os.getenv("BREAKER_CACHE_SIZE", "256"))
+BREAKER_STALE_SECONDS = float(os.getenv("BREAKER_STALE_SECONDS", "3600"))
+
+# Compress responses of at least this many bytes with br or gzip, whichever
+# the client accepts (0 disables compression).
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+
+# Record/replay cassettes for outbound model, Tavily and MCP calls, one
+# gzipped JSONL file per thread in CASSETTE_DIR. "record" captures every
+# call with its result and latency, "replay" answers from the recording
+# instead of the network ("off" disables both).
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_DIR = os.getenv("CASSETTE_DIR", "./cassettes")
+# Sleep for each call's recorded latency when replaying.
+CASSETTE_SIMULATE_LATENCY = os.getenv("CASSETTE_SIMULATE_LATENCY", "false").lower() == "true"
+
+# Speculative retrieval: start the guest search on the user's message while
+# the first model call of the turn is in flight, and use it when the model's
+# `retrieval` call (without filters) shares at least SPECULATION_MIN_OVERLAP
+# of its content words with the message. SPECULATION_WORKERS bounds the
+# searches running at once; turns beyond it don't speculate.
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() == "true"
+SPECULATION_MIN_OVERLAP = float(os.getenv("SPECULATION_MIN_OVERLAP", "0.5"))
+SPECULATION_WORKERS = int(os.getenv("SPECULATION_WORKERS", "4"))
+
+# Guest lists per host (tenant). Requests may name a tenant; each has its own
+# collection or snapshot, opened on first use. At most TENANT_POOL_SIZE
+# tenants' indexes stay open; the least recently used one is closed and
+# reopened on its next query. Threads without a tenant use DEFAULT_TENANT,
+# the invitee dataset.
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "default")
+TENANT_POOL_SIZE = int(os.getenv("TENANT_POOL_SIZE", "32"))
+TENANT_INGEST_WORKERS = int(os.getenv("TENANT_INGEST_WORKERS", "2"))
+TENANT_VECTOR_DIR = os.getenv("TENANT_VECTOR_DIR", "./tenant_vectors")
+# Memory Chroma may use for loaded collections before unloading the least
+# recently used ones (0 keeps every collection it has loaded). chromadb 1.x
+# keeps about 2.5 MB per collection it has touched whatever this is set to,
+# so many-tenant deployments should leave small lists on the NumPy backend
+# (VECTOR_BACKEND=auto or numpy), whose memory the pool does bound.
+CHROMA_MEMORY_LIMIT_BYTES = int(os.getenv("CHROMA_MEMORY_LIMIT_BYTES", str(512 * 1024 * 1024)))
+
+# Guest lists as memory-mapped Arrow files, one per tenant in GUEST_STORE_DIR.
+# The default tenant's list is imported from the GUEST_DATASET Hugging Face
+# dataset on first use; `python guest_store.py <csv|parquet|dataset>` replaces
+# or extends a list.
+GUEST_STORE_DIR = os.getenv("GUEST_STORE_DIR", "./guests")
+GUEST_DATASET = os.getenv("GUEST_DATASET", "agents-course/unit3-invitees")
+
+# Bulk export of conversations and guest checklists (/admin/export and
+# `python export.py`): rows are written EXPORT_BATCH_ROWS at a time, one
+# Parquet row group each.
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+
+# Requests to draft invitations for everyone (or every family member, friend
+# or colleague) skip the agent loop: the guests are read once and one drafting
+# call per guest fans out, at most DRAFT_CONCURRENCY at a time, for up to
+# DRAFT_MAX_GUESTS guests per request.
+DRAFT_FAN_OUT = os.getenv("DRAFT_FAN_OUT", "true").lower() == "true"
+DRAFT_CONCURRENCY = int(os.getenv("DRAFT_CONCURRENCY", "8"))
+DRAFT_MAX_GUESTS = int(os.getenv("DRAFT_MAX_GUESTS", "200"))
+# Tokens one drafting call is assumed to use until real calls have been
+# measured; a fan-out whose guests x tokens per call exceeds what is left of
+# the thread's THREAD_TOKEN_BUDGET goes to the agent instead.
+DRAFT_TOKENS_PER_GUEST = int(os.getenv("DRAFT_TOKENS_PER_GUEST", "600"))
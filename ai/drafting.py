@@ -0,0 +1,297 @@
+import operator
+import re
+import threading
+import time
+from collections import deque
+from typing import Annotated, Any, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+from langgraph.types import Send
+from typing_extensions import NotRequired, TypedDict
+
+from config import DRAFT_CONCURRENCY, DRAFT_FAN_OUT, DRAFT_MAX_GUESTS, DRAFT_TOKENS_PER_GUEST, MODEL_ROUTES
+from prompts import DRAFT_INVITATION_PROMPT
+from retries import node_retries
+
+
+# "Draft personalized invitations for everyone", "please write invites to all my colleagues", ...
+# Only imperative requests: questions ("Should I write invitations for everyone?", "can you draft
+# ...?", "did I create invites for all of them?") and requests for one named guest's invitation
+# stay with the agent.
+DRAFT_VERB = r"\b(draft|write|compose|prepare|create)\b"
+INVITATION = r"\binvit(e|es|ation|ations)\b"
+EVERYONE = r"\b(everyone|everybody|all|each|every)\b"
+POLITE = r"(please |kindly |now |ok(ay)?,? |go ahead and )*"
+BULK_DRAFT = re.compile(rf"^{POLITE}{DRAFT_VERB}.*({INVITATION}.*{EVERYONE}|{EVERYONE}.*{INVITATION})")
+QUESTION = re.compile(r"\?\s*$")
+# "everyone except family", "all guests but my colleagues", "don't invite ...": the agent works out who's left.
+NEGATION = re.compile(r"\b(not|no|except|excluding|without|besides|but|other than|apart from|minus|skip(ping)?)\b"
+                      r"|n't\b")
+# Relation category (see guest_store.relation_category) a bulk request is limited to; earlier ones win.
+RELATION_WORDS = {
+    "family": re.compile(r"\b(family|relatives)\b"),
+    "colleague": re.compile(r"\b(colleagues?|co-?workers?|work)\b"),
+    "friend": re.compile(r"\bfriends?\b"),
+}
+
+
+def merge_drafts(current: Optional[Dict[str, str]], new: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """Reducer for `invitation_drafts`: guest id (see `guest_id`) -> latest draft."""
+    return {**(current or {}), **(new or {})}
+
+
+def guest_id(guest: Dict[str, Any]) -> str:
+    """Key of a guest's draft: name and email, which the guest store keeps unique ("Ada Lovelace <ada@example.com>")."""
+    email = guest.get("email") or ""
+    return f"{guest['name']} <{email}>" if email else guest["name"]
+
+
+class DraftState(TypedDict):
+    messages: Annotated[list, add_messages]
+    tenant: NotRequired[str]
+    invitation_drafts: NotRequired[Annotated[Dict[str, str], merge_drafts]]
+    # Only inside the subgraph: the candidate guests and one result per draft task.
+    guests: NotRequired[List[Dict[str, Any]]]
+    unmatched: NotRequired[int]
+    results: NotRequired[Annotated[List[Dict[str, Any]], operator.add]]
+
+
+# Same system message bytes on every drafting call, so the provider can cache the prefix.
+DRAFT_SYSTEM_MESSAGE = SystemMessage(content=DRAFT_INVITATION_PROMPT)
+
+
+def relation_for(text: str) -> Optional[str]:
+    """Relation category a bulk request is limited to, or None for every guest."""
+    text = text.lower()
+    return next((name for name, words in RELATION_WORDS.items() if words.search(text)), None)
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 4)
+
+
+class InvitationDrafter:
+    """
+    Draft one personalized invitation per guest as a map-reduce subgraph.
+
+    Asking the agent to draft invitations for everyone runs one ReAct loop
+    that pages through retrieval five guests at a time and writes the drafts
+    one model call after another, until it runs out of iterations. Here the
+    guests the request covers (the whole list, or one relation category) are
+    read from the guest store once, and `Send` fans out one drafting task
+    per guest; at most `max_concurrency` model calls run at once. Each draft
+    is written to the custom stream as soon as it finishes, and the merge
+    step adds the drafts to the thread's `invitation_drafts` and one answer
+    listing them in guest order.
+
+    A failed model call fails only that guest's draft; the answer names the
+    guests to retry.
+    """
+
+    def __init__(self, draft_model: Callable[[List[Any]], Any],
+                 guest_loader: Callable[[Optional[str], Optional[str]], List[Dict[str, Any]]],
+                 guest_counter: Callable[[Optional[str], Optional[str]], int],
+                 tokens_left: Callable[[Optional[str]], int],
+                 enabled: bool = True, max_concurrency: int = 8, max_guests: int = 200,
+                 tokens_per_guest: int = 600, window: int = 200):
+        self.draft_model = draft_model
+        self.guest_loader = guest_loader
+        self.guest_counter = guest_counter
+        self.tokens_left = tokens_left
+        self.enabled = enabled
+        self.max_concurrency = max_concurrency
+        self.max_guests = max_guests
+        self.tokens_per_guest = tokens_per_guest
+        self.latencies = deque(maxlen=window)
+        self.stats = {"runs": 0, "drafts": 0, "failed": 0, "over_budget": 0, "tokens": 0, "seconds": 0.0}
+        self._lock = threading.Lock()
+        self.graph = self._build()
+
+    def _build(self):
+        builder = StateGraph(DraftState)
+        builder.add_node("collect_guests", self.collect_guests, retry_policy=node_retries.policy())
+        builder.add_node("draft_invitation", self.draft_invitation)
+        builder.add_node("merge_drafts", self.merge)
+        builder.add_edge(START, "collect_guests")
+        builder.add_conditional_edges("collect_guests", self.fan_out, ["draft_invitation", "merge_drafts"])
+        builder.add_edge("draft_invitation", "merge_drafts")
+        builder.add_edge("merge_drafts", END)
+        return builder.compile()
+
+    def matches(self, text: str) -> bool:
+        """True if the message asks for invitations for every guest, or all of one relation, with no exceptions."""
+        text = text.strip().lower()
+        return (self.enabled and bool(BULK_DRAFT.search(text)) and not QUESTION.search(text)
+                and not NEGATION.search(text))
+
+    def estimate_tokens(self, text: str, tenant: Optional[str]) -> int:
+        """Tokens drafting the request's guests would take, at the measured (or assumed) tokens per draft."""
+        guests = min(self.guest_counter(tenant, relation_for(text)), self.max_guests)
+        with self._lock:
+            per_guest = self.stats["tokens"] / self.stats["drafts"] if self.stats["drafts"] else self.tokens_per_guest
+        return int(guests * per_guest)
+
+    def within_budget(self, text: str, tenant: Optional[str], thread_id: Optional[str]) -> bool:
+        """True if the fan-out fits in what is left of the thread's token budget."""
+        if self.estimate_tokens(text, tenant) <= self.tokens_left(thread_id):
+            return True
+        with self._lock:
+            self.stats["over_budget"] += 1
+        return False
+
+    def run(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        """Graph node: run the drafting subgraph for the thread's latest message."""
+        start = time.perf_counter()
+        result = self.graph.invoke(state, {**config, "max_concurrency": self.max_concurrency})
+        elapsed = time.perf_counter() - start
+        results = result.get("results", [])
+        with self._lock:
+            self.stats["runs"] += 1
+            self.stats["drafts"] += sum(1 for r in results if r["draft"] is not None)
+            self.stats["failed"] += sum(1 for r in results if r["draft"] is None)
+            self.stats["tokens"] += sum((r["usage"] or {}).get("total_tokens", 0) for r in results)
+            self.stats["seconds"] += elapsed
+            self.latencies.append(elapsed)
+        return {"messages": result["messages"][len(state["messages"]):],
+                "invitation_drafts": result.get("invitation_drafts", {})}
+
+    def collect_guests(self, state: DraftState) -> Dict[str, Any]:
+        """Read every guest the request covers from the guest store, once."""
+        guests = list(self.guest_loader(state.get("tenant"), relation_for(str(state["messages"][-1].content))))
+        return {"guests": guests[:self.max_guests], "unmatched": max(0, len(guests) - self.max_guests)}
+
+    def fan_out(self, state: DraftState):
+        """One drafting task per guest (straight to the merge step when there are none)."""
+        request = str(state["messages"][-1].content)
+        guests = state["guests"]
+        if not guests:
+            return "merge_drafts"
+        return [Send("draft_invitation", {"request": request, "guest": guest, "index": index, "total": len(guests)})
+                for index, guest in enumerate(guests)]
+
+    def draft_invitation(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Draft one guest's invitation and stream it out."""
+        guest = task["guest"]
+        messages = [
+            DRAFT_SYSTEM_MESSAGE,
+            HumanMessage(content=(
+                f"Request: {task['request']}\n\n"
+                f"Guest:\nName: {guest['name']}\nRelation: {guest.get('relation') or ''}\n"
+                f"Description: {guest.get('description') or ''}\nEmail: {guest.get('email') or ''}"
+            )),
+        ]
+        start = time.perf_counter()
+        result = {"index": task["index"], "guest_id": guest_id(guest), "name": guest["name"],
+                  "email": guest.get("email") or "", "draft": None, "error": None, "usage": None, "calls": 0}
+        usages = []
+        try:
+            # The tiers have the agent's tools bound; a tool call or an empty
+            # answer is no draft, so ask once more before failing the guest.
+            for attempt in range(2):
+                result["calls"] += 1
+                response = self.draft_model(messages)
+                usages.append(getattr(response, "usage_metadata", None))
+                draft = str(response.content).strip() if isinstance(response.content, str) else ""
+                if draft and not getattr(response, "tool_calls", None):
+                    result["draft"] = draft
+                    break
+            else:
+                result["error"] = "the model returned a tool call instead of a draft"
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        # Every attempt's tokens count, including the ones that produced no draft.
+        result["usage"] = _total_usage(usages)
+        result["latency"] = round(time.perf_counter() - start, 4)
+        get_stream_writer()({"event": "draft", "total": task["total"],
+                             **{key: value for key, value in result.items() if key != "usage"}})
+        return {"results": [result]}
+
+    def merge(self, state: DraftState) -> Dict[str, Any]:
+        """Add the drafts, in guest order, to the thread as one answer and to `invitation_drafts`."""
+        results = sorted(state.get("results", []), key=lambda r: r["index"])
+        drafted = [r for r in results if r["draft"] is not None]
+        failed = [r["name"] for r in results if r["draft"] is None]
+
+        if not results:
+            content = "I couldn't find any guests to draft invitations for."
+        else:
+            sections = [f"### {r['name']}" + (f" ({r['email']})" if r["email"] else "") + f"\n\n{r['draft']}"
+                        for r in drafted]
+            content = f"Here are personalized invitation drafts for {len(drafted)} guests:\n\n" + "\n\n".join(sections)
+            if failed:
+                content += f"\n\nI couldn't draft invitations for {', '.join(failed)}; ask me for theirs again."
+        if state.get("unmatched"):
+            content += (f"\n\nThat covers the first {len(results)} matching guests; {state['unmatched']} more "
+                        "weren't drafted. Ask for one relation (family, friends or colleagues) to cover the rest.")
+
+        usage = _total_usage(r["usage"] for r in results)
+        message = AIMessage(
+            content=content,
+            response_metadata={"route": "draft_fan_out", "drafts": len(drafted), "failed": len(failed),
+                                "llm_calls": sum(r["calls"] for r in results)},
+            usage_metadata=usage,
+        )
+        return {"messages": [message], "invitation_drafts": {r["guest_id"]: r["draft"] for r in drafted}}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return run and draft counts and per-run latency percentiles."""
+        with self._lock:
+            report = {**self.stats, "enabled": self.enabled, "max_concurrency": self.max_concurrency,
+                      "seconds": round(self.stats["seconds"], 4)}
+            ordered = sorted(self.latencies)
+        report["p50_latency"] = _percentile(ordered, 0.50)
+        report["p95_latency"] = _percentile(ordered, 0.95)
+        return report
+
+
+def _total_usage(usages) -> Optional[Dict[str, Any]]:
+    """Sum the drafts' token usage, so the turn's usage and thread budget count every call."""
+    total = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "input_token_details": {"cache_read": 0}}
+    seen = False
+    for usage in usages:
+        if not usage:
+            continue
+        seen = True
+        total["input_tokens"] += usage.get("input_tokens", 0)
+        total["output_tokens"] += usage.get("output_tokens", 0)
+        total["total_tokens"] += usage.get("total_tokens", 0)
+        total["input_token_details"]["cache_read"] += (usage.get("input_token_details") or {}).get("cache_read", 0)
+    return total if seen else None
+
+
+def _draft(messages: List[Any]):
+    from graph import router
+
+    return router.invoke_tier(router.tiers[MODEL_ROUTES["drafting"]], messages)
+
+
+def _load_guests(tenant: Optional[str], relation: Optional[str]) -> List[Dict[str, Any]]:
+    from guest_store import FIELDS, get_guest_store
+
+    return get_guest_store(tenant).filter(relation=relation).select(FIELDS).to_pylist()
+
+
+def _count_guests(tenant: Optional[str], relation: Optional[str]) -> int:
+    from guest_store import get_guest_store
+
+    return get_guest_store(tenant).filter(relation=relation).num_rows
+
+
+def _tokens_left(thread_id: Optional[str]) -> int:
+    from limits import thread_budget
+
+    if thread_id is None:
+        return thread_budget.max_tokens
+    return thread_budget.max_tokens - thread_budget.get(thread_id)["tokens"]
+
+
+invitation_drafter = InvitationDrafter(
+    _draft, _load_guests, _count_guests, _tokens_left, enabled=DRAFT_FAN_OUT, max_concurrency=DRAFT_CONCURRENCY,
+    max_guests=DRAFT_MAX_GUESTS, tokens_per_guest=DRAFT_TOKENS_PER_GUEST,
+)
@@ -0,0 +1,366 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from config import CHECKPOINT_DB, DEFAULT_TENANT, EXPORT_BATCH_ROWS
+from registry import thread_registry
+from serialization import dumps
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # JSONL exports still work without pyarrow
+    pa = pq = None
+
+
+KINDS = ("messages", "guests")
+FORMATS = ("jsonl", "parquet")
+
+# Columns of each export kind, with their Parquet types. JSONL rows have the same keys.
+COLUMNS = {
+    "messages": [
+        ("thread_id", "string"), ("owner", "string"), ("tenant", "string"), ("position", "int64"),
+        ("message_id", "string"), ("type", "string"), ("name", "string"), ("content", "string"),
+        ("tool_calls", "string"), ("updated_at", "float64"),
+    ],
+    "guests": [
+        ("thread_id", "string"), ("owner", "string"), ("tenant", "string"), ("name", "string"),
+        ("relation", "string"), ("email", "string"), ("updated_at", "float64"),
+    ],
+}
+
+# 100-ns intervals between the UUID epoch (1582-10-15) and the Unix epoch; checkpoint ids count from the former.
+UUID_EPOCH = 0x01B21DD213814000
+
+# One guest in a `retrieval` tool result (see retriver.build_documents).
+GUEST = re.compile(r"Name: (?P<name>[^\n]*)\nRelation: (?P<relation>[^\n]*)\n.*?Email: (?P<email>[^\n]*)", re.S)
+
+
+class ConversationExporter:
+    """
+    Stream every thread's messages, or the guests each thread looked up, as JSONL or Parquet.
+
+    Threads with a checkpoint in the window are read from the checkpoint
+    store a page at a time, and each thread's checkpoint is turned into
+    rows before the next one is loaded, so memory stays flat however many
+    threads the store holds. Rows are written `batch_rows` at a time (one
+    Parquet row group per batch).
+
+    An export covers checkpoints written in (since, until]: `until` (now, by
+    default) is the watermark to pass as `since` next time. Within a
+    thread only messages added after `since` are exported, taken from the
+    latest checkpoint at or before `until`. Threads are picked and cut by
+    the same clock, the time in their checkpoint ids, so a turn still
+    running (or failed) at `until` is exported up to its last checkpoint
+    and back-to-back exports line up without gaps or duplicates.
+
+    With CHECKPOINT_DB the export reads through its own SQLite connection
+    (WAL lets it read while workers write), so it never waits on the
+    graph's checkpointer lock.
+    """
+
+    def __init__(self, batch_rows: int = 5000):
+        self.batch_rows = batch_rows
+        self.stats = {"exports": 0, "running": 0, "threads": 0, "rows": 0, "seconds": 0.0}
+        self.last: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def rows(self, kind: str = "messages", since: Optional[float] = None, until: Optional[float] = None,
+             report: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate export rows.
+
+        Args:
+            kind: "messages" (one row per message) or "guests" (one row per guest a thread looked up)
+            since: Watermark of the previous export; None exports everything
+            until: Watermark of this export (defaults to now)
+            report: Filled in with the export's summary when it ends
+
+        Returns:
+            Iterator of rows with the kind's COLUMNS as keys
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Export kind must be one of {', '.join(KINDS)}")
+        until = time.time() if until is None else until
+        to_rows = _message_rows if kind == "messages" else _guest_rows
+        started, threads, count = time.perf_counter(), 0, 0
+        with self._lock:
+            self.stats["running"] += 1
+        try:
+            with _checkpoints() as saver:
+                for thread_id in _threads(saver, since, until):
+                    window = _thread_window(saver, thread_id, since, until)
+                    if window is not None:
+                        threads += 1
+                        thread = {"thread_id": thread_id, "owner": (thread_registry.get(thread_id) or {}).get("owner")}
+                        for row in to_rows(thread, *window):
+                            count += 1
+                            yield row
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stats["running"] -= 1
+                self.stats["exports"] += 1
+                self.stats["threads"] += threads
+                self.stats["rows"] += count
+                self.stats["seconds"] += elapsed
+                self.last = {"kind": kind, "since": since, "until": until, "threads": threads, "rows": count,
+                             "seconds": round(elapsed, 3), "finished_at": time.time()}
+            if report is not None:
+                report.update(self.last)
+
+    def stream(self, kind: str = "messages", fmt: str = "jsonl", since: Optional[float] = None,
+               until: Optional[float] = None, report: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+        """Export rows encoded as `fmt` ("jsonl" or "parquet"), a batch of rows per chunk."""
+        until = time.time() if until is None else until
+        batches = _batched(self.rows(kind, since, until, report), self.batch_rows)
+        if fmt == "jsonl":
+            return (b"".join(dumps(row) + b"\n" for row in batch) for batch in batches)
+        if fmt == "parquet":
+            return _parquet_chunks(batches, kind, {"since": since, "until": until})
+        raise ValueError(f"Export format must be one of {', '.join(FORMATS)}")
+
+    def export(self, path: str, kind: str = "messages", fmt: str = "jsonl",
+               since: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Write an export to `path` (via a temporary file, so a failed export leaves no partial file).
+
+        Returns:
+            The export's summary, with `until` as the next watermark
+        """
+        report: Dict[str, Any] = {}
+        partial = f"{path}.partial"
+        with open(partial, "wb") as f:
+            for chunk in self.stream(kind, fmt, since, report=report):
+                f.write(chunk)
+        os.replace(partial, path)
+        return {**report, "path": path, "bytes": os.path.getsize(path)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return totals over all exports and the latest one."""
+        with self._lock:
+            seconds = self.stats["seconds"]
+            return {**self.stats, "seconds": round(seconds, 3), "last": self.last,
+                    "rows_per_second": round(self.stats["rows"] / seconds) if seconds else 0}
+
+
+@contextmanager
+def _checkpoints():
+    """Checkpointer to read from: a private SQLite connection, or the in-memory one."""
+    if not CHECKPOINT_DB:
+        from graph import checkpointer
+
+        yield checkpointer
+        return
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    from checkpoint_serde import build_serializer
+    from storage import connect
+
+    conn = connect(CHECKPOINT_DB)
+    try:
+        yield SqliteSaver(conn, serde=build_serializer(conn=conn))
+    finally:
+        conn.close()
+
+
+def _checkpoint_time(checkpoint_id: str) -> float:
+    """Unix time a checkpoint was written, from its id (a UUIDv6, which sorts by time)."""
+    value = uuid.UUID(checkpoint_id).int
+    return (((value >> 80) << 12 | (value >> 64) & 0xFFF) - UUID_EPOCH) / 1e7
+
+
+def _last_id_at(ts: Optional[float]) -> str:
+    """Largest checkpoint id written at or before `ts` ('' for None), for comparing ids as strings."""
+    if ts is None:
+        return ""
+    timestamp = int(ts * 1e7) + UUID_EPOCH
+    # Time high bits, version 6, time low bits, then the clock sequence and node at their maximum.
+    return str(uuid.UUID(int=(timestamp >> 12) << 80 | 6 << 76 | (timestamp & 0xFFF) << 64 | (1 << 64) - 1))
+
+
+def _threads(saver, since: Optional[float], until: float, batch_size: int = 500) -> Iterator[str]:
+    """Ids of threads with a checkpoint written in (since, until], a page at a time."""
+    low, high = _last_id_at(since), _last_id_at(until)
+    conn = getattr(saver, "conn", None)
+    if conn is None:
+        # In-memory checkpointer: checkpoints by thread, namespace and id.
+        for thread_id, namespaces in list(saver.storage.items()):
+            if any(low < checkpoint_id <= high for checkpoint_id in list(namespaces.get("", {}))):
+                yield thread_id
+        return
+    last = ""
+    while True:
+        # Covered by the checkpoints primary key, so the blobs aren't read; keyset pagination on thread_id.
+        page = [row[0] for row in conn.execute(
+            "SELECT DISTINCT thread_id FROM checkpoints WHERE thread_id > ? AND checkpoint_ns = '' "
+            "AND checkpoint_id > ? AND checkpoint_id <= ? ORDER BY thread_id LIMIT ?",
+            (last, low, high, batch_size),
+        )]
+        yield from page
+        if len(page) < batch_size:
+            return
+        last = page[-1]
+
+
+def _thread_window(saver, thread_id: str, since: Optional[float], until: float):
+    """The thread's state at `until`, the messages it already had at `since` and the state's time, or None."""
+    end, before = None, []
+    low, high = _last_id_at(since), _last_id_at(until)
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    # Checkpoints come newest first; read only back to the first one at or before `since`.
+    with closing(saver.list(config)) as checkpoints:
+        for checkpoint in checkpoints:
+            checkpoint_id = checkpoint.checkpoint["id"]
+            if end is None and checkpoint_id <= high:
+                end = checkpoint.checkpoint
+            if end is not None and (since is None or checkpoint_id <= low):
+                if since is not None:
+                    before = checkpoint.checkpoint["channel_values"].get("messages", [])
+                break
+    if end is None:
+        return None
+    return end["channel_values"], _Seen(before), _checkpoint_time(end["id"])
+
+
+class _Seen:
+    """Messages a thread already had at the previous watermark, by id (by position for messages without one)."""
+
+    def __init__(self, messages: List[Any]):
+        self.ids = {m.id for m in messages if m.id}
+        self.count = len(messages)
+
+    def __call__(self, position: int, message: Any) -> bool:
+        return message.id in self.ids if message.id else position < self.count
+
+
+def _message_rows(thread: Dict[str, Any], values: Dict[str, Any], seen: "_Seen",
+                  updated_at: float) -> Iterable[Dict[str, Any]]:
+    tenant = values.get("tenant") or DEFAULT_TENANT
+    for position, message in enumerate(values.get("messages", [])):
+        if seen(position, message):
+            continue
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+        tool_calls = getattr(message, "tool_calls", None)
+        yield {
+            "thread_id": thread["thread_id"],
+            "owner": thread["owner"],
+            "tenant": tenant,
+            "position": position,
+            "message_id": message.id,
+            "type": message.type,
+            "name": getattr(message, "name", None),
+            "content": content,
+            "tool_calls": json.dumps([{"name": c["name"], "args": c["args"]} for c in tool_calls]) if tool_calls else None,
+            "updated_at": updated_at,
+        }
+
+
+def _guest_rows(thread: Dict[str, Any], values: Dict[str, Any], seen: "_Seen",
+                updated_at: float) -> Iterable[Dict[str, Any]]:
+    tenant = values.get("tenant") or DEFAULT_TENANT
+    guests = set()
+    for position, message in enumerate(values.get("messages", [])):
+        if seen(position, message) or message.type != "tool" or message.name != "retrieval":
+            continue
+        for match in GUEST.finditer(str(message.content)):
+            guest = (match["name"].strip(), match["relation"].strip(), match["email"].strip())
+            if guest in guests:
+                continue
+            guests.add(guest)
+            yield {"thread_id": thread["thread_id"], "owner": thread["owner"], "tenant": tenant,
+                   "name": guest[0], "relation": guest[1], "email": guest[2], "updated_at": updated_at}
+
+
+def _batched(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _ChunkSink:
+    """Write-only file object collecting what ParquetWriter writes, handed out chunk by chunk."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def _parquet_chunks(batches: Iterator[List[Dict[str, Any]]], kind: str,
+                    watermark: Dict[str, Optional[float]]) -> Iterator[bytes]:
+    if pq is None:
+        raise RuntimeError("Parquet export needs `pyarrow`; install it or export JSONL")
+    schema = pa.schema([(name, getattr(pa, type_)()) for name, type_ in COLUMNS[kind]],
+                       metadata={f"export_{key}": json.dumps(value) for key, value in watermark.items()})
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for batch in batches:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export conversations or guest checklists from CHECKPOINT_DB")
+    parser.add_argument("--kind", choices=KINDS, default="messages")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--out", help="Output file (default: <kind>-<watermark>.<format>)")
+    parser.add_argument("--since", type=float, help="Only export what changed after this Unix timestamp")
+    parser.add_argument("--watermark-file",
+                        help="Read --since from this file if it exists, and store the new watermark in it afterwards")
+    args = parser.parse_args()
+
+    if not CHECKPOINT_DB:
+        raise SystemExit("Set CHECKPOINT_DB to the database to export")
+    since = args.since
+    if since is None and args.watermark_file and os.path.exists(args.watermark_file):
+        with open(args.watermark_file) as f:
+            since = float(f.read().strip())
+    out = args.out or f"{args.kind}-{int(time.time())}.{args.format}"
+    summary = conversation_exporter.export(out, args.kind, args.format, since)
+    if args.watermark_file:
+        with open(args.watermark_file, "w") as f:
+            f.write(repr(summary["until"]))
+    print(f"Exported {summary['rows']} {args.kind} rows from {summary['threads']} threads to {out} "
+          f"({summary['bytes'] / 1e6:.1f} MB) in {summary['seconds']:.1f} s; watermark {summary['until']!r}")
+
+
+conversation_exporter = ConversationExporter(batch_rows=EXPORT_BATCH_ROWS)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,29 @@
-from typing import Annotated
-from typing_extensions import TypedDict
+import argparse
+import time
+from typing import Annotated, Any, Dict, Literal
+from typing_extensions import NotRequired, TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_openai import ChatOpenAI
 from langgraph.checkpoint.memory import InMemorySaver
-from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from tools import tools
-from prompts import get_system_prompt
+from prompts import get_system_message
+from router import build_router
+from breakers import circuit_breakers
+from cassettes import cassettes
+from config import (
+    MODEL_TIERS, MODEL_ROUTES, HEDGE_PERCENTILE, CHECKPOINT_DB, INTENT_FAST_PATH, DEFAULT_TENANT, DRAFT_CONCURRENCY,
+)
+from intents import intent_router
+from loops import loop_guard
+from retries import node_retries
+from drafting import invitation_drafter, merge_drafts
+from speculation import speculative_retrieval
+from tenants import use_tenant
 from langgraph.types import Command, interrupt
 from dotenv import load_dotenv
 from langgraph.prebuilt import create_react_agent
@@ -19,41 +34,159 @@ load_dotenv()
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
+    # Whose guest list the thread uses; set by the first turn that names one.
+    tenant: NotRequired[str]
+    # Guest name -> latest invitation draft, from "draft invitations for everyone" turns.
+    invitation_drafts: NotRequired[Annotated[Dict[str, str], merge_drafts]]
+
+
+def build_checkpointer():
+    """Use a SQLite checkpointer when CHECKPOINT_DB is set, otherwise keep state in memory."""
+    from checkpoint_serde import build_serializer
+    from storage import connect
+
+    serde = build_serializer(CHECKPOINT_DB)
+
+    if not CHECKPOINT_DB:
+        return InMemorySaver(serde=serde)
+
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    return SqliteSaver(connect(CHECKPOINT_DB), serde=serde)
+
+
+checkpointer = build_checkpointer()
+
+
+def create_chat_model(model_name: str, base_url: str = None, timeout: float = None):
+    """Create a ChatOpenAI client for one router tier endpoint."""
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model_name=model_name, base_url=base_url, timeout=timeout, temperature=0, max_retries=0)
+
+
+# Set in `configurable` (see `turn_config`) when a run continues a checkpointed
+# turn instead of starting one: a failed turn resumed, or an interrupt answered.
+RESUMING = "resuming"
+
+# Static prompt prefix: the system message and tool definitions are assembled
+# once, in a fixed order, so provider-side prompt caching sees identical bytes
+# on every turn and thread. Conversation messages always follow the prefix.
+SYSTEM_MESSAGE = get_system_message()
+TOOL_DEFINITIONS = sorted(
+    (convert_to_openai_tool(t) for t in tools),
+    key=lambda definition: definition["function"]["name"],
+)
 
 
-checkpointer = InMemorySaver()
+def build_model_input(state: State):
+    """Prepend the static prefix to the thread's messages."""
+    return [SYSTEM_MESSAGE, *state["messages"]]
 
 
-llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0)
+# Every model call runs on the router's pool: leave room for a full drafting
+# fan-out and its hedges next to regular turns. Calls queued behind the pool
+# would count the wait as latency and set off more hedges.
+router = build_router(
+    MODEL_TIERS, MODEL_ROUTES, create_chat_model, breaker_for=circuit_breakers.get, hedge_percentile=HEDGE_PERCENTILE,
+    max_workers=8 + 2 * DRAFT_CONCURRENCY,
+)
+router.bind_tools(TOOL_DEFINITIONS)
+router.cassette = cassettes
 
-max_iterations = 3
-recursion_limit = 2 * max_iterations + 1
+# Each turn gets the model calls its request type needs (see loops.LoopGuard);
+# repeated tool calls are answered from the turn's memo, and a looping or
+# over-budget turn ends with what it found instead of a recursion error.
+# Transient failures retry the agent's failed model or tool step only; its
+# earlier steps are checkpointed under the chatbot node and aren't repeated.
 agent = create_react_agent(
-    model=llm,  
+    model=router.select_model,  
     tools=tools,  
-    prompt=get_system_prompt(),
-    
-)
+    prompt=build_model_input,
+    post_model_hook=loop_guard.post_model_hook,
+).copy(update={"retry_policy": (node_retries.policy(),)})
+
+def fast_path(state: State, config: RunnableConfig) -> Command[Literal["chatbot", "draft_invitations", "__end__"]]:
+    """Answer plain guest lookups from the invitee records, fan out drafting for everyone; the rest goes to the agent."""
+    last_message = state["messages"][-1]
+    if isinstance(last_message, HumanMessage):
+        cassettes.record_turn("message", last_message.content)
+        if isinstance(last_message.content, str) and invitation_drafter.matches(last_message.content):
+            # A fan-out the thread's token budget can't cover goes to the agent, which stops at its step budget.
+            if invitation_drafter.within_budget(last_message.content, state.get("tenant"),
+                                                config["configurable"].get("thread_id")):
+                return Command(goto="draft_invitations")
+            return Command(goto="chatbot")
+    if state.get("tenant", DEFAULT_TENANT) != DEFAULT_TENANT:
+        # The fast path answers from the invitee dataset, which is the default tenant's list.
+        return Command(goto="chatbot")
+    if not INTENT_FAST_PATH or not isinstance(last_message, HumanMessage) or not isinstance(last_message.content, str):
+        return Command(goto="chatbot")
+
+    start = time.perf_counter()
+    # With earlier turns, "what's her email?" is about someone in them: the agent has the context.
+    match = intent_router.answer(last_message.content, follow_up=len(state["messages"]) > 1)
+    if match is None:
+        return Command(goto="chatbot")
+
+    intent, answer = match
+    intent_router.record("fast_path", time.perf_counter() - start)
+    message = AIMessage(content=answer, response_metadata={"route": "fast_path", "intent": intent})
+    return Command(update={"messages": [message]}, goto=END)
+
 
-def chatbot(state: State):
+def chatbot(state: State, config: RunnableConfig):
     messages = state["messages"]
-    response = agent.invoke({"messages": messages},{"recursion_limit": recursion_limit})
+    thread_id = config["configurable"].get("thread_id")
+    start = time.perf_counter()
+    with use_tenant(state.get("tenant")):
+        if isinstance(messages[-1], HumanMessage) and isinstance(messages[-1].content, str):
+            # Search the guest list on the raw message while the first model call runs.
+            resuming = config["configurable"].get(RESUMING, False)
+            speculative_retrieval.start(thread_id, messages[-1].content, resuming)
+        try:
+            response = agent.invoke({"messages": messages}, {"recursion_limit": loop_guard.recursion_limit(messages)})
+        finally:
+            speculation = speculative_retrieval.finish(thread_id)
+    intent_router.record("agent", time.perf_counter() - start)
+    if speculation is not None and isinstance(response["messages"][-1], AIMessage):
+        response["messages"][-1].response_metadata["speculative_retrieval"] = speculation
 
     return response
 
 
+tool_node = ToolNode(tools=tools)
+
+
+def run_tools(state: State, config: RunnableConfig):
+    """Run tool calls against the thread's guest list."""
+    with use_tenant(state.get("tenant")):
+        return tool_node.invoke(state, config)
+
+
+def turn_config(config: Dict[str, Any], graph_input: Any) -> Dict[str, Any]:
+    """`config` for streaming `graph_input`, flagging a None or resume Command input as continuing the turn."""
+    resuming = graph_input is None or (isinstance(graph_input, Command) and graph_input.resume is not None)
+    return {**config, "configurable": {**config["configurable"], RESUMING: resuming}}
+
+
 graph_builder = StateGraph(State)
 
+graph_builder.add_node("fast_path", fast_path, retry_policy=node_retries.policy())
+# No retry policy here: a second attempt would start the agent over instead
+# of resuming it, so the agent retries its own steps (see `agent`).
 graph_builder.add_node("chatbot", chatbot)
-graph_builder.add_node("tools", ToolNode(tools=tools))
+graph_builder.add_node("tools", run_tools, retry_policy=node_retries.policy())
+graph_builder.add_node("draft_invitations", invitation_drafter.run)
 
-graph_builder.add_edge(START, "chatbot")
+graph_builder.add_edge(START, "fast_path")
 graph_builder.add_conditional_edges(
     "chatbot",
     tools_condition,
 )
 
 graph_builder.add_edge("tools", "chatbot")
+graph_builder.add_edge("draft_invitations", END)
 
 graph = graph_builder.compile(checkpointer=checkpointer)
 
@@ -73,10 +206,18 @@ def stream_graph_updates(user_input: str, thread_id: str = "1"):
     events = graph.stream(
         {"messages": [{"role": "user", "content": user_input}]},
         config,
-        stream_mode="values",
+        stream_mode=["values", "custom"],
+        subgraphs=True,
     )
-    for event in events:
-        if "messages" in event:
+    drafted = 0
+    for namespace, mode, event in events:
+        if mode == "custom" and event.get("event") == "draft":
+            drafted += 1
+            if event["draft"] is None:
+                print(f"⚠️ Couldn't draft {event['name']}'s invitation ({drafted}/{event['total']}): {event['error']}")
+            else:
+                print(f"✉️ Drafted {event['name']}'s invitation ({drafted}/{event['total']})")
+        elif mode == "values" and not namespace and "messages" in event:
             event["messages"][-1].pretty_print()
         
 
@@ -99,7 +240,7 @@ def resume_from_interrupt(response_data: str, thread_id: str = "1"):
         
         events = graph.stream(
             human_command,
-            config,
+            turn_config(config, human_command),
             stream_mode="values",
         )
         for event in events:
@@ -117,6 +258,24 @@ def resume_from_interrupt(response_data: str, thread_id: str = "1"):
         print(f"\n❌ Error during resume: {str(e)}")
 
 
+def retry_failed_turn(thread_id: str = "1"):
+    """
+    Finish a turn that failed part-way, from its last successful checkpoint.
+    
+    Args:
+        thread_id: Thread ID for conversation persistence
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    if not any(task.error is not None for task in graph.get_state(config).tasks):
+        print("\n💡 The last turn didn't fail; nothing to retry.")
+        return
+
+    print(f"\n🔁 Retrying from where the turn stopped...")
+    for event in graph.stream(None, turn_config(config, None), stream_mode="values"):
+        if "messages" in event:
+            event["messages"][-1].pretty_print()
+
+
 def check_for_interruption(thread_id: str = "1"):
     """
     Check if the graph is waiting for human input.
@@ -130,7 +289,9 @@ def check_for_interruption(thread_id: str = "1"):
     config = {"configurable": {"thread_id": thread_id}}
     try:
         state = graph.get_state(config)
-        return state.next == ('tools',) and state.tasks
+        # human_assistance runs inside the chatbot's agent, so the pending
+        # interrupt can sit on either node's task.
+        return any(task.interrupts for task in state.tasks)
     except:
         return False
 
@@ -168,8 +329,97 @@ def show_conversation_history(thread_id: str = "1", max_messages: int = 10):
     except Exception as e:
         print(f"\n❌ Error retrieving history: {str(e)}")
 
+def replay_cassette(source_thread_id: str, simulate_latency: bool = False, thread_id: str = None) -> dict:
+    """
+    Re-run a recorded thread turn by turn against its cassette.
+
+    Each recorded user message and resume value is streamed through the
+    graph on a fresh thread; model, Tavily and MCP calls are answered from
+    the cassette, so the run needs no network access and makes no live calls.
+
+    Args:
+        source_thread_id: Thread whose cassette to replay
+        simulate_latency: Sleep for each call's recorded latency
+        thread_id: Thread to replay into (default: a new "replay-..." thread)
+
+    Returns:
+        Per-turn wall-clock and recorded latency, call counts and key mismatches
+    """
+    thread_id = thread_id or f"replay-{source_thread_id}-{int(time.time() * 1000)}"
+    config = {"configurable": {"thread_id": thread_id}}
+    turns = []
+    with cassettes.replaying(source_thread_id, simulate_latency) as cassette:
+        for turn in cassette.turns():
+            if turn["key"] == "resume":
+                graph_input = Command(resume={"data": turn["result"]})
+            else:
+                graph_input = {"messages": [HumanMessage(content=turn["result"])]}
+            replayed, recorded = cassette.stats["replayed"], cassette.stats["recorded_latency"]
+            error = None
+            start = time.perf_counter()
+            try:
+                for _ in graph.stream(graph_input, turn_config(config, graph_input), stream_mode="values"):
+                    pass
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            turns.append({
+                "type": turn["key"],
+                "input": turn["result"],
+                "latency": round(time.perf_counter() - start, 4),
+                "recorded_latency": round(cassette.stats["recorded_latency"] - recorded, 4),
+                "calls": cassette.stats["replayed"] - replayed,
+                "error": error,
+            })
+            if error:
+                break
+        unused = sum(1 for e, used in zip(cassette.entries, cassette.used) if not used and e["kind"] != "turn")
+
+    state = graph.get_state(config)
+    messages = state.values.get("messages", []) if state.values else []
+    return {
+        "source_thread_id": source_thread_id,
+        "thread_id": thread_id,
+        "simulate_latency": simulate_latency,
+        "turns": turns,
+        "calls_replayed": cassette.stats["replayed"],
+        "mismatches": cassette.stats["mismatches"],
+        "unused": unused,
+        "response": messages[-1].content if messages else None,
+    }
+
+
+def print_replay_report(report: dict):
+    """Print a replay_cassette report as a table."""
+    print(f"\n🎞️ Replay of thread {report['source_thread_id']} into {report['thread_id']}")
+    print(f"{'turn':>4} {'type':>8} {'calls':>5} {'ms':>9} {'recorded ms':>12}  input")
+    for i, turn in enumerate(report["turns"], 1):
+        print(f"{i:>4} {turn['type']:>8} {turn['calls']:>5} {turn['latency'] * 1000:>9.1f} "
+              f"{turn['recorded_latency'] * 1000:>12.1f}  {turn['input'][:50]}")
+        if turn["error"]:
+            print(f"     ❌ {turn['error']}")
+    print(f"Calls replayed: {report['calls_replayed']}, key mismatches: {report['mismatches']}, "
+          f"unused recordings: {report['unused']}")
+    if report["response"]:
+        print(f"\n✨ Final Response:\n{report['response']}")
+
+
 def main():
     """Enhanced main function with better user experience."""
+    parser = argparse.ArgumentParser(description="Party Planning Assistant")
+    parser.add_argument("--record", action="store_true", help="Record model, search and MCP calls to cassettes")
+    parser.add_argument("--replay", metavar="THREAD_ID", help="Replay a recorded thread offline and exit")
+    parser.add_argument("--simulate-latency", action="store_true", help="Replay with the recorded call latencies")
+    parser.add_argument("--cassette-dir", help="Cassette directory (default: CASSETTE_DIR)")
+    args = parser.parse_args()
+
+    if args.cassette_dir:
+        cassettes.directory = args.cassette_dir
+    if args.replay:
+        print_replay_report(replay_cassette(args.replay, simulate_latency=args.simulate_latency))
+        return
+    if args.record:
+        cassettes.configure(mode="record")
+
     print("🎉 Party Planning Assistant - Enhanced with Memory & Human-in-the-Loop!")
     print("=" * 70)
     print("Features:")
@@ -180,11 +430,14 @@ def main():
     print("• 🔄 Resume interrupted conversations")
     print("• 🆔 Use different thread IDs for separate conversations")
     print("• 📊 LLM calls are being traced with Langfuse")
+    if cassettes.mode == "record":
+        print(f"• 🎞️ Recording cassettes to {cassettes.directory}")
     print("\nCommands:")
     print("• 'quit', 'exit', 'q' - Stop the assistant")
     print("• 'history' - Show recent conversation")
     print("• 'thread:ID' - Switch to thread ID (e.g., 'thread:party1')")
     print("• 'resume:your response' - Resume after human assistance request")
+    print("• 'retry' - Finish a turn that failed, without repeating what already succeeded")
     print("=" * 70)
     
     current_thread = "1"
@@ -201,6 +454,10 @@ def main():
                 show_conversation_history(current_thread)
                 continue
             
+            elif user_input.lower() == "retry":
+                retry_failed_turn(current_thread)
+                continue
+            
             elif user_input.lower().startswith("thread:"):
                 new_thread = user_input[7:].strip()
                 if new_thread:
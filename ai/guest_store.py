@@ -0,0 +1,286 @@
+import argparse
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config import DEFAULT_TENANT, GUEST_DATASET, GUEST_STORE_DIR
+from vector_engine import snapshot_lock
+
+
+# Columns every guest record has; imports may omit all but `name` (missing values become "").
+FIELDS = ("name", "relation", "description", "email")
+
+# Keywords mapping a free-text relation ("my younger sister") to a filterable category.
+RELATION_CATEGORIES = {
+    "family": ("family", "sister", "brother", "sibling", "mother", "father", "parent", "cousin", "aunt",
+               "uncle", "niece", "nephew", "grand", "wife", "husband", "in-law"),
+    "colleague": ("colleague", "coworker", "co-worker", "work", "boss", "manager", "team", "business"),
+    "friend": ("friend", "roommate", "classmate", "neighbor", "neighbour", "university", "school"),
+}
+
+# Stored columns: the record fields plus the filter columns derived from them.
+SCHEMA = pa.schema([(field, pa.string()) for field in FIELDS]
+                   + [("relation_category", pa.string()), ("email_domain", pa.string())])
+
+
+def relation_category(relation: str) -> str:
+    """Return "family", "colleague", "friend" or "other" for a relation description."""
+    relation = (relation or "").lower()
+    for category, keywords in RELATION_CATEGORIES.items():
+        if any(keyword in relation for keyword in keywords):
+            return category
+    return "other"
+
+
+def guest_metadata(guest: Dict[str, Any]) -> Dict[str, str]:
+    """Structured, filterable metadata stored with each guest document."""
+    email = guest.get("email") or ""
+    return {
+        "name": guest["name"],
+        "relation": guest.get("relation") or "",
+        "relation_category": relation_category(guest.get("relation")),
+        "email": email,
+        "email_domain": email.rsplit("@", 1)[-1].lower() if "@" in email else "",
+    }
+
+
+def normalize(table: pa.Table) -> pa.Table:
+    """
+    Conform an imported table to SCHEMA, deriving the filter columns with Arrow compute.
+
+    Gives the same relation_category and email_domain as `guest_metadata`,
+    without a Python loop over the rows.
+    """
+    if "name" not in table.column_names:
+        raise ValueError(f"Guest table needs a `name` column (got {', '.join(table.column_names)})")
+    columns = {}
+    for field in FIELDS:
+        column = table[field] if field in table.column_names else pa.nulls(len(table), pa.string())
+        columns[field] = pc.fill_null(pc.cast(column, pa.string()), "")
+
+    relation = pc.utf8_lower(columns["relation"])
+    category = pa.repeat("other", len(table)).cast(pa.string())
+    # Earlier categories win, so apply them last.
+    for name, keywords in reversed(list(RELATION_CATEGORIES.items())):
+        matches = pc.match_substring_regex(relation, "|".join(re.escape(k) for k in keywords))
+        category = pc.if_else(matches, name, category)
+    domain = pc.struct_field(pc.extract_regex(columns["email"], r"@(?P<domain>[^@]*)$"), "domain")
+    columns["relation_category"] = category
+    columns["email_domain"] = pc.fill_null(pc.utf8_lower(domain), "")
+    return pa.table(columns, schema=SCHEMA)
+
+
+class GuestStore:
+    """
+    One guest list as an Arrow IPC file, memory-mapped on first use.
+
+    The file is written uncompressed, so opening it maps the columns
+    straight from the page cache: no parsing, no per-guest Python objects,
+    and API workers share the same pages. Filters on relation category,
+    email domain and name are Arrow compute kernels over the mapped columns.
+
+    Writes go to a temporary file that atomically replaces the old one, so
+    readers holding the previous mapping keep a consistent table; the next
+    access after a write maps the new file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._table: Optional[pa.Table] = None
+        self._records: Optional[Tuple[Dict[str, Any], ...]] = None
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    @property
+    def table(self) -> pa.Table:
+        """The mapped table (empty while the file doesn't exist), remapped after a write."""
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            return SCHEMA.empty_table()
+        with self._lock:
+            if stamp != self._stamp:
+                with pa.memory_map(self.path, "r") as source:
+                    self._table = pa.ipc.open_file(source).read_all()
+                self._records = None
+                self._stamp = stamp
+            return self._table
+
+    @property
+    def count(self) -> int:
+        return self.table.num_rows
+
+    def filter(self, relation: Optional[str] = None, email_domain: Optional[str] = None,
+               name: Optional[str] = None) -> pa.Table:
+        """
+        Guests matching every given filter.
+
+        Args:
+            relation: Relation category ("family", "friend", "colleague" or "other")
+            email_domain: Email domain, e.g. "gmail.com"
+            name: Exact guest name
+
+        Returns:
+            The matching rows (the whole table without filters)
+        """
+        table = self.table
+        mask = None
+        for column, value in (("relation_category", relation and relation.lower()),
+                              ("email_domain", email_domain and email_domain.lower().lstrip("@")),
+                              ("name", name)):
+            if value:
+                matches = pc.equal(table[column], value)
+                mask = matches if mask is None else pc.and_(mask, matches)
+        return table if mask is None else table.filter(mask)
+
+    def mentioning(self, words: Iterable[str]) -> pa.Table:
+        """Guests whose name contains any of `words` as a whole word, ignoring case (one regex kernel)."""
+        words = sorted({word for word in words if word})
+        table = self.table
+        if not words:
+            return table.slice(0, 0)
+        pattern = r"\b(" + "|".join(re.escape(word) for word in words) + r")\b"
+        return table.filter(pc.match_substring_regex(table["name"], pattern, ignore_case=True))
+
+    def lookup(self, name: str) -> Optional[Dict[str, Any]]:
+        """The guest with exactly this name, or None."""
+        rows = self.filter(name=name).select(FIELDS).slice(0, 1).to_pylist()
+        return rows[0] if rows else None
+
+    def records(self) -> Tuple[Dict[str, Any], ...]:
+        """All guests as dicts (name, relation, description, email), built once per version of the file."""
+        table = self.table
+        with self._lock:
+            if self._records is None:
+                self._records = tuple(table.select(FIELDS).to_pylist())
+            return self._records
+
+    def write(self, table: pa.Table) -> int:
+        """Replace the guest list with `table` (any columns `normalize` accepts); returns the row count."""
+        table = normalize(table)
+        with snapshot_lock(os.path.dirname(self.path) or "."):
+            self._write_locked(table)
+        return table.num_rows
+
+    def missing(self, table: pa.Table) -> pa.Table:
+        """The rows of a normalized `table` whose name and email aren't in the guest list yet."""
+        stored = self.table
+        if not stored.num_rows:
+            return table
+        return table.filter(pc.invert(pc.is_in(_guest_key(table), value_set=_guest_key(stored))))
+
+    def append(self, table: pa.Table) -> int:
+        """
+        Add the rows of `table` to the guest list; returns the new row count.
+
+        Guests already stored (same name and email) are skipped, so appending
+        the same rows again, e.g. when an ingest is retried, adds nothing.
+        """
+        table = normalize(table)
+        with snapshot_lock(os.path.dirname(self.path) or "."):
+            if self.exists():
+                table = self.missing(table)
+                combined = pa.concat_tables([self.table, table])
+            else:
+                combined = table
+            self._write_locked(combined)
+        return combined.num_rows
+
+    def _write_locked(self, table: pa.Table):
+        partial = f"{self.path}.{os.getpid()}.partial"
+        with pa.OSFile(partial, "wb") as sink:
+            with pa.ipc.new_file(sink, SCHEMA) as writer:
+                writer.write_table(table, max_chunksize=65_536)
+        os.replace(partial, self.path)
+
+
+def _guest_key(table: pa.Table) -> pa.Array:
+    """Name and email joined, identifying a guest across appends."""
+    return pc.binary_join_element_wise(table["name"], table["email"], "\x1f")
+
+
+def from_records(guests: Iterable[Dict[str, Any]]) -> pa.Table:
+    """Table from guest dicts (name, relation, description, email)."""
+    return pa.Table.from_pylist([{field: guest.get(field) for field in FIELDS} for guest in guests])
+
+
+def read_source(source: str, split: str = "train") -> pa.Table:
+    """
+    Read guests from a CSV, Parquet or Arrow file, or a Hugging Face dataset name.
+
+    Args:
+        source: File path (by extension) or dataset name, e.g. "agents-course/unit3-invitees"
+        split: Dataset split
+
+    Returns:
+        The raw table; pass it to `GuestStore.write` or `append`
+    """
+    extension = os.path.splitext(source)[1].lower()
+    if extension == ".csv":
+        import pyarrow.csv as csv
+
+        return csv.read_csv(source, convert_options=csv.ConvertOptions(
+            column_types={field: pa.string() for field in FIELDS}))
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(source)
+    if extension in (".arrow", ".feather"):
+        with pa.memory_map(source, "r") as f:
+            return pa.ipc.open_file(f).read_all()
+    import datasets
+
+    return datasets.load_dataset(source, split=split).with_format("arrow")[:]
+
+
+@lru_cache(maxsize=1024)
+def _store(tenant: str) -> GuestStore:
+    return GuestStore(os.path.join(GUEST_STORE_DIR, f"{tenant}.arrow"))
+
+
+def get_guest_store(tenant: Optional[str] = None) -> GuestStore:
+    """
+    A tenant's guest store (default: DEFAULT_TENANT).
+
+    The default tenant's list is imported from GUEST_DATASET the first time
+    it is needed; later starts map the local file without touching the Hub.
+    """
+    store = _store(tenant or DEFAULT_TENANT)
+    if (tenant or DEFAULT_TENANT) == DEFAULT_TENANT and not store.exists():
+        table = read_source(GUEST_DATASET)
+        with snapshot_lock(GUEST_STORE_DIR):
+            # Another worker may have imported it while this one downloaded.
+            if not store.exists():
+                store._write_locked(normalize(table))
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import guests into a local guest store")
+    parser.add_argument("source", help="CSV, Parquet or Arrow file, or a Hugging Face dataset name")
+    parser.add_argument("--tenant", default=DEFAULT_TENANT)
+    parser.add_argument("--split", default="train", help="Dataset split")
+    parser.add_argument("--append", action="store_true", help="Add to the tenant's guests instead of replacing them")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = read_source(args.source, args.split)
+    store = _store(args.tenant)
+    count = store.append(table) if args.append else store.write(table)
+    print(f"{args.tenant}: {count} guests in {store.path} ({time.perf_counter() - start:.1f} s)")
+    if not args.append:
+        print("Its vector index still holds the previous guests; remove the tenant's snapshot or collection to re-embed.")
+
+
+if __name__ == "__main__":
+    main()
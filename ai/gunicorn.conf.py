@@ -0,0 +1,18 @@
+# Gunicorn settings for running the API with several uvicorn workers:
+#   CHECKPOINT_DB=/data/party_planner.db WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py api:app
+# Thread state, jobs and interrupts live in the shared CHECKPOINT_DB file, so a
+# follow-up request can land on any worker.
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Agent turns can chain several LLM and tool calls.
+timeout = int(os.getenv("WORKER_TIMEOUT", "300"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    if workers > 1 and not os.getenv("CHECKPOINT_DB"):
+        raise RuntimeError("WEB_CONCURRENCY > 1 needs CHECKPOINT_DB so workers share thread state")
@@ -1,7 +1,11 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
 from datetime import datetime
-from graph import check_for_interruption, graph
+from breakers import CircuitOpenError
+from graph import graph, turn_config
+from inbox import interrupt_inbox
+from registry import thread_registry
+from retries import node_retries
 
 
 def get_conversation_history(thread_id: str = "1", max_messages: int = 10) -> List[Dict[str, Any]]:
@@ -14,62 +18,209 @@ def get_conversation_history(thread_id: str = "1", max_messages: int = 10) -> Li
             return []
         
         messages = state.values['messages'][-max_messages:]
+        timestamp = datetime.now().isoformat()
         history = []
         
         for msg in messages:
             if isinstance(msg, HumanMessage):
-                history.append({
-                    "type": "human",
-                    "content": msg.content,
-                    "timestamp": datetime.now().isoformat()
-                })
+                history.append({"type": "human", "content": msg.content, "timestamp": timestamp})
             elif isinstance(msg, AIMessage):
-                history.append({
-                    "type": "assistant", 
-                    "content": msg.content,
-                    "timestamp": datetime.now().isoformat()
-                })
+                history.append({"type": "assistant", "content": msg.content, "timestamp": timestamp})
             elif isinstance(msg, SystemMessage):
-                history.append({
-                    "type": "system",
-                    "content": "[System message]",
-                    "timestamp": datetime.now().isoformat()
-                })
+                history.append({"type": "system", "content": "[System message]", "timestamp": timestamp})
             elif isinstance(msg, ToolMessage):
-                history.append({
-                    "type": "tool",
-                    "content": f"Tool ({msg.name}) executed",
-                    "timestamp": datetime.now().isoformat()
-                })
+                history.append({"type": "tool", "content": f"Tool ({msg.name}) executed", "timestamp": timestamp})
         
         return history
     except Exception as e:
         print(f"Error getting conversation history: {e}")
         return []
 
-def process_chat_message(message: str, thread_id: str = "1") -> tuple[str, str]:
-    """Process a chat message and return the final response and status."""
+def get_turn_usage(thread_id: str = "1") -> Dict[str, Any]:
+    """Sum LLM token usage for the latest turn, including the cached-token ratio."""
     try:
         config = {"configurable": {"thread_id": thread_id}}
-        user_message = HumanMessage(content=message)
+        state = graph.get_state(config)
+        messages = state.values.get('messages', []) if state.values else []
+
+        usage = {"llm_calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "tool_calls": 0}
+        for msg in reversed(messages):
+            if isinstance(msg, HumanMessage):
+                break
+            if isinstance(msg, AIMessage):
+                usage["tool_calls"] += len(msg.tool_calls)
+                if "stopped" in msg.response_metadata:
+                    usage["stopped"] = msg.response_metadata["stopped"]
+                    usage["llm_calls_saved"] = usage.get("llm_calls_saved", 0) + msg.response_metadata["llm_calls_saved"]
+                if "speculative_retrieval" in msg.response_metadata:
+                    usage["speculative_retrieval"] = msg.response_metadata["speculative_retrieval"]["outcome"]
+                    usage["retrieval_saved_ms"] = msg.response_metadata["speculative_retrieval"]["saved_ms"]
+            if isinstance(msg, ToolMessage) and msg.additional_kwargs.get("memoized"):
+                usage["tool_calls_memoized"] = usage.get("tool_calls_memoized", 0) + 1
+            if isinstance(msg, AIMessage) and msg.usage_metadata:
+                # Invitation fan-out answers carry the summed usage of all their drafting calls.
+                usage["llm_calls"] += msg.response_metadata.get("llm_calls", 1)
+                usage["input_tokens"] += msg.usage_metadata.get("input_tokens", 0)
+                usage["output_tokens"] += msg.usage_metadata.get("output_tokens", 0)
+                usage["cached_tokens"] += (msg.usage_metadata.get("input_token_details") or {}).get("cache_read", 0)
+
+        usage["cached_ratio"] = round(usage["cached_tokens"] / usage["input_tokens"], 4) if usage["input_tokens"] else 0.0
+        return usage
+    except Exception as e:
+        print(f"Error getting turn usage: {e}")
+        return {}
+
+def get_final_response(thread_id: str = "1") -> tuple[str, str]:
+    """Return the response text and status for the thread's latest turn."""
+    config = {"configurable": {"thread_id": thread_id}}
+    final_state = graph.get_state(config)
+
+    pending = get_pending_interrupt(final_state)
+    if pending:
+        return f"I need some additional information: {pending['query']}", "waiting_for_input"
+    
+    if final_state.values and 'messages' in final_state.values:
+        final_message = final_state.values['messages'][-1]
+        if hasattr(final_message, 'content') and final_message.__class__.__name__ == 'AIMessage':
+            return final_message.content, "completed"
+    
+    return "I'm sorry, I couldn't process your request. Please try again.", "error"
+
+def get_pending_interrupt(state) -> Optional[Dict[str, Any]]:
+    """Return {"interrupt_id", "query"} for the interrupt a thread is waiting on, or None."""
+    for task in state.tasks:
+        for pending in task.interrupts:
+            value = pending.value
+            query = value.get("query") if isinstance(value, dict) else value
+            return {"interrupt_id": pending.id, "query": str(query)}
+    return None
+
+def update_thread_registry(thread_id: str = "1", owner: Optional[str] = None):
+    """Refresh the thread's registry entry and interrupt inbox entry after a turn."""
+    try:
+        config = {"configurable": {"thread_id": thread_id}}
+        state = graph.get_state(config)
+        message_count = len(state.values.get('messages', [])) if state.values else 0
+        pending = get_pending_interrupt(state)
+        thread_registry.touch(thread_id, message_count, pending is not None, owner)
+        if owner is None and pending is not None:
+            owner = (thread_registry.get(thread_id) or {}).get("owner")
+        interrupt_inbox.sync(thread_id, pending, owner)
+    except Exception as e:
+        print(f"Error updating thread registry: {e}")
+
+def get_failed_turn(thread_id: str = "1") -> Optional[Dict[str, Any]]:
+    """
+    Return the thread's latest turn if it failed part-way, else None.
+
+    A node that raises leaves the thread at its last successful checkpoint,
+    with the failed node still to run and its error recorded on the task.
+
+    Args:
+        thread_id: Thread ID to check
+
+    Returns:
+        {"node", "error", "checkpoint_id", "message"}: the node that failed,
+        its error, the checkpoint the turn resumes from and the turn's message
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    state = graph.get_state(config)
+    for task in state.tasks:
+        if task.error is not None and not task.interrupts:
+            message = next((m for m in reversed(state.values.get("messages", [])) if isinstance(m, HumanMessage)), None)
+            return {"node": task.name, "error": str(task.error),
+                    "checkpoint_id": state.config["configurable"]["checkpoint_id"],
+                    "message": message.content if message is not None else None}
+    return None
+
+def resume_failed_turn(thread_id: str = "1") -> Optional[tuple[str, str]]:
+    """
+    Finish a failed turn from its last successful checkpoint.
+
+    The failed node runs again; when it is the agent, the agent resumes from
+    its own last completed step, so the model and tool calls that already
+    succeeded aren't repeated and no new message is added.
+
+    Args:
+        thread_id: Thread ID whose turn failed
+
+    Returns:
+        (response, status) like process_chat_message, or None if the thread has no failed turn
+    """
+    if get_failed_turn(thread_id) is None:
+        return None
+    try:
+        # Resume at the thread's head: naming its checkpoint id instead would
+        # replay the agent's steps from the start (time travel), not resume them.
+        list(graph.stream(None, turn_config({"configurable": {"thread_id": thread_id}}, None), stream_mode="values"))
+        node_retries.record_resume(True)
+        return get_final_response(thread_id)
+    except CircuitOpenError as e:
+        node_retries.record_resume(False)
+        return f"The assistant is temporarily unavailable: {e}. Please try again shortly.", "error"
+    except Exception as e:
+        node_retries.record_resume(False)
+        print(f"Error resuming failed turn: {e}")
+        return f"An error occurred: {str(e)}", "error"
+
+def _turn_input(message: str, thread_id: str, tenant: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Graph input for a new message; None resumes the thread's failed turn when the message is sent again."""
+    failed = get_failed_turn(thread_id)
+    if failed is not None and failed["message"] == message:
+        return None
+    return {"messages": [HumanMessage(content=message)], **({"tenant": tenant} if tenant else {})}
+
+def process_chat_message(message: str, thread_id: str = "1", tenant: Optional[str] = None) -> tuple[str, str]:
+    """Process a chat message and return the final response and status (`tenant` switches the thread's guest list)."""
+    try:
+        config = {"configurable": {"thread_id": thread_id}}
+        graph_input = _turn_input(message, thread_id, tenant)
+        if graph_input is None:
+            return resume_failed_turn(thread_id)
         
         events = list(graph.stream(
-            {"messages": [user_message]}, 
+            graph_input, 
             config=config,
             stream_mode="values"
         ))
         
-        if check_for_interruption(thread_id):
-            return "I need some additional information. Please provide more details.", "waiting_for_input"
-        
-        final_state = graph.get_state(config)
-        if final_state.values and 'messages' in final_state.values:
-            final_message = final_state.values['messages'][-1]
-            if hasattr(final_message, 'content') and final_message.__class__.__name__ == 'AIMessage':
-                return final_message.content, "completed"
-        
-        return "I'm sorry, I couldn't process your request. Please try again.", "error"
+        return get_final_response(thread_id)
         
+    except CircuitOpenError as e:
+        return f"The assistant is temporarily unavailable: {e}. Please try again shortly.", "error"
+    except Exception as e:
+        print(f"Error processing chat message: {e}")
+        return f"An error occurred: {str(e)}. Send the same message again to continue where it stopped.", "error"
+
+def stream_chat_message(message: str, thread_id: str = "1", tenant: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Process a chat message, yielding invitation drafts as they finish.
+
+    Args:
+        message: The user's message
+        thread_id: Thread ID for conversation persistence
+        tenant: Switches the thread's guest list
+
+    Returns:
+        Iterator of {"event": "draft", ...} per guest when the turn drafts
+        invitations for everyone, then {"event": "response", "response", "status"}
+    """
+    resuming = False
+    try:
+        config = {"configurable": {"thread_id": thread_id}}
+        graph_input = _turn_input(message, thread_id, tenant)
+        resuming = graph_input is None
+        for _, event in graph.stream(graph_input, config=turn_config(config, graph_input), stream_mode="custom",
+                                     subgraphs=True):
+            if isinstance(event, dict) and event.get("event") == "draft":
+                yield event
+        response_text, status = get_final_response(thread_id)
+    except CircuitOpenError as e:
+        response_text, status = f"The assistant is temporarily unavailable: {e}. Please try again shortly.", "error"
     except Exception as e:
         print(f"Error processing chat message: {e}")
-        return f"An error occurred: {str(e)}", "error"
\ No newline at end of file
+        response_text, status = (f"An error occurred: {str(e)}. Send the same message again to continue where it "
+                                 "stopped.", "error")
+    if resuming:
+        node_retries.record_resume(status != "error")
+    yield {"event": "response", "response": response_text, "status": status}
@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import CHECKPOINT_DB
+from storage import connect
+
+
+class InterruptInbox:
+    """
+    Pending human_assistance interrupts across all threads.
+
+    Entries are added when a turn stops at an interrupt and removed when the
+    thread is resumed, from the same end-of-turn hook that updates the thread
+    registry, so listing never loads thread state. Every change is also
+    appended to an event log with a sequence number that the SSE feed
+    follows. In memory the inbox is an OrderedDict in arrival order (oldest
+    first); with a shared SQLite connection it is an `interrupts` table and
+    an `interrupt_events` log that every worker reads.
+    """
+
+    def __init__(self, conn=None, max_events: int = 10_000):
+        self.max_events = max_events
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._events: deque = deque(maxlen=max_events)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._conn = conn
+        if conn is not None:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS interrupts ("
+                "thread_id TEXT PRIMARY KEY, interrupt_id TEXT, query TEXT, owner TEXT, created_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS interrupts_created ON interrupts (created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS interrupts_owner ON interrupts (owner, created_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS interrupt_events ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, thread_id TEXT, data TEXT)"
+            )
+            conn.commit()
+
+    def sync(self, thread_id: str, pending: Optional[Dict[str, Any]], owner: Optional[str] = None):
+        """
+        Bring a thread's entry in line with the end of its latest turn.
+
+        Args:
+            thread_id: Thread that just finished a turn
+            pending: {"interrupt_id", "query"} if the thread is waiting for input, else None
+            owner: Thread owner, shown to operators
+        """
+        with self._lock:
+            current = self._get_locked(thread_id)
+            if pending is None:
+                if current is not None:
+                    self._remove_locked(thread_id)
+                    self._append_locked("resolved", thread_id, {"thread_id": thread_id})
+                return
+            if current is not None and current["interrupt_id"] == pending["interrupt_id"]:
+                return
+
+            entry = {
+                "thread_id": thread_id,
+                "interrupt_id": pending["interrupt_id"],
+                "query": pending["query"],
+                "owner": owner,
+                "created_at": time.time(),
+            }
+            self._put_locked(entry)
+            self._append_locked("interrupt", thread_id, entry)
+
+    def get(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._get_locked(thread_id)
+        return _with_age(entry) if entry else None
+
+    def list(self, owner: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        List pending interrupts, oldest first.
+
+        Args:
+            owner: Only interrupts on this owner's threads
+            limit: Page size
+            offset: Number of interrupts to skip
+
+        Returns:
+            Entries with their age in seconds
+        """
+        with self._lock:
+            if self._conn is not None:
+                where, params = ("WHERE owner = ?", (owner,)) if owner is not None else ("", ())
+                rows = self._conn.execute(
+                    f"SELECT thread_id, interrupt_id, query, owner, created_at FROM interrupts {where} "
+                    "ORDER BY created_at LIMIT ? OFFSET ?",
+                    (*params, limit, offset),
+                ).fetchall()
+                entries = [_row_to_entry(row) for row in rows]
+            else:
+                matching = (e for e in self._entries.values() if owner is None or e["owner"] == owner)
+                entries = [dict(entry) for entry in islice(matching, offset, offset + limit)]
+        return [_with_age(entry) for entry in entries]
+
+    def events_since(self, seq: int, limit: int = 500) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """Return (seq, kind, data) for changes after `seq`, oldest first."""
+        with self._lock:
+            if self._conn is not None:
+                rows = self._conn.execute(
+                    "SELECT seq, kind, data FROM interrupt_events WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)
+                ).fetchall()
+                return [(row[0], row[1], json.loads(row[2])) for row in rows]
+            return [event for event in self._events if event[0] > seq][:limit]
+
+    def last_seq(self) -> int:
+        with self._lock:
+            if self._conn is not None:
+                row = self._conn.execute("SELECT MAX(seq) FROM interrupt_events").fetchone()
+                return row[0] or 0
+            return self._seq
+
+    def _get_locked(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        if self._conn is not None:
+            row = self._conn.execute(
+                "SELECT thread_id, interrupt_id, query, owner, created_at FROM interrupts WHERE thread_id = ?",
+                (thread_id,),
+            ).fetchone()
+            return _row_to_entry(row) if row else None
+        entry = self._entries.get(thread_id)
+        return dict(entry) if entry else None
+
+    def _put_locked(self, entry: Dict[str, Any]):
+        if self._conn is not None:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO interrupts VALUES (?, ?, ?, ?, ?)",
+                (entry["thread_id"], entry["interrupt_id"], entry["query"], entry["owner"], entry["created_at"]),
+            )
+            self._conn.commit()
+            return
+        self._entries.pop(entry["thread_id"], None)
+        self._entries[entry["thread_id"]] = entry
+
+    def _remove_locked(self, thread_id: str):
+        if self._conn is not None:
+            self._conn.execute("DELETE FROM interrupts WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+            return
+        self._entries.pop(thread_id, None)
+
+    def _append_locked(self, kind: str, thread_id: str, data: Dict[str, Any]):
+        if self._conn is not None:
+            seq = self._conn.execute(
+                "INSERT INTO interrupt_events (kind, thread_id, data) VALUES (?, ?, ?)",
+                (kind, thread_id, json.dumps(data)),
+            ).lastrowid
+            self._conn.execute("DELETE FROM interrupt_events WHERE seq <= ?", (seq - self.max_events,))
+            self._conn.commit()
+            return
+        self._seq += 1
+        self._events.append((self._seq, kind, data))
+
+
+def _row_to_entry(row) -> Dict[str, Any]:
+    return dict(zip(("thread_id", "interrupt_id", "query", "owner", "created_at"), row))
+
+
+def _with_age(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {**entry, "age_seconds": round(time.time() - entry["created_at"], 1)}
+
+
+interrupt_inbox = InterruptInbox(conn=connect(CHECKPOINT_DB) if CHECKPOINT_DB else None)
@@ -0,0 +1,207 @@
+import re
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# Requests that need reasoning, writing or outside information go to the agent
+# even when they mention a guest.
+AGENT_WORDS = re.compile(
+    r"\b(draft|write|compose|plan|suggest|recommend|should|why|compare|idea|ideas|theme|"
+    r"weather|trend|trends|web|internet|news|invitation|message|seat|seating|menu)\b"
+)
+TITLES = {"dr", "dr.", "mr", "mr.", "mrs", "mrs.", "ms", "ms.", "prof", "prof.", "sir", "lady"}
+
+EMAIL = re.compile(r"\be-?mails?\b|\bemail address(es)?\b|\bcontact (details|info)\b")
+RELATION = re.compile(r"\brelat(ion|ionship|ed)\b|\bhow do i know\b")
+WHO_IS = re.compile(r"\b(who is|who's|tell me about|info on|details (on|about))\b")
+GUEST_LIST = re.compile(
+    r"\b(list|show|who are|who can come|who('s| is) coming|who could come|who can i invite)\b.*"
+    r"\b(guests?|invitees?|party|people)\b|\ball (the )?(potential )?guests\b"
+)
+FAMILY = re.compile(r"\bfamily\b")
+WORD = re.compile(r"[a-z0-9]+")
+# In a follow-up, a pronoun refers to someone from an earlier turn, and only an explicit
+# "all"/"everyone" asks about every guest.
+PRONOUNS = re.compile(r"\b(he|him|his|she|her|hers|they|them|their|theirs)\b")
+EVERYONE = re.compile(r"\b(all|every|everyone|everybody|each)\b")
+# What an answer about every guest needs the message to ask for.
+ALL_GUESTS = re.compile(
+    r"\b(guests?|invitees?|attendees|people|everyone|everybody|all)\b"
+    r"|\bwho (can|could) (come|i invite)\b|\bwho('s| is) coming\b"
+)
+# Wording the fast path can't apply: negation, and filters it has no column for.
+NEGATION = re.compile(r"\b(not|no|except|excluding|without|besides|other than)\b|n't\b")
+QUALIFIERS = re.compile(r"@|\.(com|org|net)\b|\b(from|at|works?|working|company|employer|domain)\b")
+# Instructions to contact or invite someone, which the agent carries out.
+IMPERATIVE = re.compile(r"^(please )?(e-?mail|mail|invite|text|send|reach out|contact(?! (details|info)))\b")
+# Capitalised words after the first one: names of people or companies.
+PROPER_NOUN = re.compile(r"(?<!^)(?<![.!?] )\b[A-Z][a-z]+\b")
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 4)
+
+
+class IntentRouter:
+    """
+    Rule-based intent classifier in front of the agent.
+
+    Recognizes plain guest lookups (emails, a guest's relation, who a guest
+    is, the guest list, family members) and answers them straight from the
+    guest store, without a model call. Names and relations are matched with
+    Arrow compute over the store's columns and only the matching rows (at
+    most `max_listed` for the whole list) are turned into dicts. Anything else, including lookups
+    that also ask for writing or planning, returns None and goes to the
+    agent. Tracks fast-path hit rate and latency next to the agent's.
+    """
+
+    def __init__(self, store_loader: Callable[[], Any], max_words: int = 20, max_listed: int = 50,
+                 window: int = 500):
+        self.store_loader = store_loader
+        self.max_words = max_words
+        self.max_listed = max_listed
+        self.latencies = {"fast_path": deque(maxlen=window), "agent": deque(maxlen=window)}
+        self.stats = {"turns": 0, "fast_path": 0, "agent": 0}
+        self._lock = threading.Lock()
+
+    def classify(self, text: str, follow_up: bool = False) -> Optional[Tuple[str, List[Dict[str, Any]], int]]:
+        """
+        Classify a user message.
+
+        Args:
+            text: The user's message
+            follow_up: The thread has earlier turns, so "her" or "their" may mean a guest from them
+
+        Returns:
+            (intent, matched guests, number of matches) for a lookup the fast path can answer, else None;
+            the list of every guest is cut at `max_listed`
+        """
+        proper_nouns = {word.lower() for word in PROPER_NOUN.findall(text.strip())} - {"i"}
+        text = text.lower().strip()
+        if not text or len(text.split()) > self.max_words or AGENT_WORDS.search(text):
+            return None
+        if NEGATION.search(text) or QUALIFIERS.search(text) or IMPERATIVE.search(text):
+            return None
+        everyone = bool(EVERYONE.search(text))
+        if follow_up and not everyone and PRONOUNS.search(text):
+            return None
+
+        wants_email = bool(EMAIL.search(text))
+        wants_relation = bool(RELATION.search(text))
+        wants_info = bool(WHO_IS.search(text))
+        wants_list = bool(GUEST_LIST.search(text))
+        wants_family = bool(FAMILY.search(text)) and ("guest" in text or "search" in text or "list" in text)
+        if not (wants_email or wants_relation or wants_info or wants_list or wants_family):
+            return None
+
+        try:
+            store = self.store_loader()
+            candidates = store.mentioning(word for word in WORD.findall(text) if len(word) >= 3)
+            named = [guest for guest in _rows(candidates) if _mentions(text, guest["name"])]
+        except Exception as e:
+            print(f"Error reading guests for the fast path: {e}")
+            return None
+        if proper_nouns - {part for guest in named for part in guest["name"].lower().replace(".", "").split()}:
+            # Someone (or some company) who isn't a guest: "What is Bob Smith's email?"
+            return None
+        # Every guest only when the message asks about all of them, and in a follow-up only with "all"/"everyone".
+        all_guests = bool(ALL_GUESTS.search(text)) and (everyone or not follow_up)
+
+        if wants_email:
+            if named:
+                return "guest_emails", named, len(named)
+            if not all_guests:
+                return None
+            return ("guest_emails", *self._listed(store.table))
+        if wants_relation and named:
+            return "guest_relation", named, len(named)
+        if wants_info and named:
+            return "guest_info", named, len(named)
+        if wants_family:
+            return ("family_members", *self._listed(store.filter(relation="family")))
+        if wants_list and not named and all_guests:
+            return ("guest_list", *self._listed(store.table))
+        return None
+
+    def _listed(self, table) -> Tuple[List[Dict[str, Any]], int]:
+        return _rows(table, self.max_listed), table.num_rows
+
+    def answer(self, text: str, follow_up: bool = False) -> Optional[Tuple[str, str]]:
+        """Return (intent, answer text) for a recognized lookup, or None to use the agent."""
+        match = self.classify(text, follow_up)
+        if match is None:
+            return None
+        intent, guests, total = match
+        return intent, format_answer(intent, guests, total)
+
+    def record(self, path: str, latency: float):
+        """Record a turn served by "fast_path" or "agent"."""
+        with self._lock:
+            self.stats["turns"] += 1
+            self.stats[path] += 1
+            self.latencies[path].append(latency)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit rate and latency percentiles for both paths."""
+        with self._lock:
+            report = {**self.stats}
+            report["hit_rate"] = round(self.stats["fast_path"] / self.stats["turns"], 4) if self.stats["turns"] else 0.0
+            for path, latencies in self.latencies.items():
+                ordered = sorted(latencies)
+                report[f"{path}_p50_latency"] = _percentile(ordered, 0.50)
+                report[f"{path}_p95_latency"] = _percentile(ordered, 0.95)
+        return report
+
+
+def _mentions(text: str, name: str) -> bool:
+    """True if the full name, or a distinctive part of it (e.g. the surname), appears in the text."""
+    name = name.lower()
+    if name in text:
+        return True
+    parts = [part for part in name.split() if part not in TITLES and len(part) >= 3]
+    return any(re.search(rf"\b{re.escape(part)}\b", text) for part in parts)
+
+
+def _rows(table, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Guest dicts for the first `limit` rows of a guest-store table (all rows without a limit)."""
+    from guest_store import FIELDS
+
+    table = table.select(FIELDS)
+    return (table if limit is None else table.slice(0, limit)).to_pylist()
+
+
+def format_answer(intent: str, guests: List[Dict[str, Any]], total: Optional[int] = None) -> str:
+    """Render a lookup answer from guest records; `total` above len(guests) notes the rows left out."""
+    more = f"\n\n...and {total - len(guests)} more." if total and total > len(guests) else ""
+    if not guests:
+        if intent == "family_members":
+            return "I couldn't find any family members in your guest list."
+        return "I couldn't find any matching guests in your database."
+
+    if intent == "guest_emails":
+        lines = [f"- **{guest['name']}**: {guest['email']}" for guest in guests]
+        return "Here are the email addresses:\n\n" + "\n".join(lines) + more
+    if intent == "guest_relation":
+        lines = [f"- **{guest['name']}**: {guest['relation']}" for guest in guests]
+        return "\n".join(lines)
+    if intent == "guest_info":
+        return "\n\n".join(
+            f"**{guest['name']}** ({guest['relation']})\n{guest['description']}\nEmail: {guest['email']}"
+            for guest in guests
+        )
+    lines = [f"- **{guest['name']}**: {guest['relation']}" for guest in guests]
+    title = "Family members in your guest list" if intent == "family_members" else "Here are your potential guests"
+    return f"{title}:\n\n" + "\n".join(lines) + more
+
+
+def load_store():
+    """The default tenant's memory-mapped guest store."""
+    from guest_store import get_guest_store
+
+    return get_guest_store()
+
+
+intent_router = IntentRouter(load_store)
@@ -0,0 +1,390 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+from langgraph.types import Command
+
+from config import CHECKPOINT_DB, JOB_LEASE_SECONDS, JOB_RESULT_TTL, JOB_WORKERS
+from graph import graph, turn_config
+from helper import get_conversation_history, get_final_response, get_turn_usage, update_thread_registry
+from limits import thread_budget
+from storage import connect
+
+
+# Job statuses that still need work; anything else is final.
+ACTIVE_STATUSES = ("queued", "running")
+# Reported for an active job once it has been cancelled, until its worker stops it.
+CANCELLING = "cancelling"
+
+
+class JobCancelled(Exception):
+    """Raised inside a graph run when its job has been cancelled."""
+
+
+class CancellationHandler(BaseCallbackHandler):
+    """Abort the graph run at the next model or tool call once cancelled (here, or via `requested`)."""
+
+    raise_error = True
+
+    def __init__(self, event: threading.Event, requested: Optional[Callable[[], bool]] = None):
+        self.event = event
+        self.requested = requested
+
+    def _check(self, *args, **kwargs):
+        if not self.event.is_set() and self.requested is not None and self.requested():
+            self.event.set()
+        if self.event.is_set():
+            raise JobCancelled()
+
+    on_chat_model_start = _check
+    on_llm_start = _check
+    on_tool_start = _check
+
+
+class JobManager:
+    """
+    Run chat turns on a worker pool and track them by job id.
+
+    Jobs are kept in memory. When a database path is given they are also
+    written to a shared `jobs` table so any API worker can report on or
+    cancel them. Each process holds a lease on the jobs it runs and renews
+    it from a maintenance thread; jobs whose lease has expired (their
+    worker stopped) are claimed by another worker and continue from the
+    last checkpoint.
+
+    Jobs on the same thread run one after another, in the order they were
+    queued, so their checkpoints never interleave. Finished jobs are dropped
+    from memory after `result_ttl` seconds; the shared table keeps them.
+
+    Cancelling a job another worker runs flags it in the shared table; the
+    job is reported as "cancelling" until its worker sees the flag (before
+    the job starts, at its next model or tool call or graph step, or on its
+    next heartbeat) and marks it cancelled.
+    """
+
+    def __init__(self, max_workers: int = 4, db_path: str = "", lease_seconds: float = 30.0,
+                 result_ttl: float = 3600.0):
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.worker_id = uuid.uuid4().hex
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self._events: Dict[str, threading.Event] = {}
+        # Job ids waiting per thread; a thread has an entry while its runner is on the pool.
+        self._thread_queues: Dict[str, Deque[str]] = {}
+        # (finished at, job id), oldest first.
+        self._finished: Deque[Tuple[float, str]] = deque()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chat-job")
+        self._db = None
+        self._maintenance = None
+        if db_path:
+            self._db = connect(db_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, status TEXT, worker TEXT, lease_until REAL, "
+                "cancel_requested INTEGER DEFAULT 0, data TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_until)")
+            self._db.commit()
+
+    def submit(self, kind: str, thread_id: str, payload: str, owner: Optional[str] = None,
+               tenant: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue a chat turn.
+
+        Args:
+            kind: "chat" for a new message, "resume" to answer an interruption
+            thread_id: Thread ID for conversation persistence
+            payload: The user message or the human response
+            owner: Owner recorded in the thread registry
+            tenant: Guest list for the thread (chat jobs; keeps the thread's when None)
+
+        Returns:
+            The job record
+        """
+        now = time.time()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "thread_id": thread_id,
+            "payload": payload,
+            "owner": owner,
+            "tenant": tenant,
+            "status": "queued",
+            "result": None,
+            "error": None,
+            "start_checkpoint_id": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self._save(job)
+        self._schedule(job)
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._evict_locked(time.time())
+            job = self.jobs.get(job_id)
+            if job:
+                return self._report_locked(job)
+        return self._load(job_id)
+
+    def list(self, thread_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._evict_locked(time.time())
+            return [self._report_locked(job) for job in self.jobs.values()
+                    if thread_id is None or job["thread_id"] == thread_id]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a job. Running graphs stop before their next model or tool call.
+
+        Returns:
+            The job record: "cancelled", or "cancelling" while a running job
+            (or one another worker owns) hasn't stopped yet; None if unknown
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job["status"] in ACTIVE_STATUSES:
+                self._events[job_id].set()
+                if job["status"] == "queued":
+                    job["status"] = "cancelled"
+                    job["updated_at"] = time.time()
+        if job is not None:
+            self._save(job)
+            return self.get(job_id)
+
+        # Owned by another worker: flag it for the owner to stop.
+        if self._load(job_id) is None:
+            return None
+        with self._lock:
+            self._db.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+            self._db.commit()
+        return self._load(job_id)
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        """True if another worker flagged the job for cancellation."""
+        if self._db is None:
+            return False
+        with self._lock:
+            row = self._db.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def start(self):
+        """Start the lease/recovery thread and claim jobs left by stopped workers."""
+        if self._db is None or self._maintenance is not None:
+            return
+        self.recover()
+        self._maintenance = threading.Thread(target=self._maintain, name="chat-job-lease", daemon=True)
+        self._maintenance.start()
+
+    def recover(self):
+        """Claim and re-queue unfinished jobs whose lease has expired."""
+        if self._db is None:
+            return
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT job_id, lease_until, cancel_requested, data FROM jobs "
+                "WHERE status IN (?, ?) AND lease_until < ?",
+                (*ACTIVE_STATUSES, now),
+            ).fetchall()
+        for job_id, lease_until, cancel_requested, data in rows:
+            with self._lock:
+                claimed = self._db.execute(
+                    "UPDATE jobs SET worker = ?, lease_until = ? WHERE job_id = ? AND lease_until = ?",
+                    (self.worker_id, now + self.lease_seconds, job_id, lease_until),
+                ).rowcount
+                self._db.commit()
+            if not claimed:
+                continue
+            job = json.loads(data)
+            if cancel_requested:
+                # Cancelled while its worker was gone: don't run it again.
+                job["status"] = "cancelled"
+                job["updated_at"] = time.time()
+                self._save(job)
+            else:
+                self._schedule(job)
+
+    def _maintain(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                self._heartbeat()
+                self.recover()
+            except Exception as e:
+                print(f"Error maintaining chat jobs: {e}")
+
+    def _heartbeat(self):
+        """Renew leases on this worker's jobs and apply cancellations requested elsewhere."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET lease_until = ? WHERE worker = ? AND status IN (?, ?)",
+                (time.time() + self.lease_seconds, self.worker_id, *ACTIVE_STATUSES),
+            )
+            self._db.commit()
+            cancelled = self._db.execute(
+                "SELECT job_id FROM jobs WHERE worker = ? AND cancel_requested = 1 AND status IN (?, ?)",
+                (self.worker_id, *ACTIVE_STATUSES),
+            ).fetchall()
+            for (job_id,) in cancelled:
+                if job_id in self._events:
+                    self._events[job_id].set()
+
+    def _schedule(self, job: Dict[str, Any]):
+        thread_id = job["thread_id"]
+        with self._lock:
+            self._evict_locked(time.time())
+            self.jobs[job["job_id"]] = job
+            self._events[job["job_id"]] = threading.Event()
+            if thread_id in self._thread_queues:
+                # The thread's runner is busy with an earlier job and takes this one next.
+                self._thread_queues[thread_id].append(job["job_id"])
+                return
+            self._thread_queues[thread_id] = deque([job["job_id"]])
+        self._executor.submit(self._run_thread, thread_id)
+
+    def _run_thread(self, thread_id: str):
+        """Run a thread's queued jobs one at a time until its queue is empty."""
+        while True:
+            with self._lock:
+                pending = self._thread_queues[thread_id]
+                if not pending:
+                    del self._thread_queues[thread_id]
+                    return
+                job_id = pending.popleft()
+            try:
+                self._run(job_id)
+            except Exception as e:
+                print(f"Error running chat job {job_id}: {e}")
+            with self._lock:
+                if self.jobs[job_id]["status"] not in ACTIVE_STATUSES:
+                    self._finished.append((time.time(), job_id))
+
+    def _evict_locked(self, now: float):
+        while self._finished and self._finished[0][0] <= now - self.result_ttl:
+            _, job_id = self._finished.popleft()
+            self.jobs.pop(job_id, None)
+            self._events.pop(job_id, None)
+
+    def _run(self, job_id: str):
+        with self._lock:
+            job = self.jobs[job_id]
+            event = self._events[job_id]
+            if job["status"] == "cancelled":
+                return
+        if self._cancel_requested(job_id):
+            event.set()
+        with self._lock:
+            if event.is_set():
+                job["status"] = "cancelled"
+                job["updated_at"] = time.time()
+                self._save_locked(job)
+                return
+            resuming = job["status"] == "running"
+            job["status"] = "running"
+            job["updated_at"] = time.time()
+
+        config = {
+            "configurable": {"thread_id": job["thread_id"]},
+            "callbacks": [CancellationHandler(event, lambda: self._cancel_requested(job_id))],
+        }
+        try:
+            should_run, graph_input = self._graph_input(job, config, resuming)
+            self._save(job)
+            if should_run:
+                for _ in graph.stream(graph_input, turn_config(config, graph_input), stream_mode="updates",
+                                      subgraphs=True):
+                    if event.is_set() or self._cancel_requested(job_id):
+                        raise JobCancelled()
+
+            response_text, status = get_final_response(job["thread_id"])
+            usage = get_turn_usage(job["thread_id"])
+            thread_budget.record(job["thread_id"], usage)
+            update_thread_registry(job["thread_id"], job.get("owner"))
+            job["result"] = {
+                "response": response_text,
+                "thread_id": job["thread_id"],
+                "status": status,
+                "conversation_history": get_conversation_history(job["thread_id"]),
+                "usage": usage,
+            }
+            job["status"] = "completed"
+        except JobCancelled:
+            job["status"] = "cancelled"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["updated_at"] = time.time()
+            self._save(job)
+
+    def _graph_input(self, job: Dict[str, Any], config: Dict[str, Any], resuming: bool):
+        """
+        Pick the graph input for a job.
+
+        Returns:
+            (should_run, input). After a restart a job whose turn already
+            reached the checkpointer continues from the last checkpoint with a
+            `None` input, or doesn't run at all if the turn had finished.
+        """
+        state = graph.get_state(config)
+        checkpoint_id = state.config.get("configurable", {}).get("checkpoint_id") if state.config else None
+
+        if resuming and checkpoint_id != job["start_checkpoint_id"]:
+            return bool(state.next) and not _is_interrupted(state), None
+
+        job["start_checkpoint_id"] = checkpoint_id
+        if job["kind"] == "resume":
+            return True, Command(resume={"data": job["payload"]})
+        graph_input = {"messages": [HumanMessage(content=job["payload"])]}
+        if job.get("tenant"):
+            graph_input["tenant"] = job["tenant"]
+        return True, graph_input
+
+    def _report_locked(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        job = dict(job)
+        if job["status"] in ACTIVE_STATUSES and self._events[job["job_id"]].is_set():
+            job["status"] = CANCELLING
+        return job
+
+    def _save(self, job: Dict[str, Any]):
+        with self._lock:
+            self._save_locked(job)
+
+    def _save_locked(self, job: Dict[str, Any]):
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT INTO jobs (job_id, status, worker, lease_until, data) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (job_id) DO UPDATE SET status = excluded.status, data = excluded.data",
+            (job["job_id"], job["status"], self.worker_id, time.time() + self.lease_seconds, json.dumps(job)),
+        )
+        self._db.commit()
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT data, cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = json.loads(row[0])
+        if row[1] and job["status"] in ACTIVE_STATUSES:
+            job["status"] = CANCELLING
+        return job
+
+
+def _is_interrupted(state) -> bool:
+    return any(task.interrupts for task in state.tasks)
+
+
+job_manager = JobManager(max_workers=JOB_WORKERS, db_path=CHECKPOINT_DB, lease_seconds=JOB_LEASE_SECONDS,
+                         result_ttl=JOB_RESULT_TTL)
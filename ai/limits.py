@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from config import (
+    CHECKPOINT_DB,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_PER_MINUTE,
+    RATE_LIMIT_SHARED,
+    THREAD_TOKEN_BUDGET,
+    THREAD_TOOL_CALL_BUDGET,
+)
+from storage import connect
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter keyed by client (API key or IP).
+
+    Buckets are `[tokens, last_refill]` pairs in an LRU-ordered dict capped
+    at `max_clients`, so idle clients are dropped instead of growing memory.
+    With a shared SQLite connection the buckets live in a `rate_limits`
+    table instead, so all API workers enforce one limit per client.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_clients: int = 100_000, conn=None):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = conn
+        if conn is not None:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits (client TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+            )
+            conn.commit()
+
+    def acquire(self, client: str) -> Tuple[bool, float]:
+        """
+        Take one token from the client's bucket.
+
+        Returns:
+            (allowed, retry_after_seconds)
+        """
+        now = time.monotonic() if self._conn is None else time.time()
+        with self._lock:
+            if self._conn is not None:
+                return self._acquire_shared(client, now)
+
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = [float(self.burst), now]
+                self._buckets[client] = bucket
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+            return self._take(bucket, now)
+
+    def _take(self, bucket: list, now: float) -> Tuple[bool, float]:
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True, 0.0
+        return False, (1 - bucket[0]) / self.rate
+
+    def _acquire_shared(self, client: str, now: float) -> Tuple[bool, float]:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_limits WHERE client = ?", (client,)).fetchone()
+            bucket = list(row) if row else [float(self.burst), now]
+            result = self._take(bucket, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits (client, tokens, updated) VALUES (?, ?, ?)",
+                (client, bucket[0], bucket[1]),
+            )
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class ThreadBudget:
+    """
+    Per-thread LLM token and tool-call budget.
+
+    Usage is added after each turn from the AIMessages' usage metadata, and
+    `check()` is called before a new turn starts. Kept in memory, or in a
+    `thread_usage` table when a shared SQLite connection is given.
+    """
+
+    def __init__(self, max_tokens: int, max_tool_calls: int, conn=None):
+        self.max_tokens = max_tokens
+        self.max_tool_calls = max_tool_calls
+        self._usage: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._conn = conn
+        if conn is not None:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_usage (thread_id TEXT PRIMARY KEY, tokens INTEGER, tool_calls INTEGER)"
+            )
+            conn.commit()
+
+    def get(self, thread_id: str) -> Dict[str, int]:
+        with self._lock:
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT tokens, tool_calls FROM thread_usage WHERE thread_id = ?", (thread_id,)
+                ).fetchone()
+                tokens, tool_calls = row or (0, 0)
+            else:
+                tokens, tool_calls = self._usage.get(thread_id, (0, 0))
+        return {"tokens": tokens, "tool_calls": tool_calls}
+
+    def check(self, thread_id: str) -> Optional[str]:
+        """Return a reason string if the thread has used up its budget, else None."""
+        usage = self.get(thread_id)
+        if usage["tokens"] >= self.max_tokens:
+            return f"Thread token budget of {self.max_tokens} exhausted"
+        if usage["tool_calls"] >= self.max_tool_calls:
+            return f"Thread tool-call budget of {self.max_tool_calls} exhausted"
+        return None
+
+    def record(self, thread_id: str, usage: Dict[str, Any]):
+        """Add a turn's usage (see helper.get_turn_usage) to the thread's totals."""
+        tokens = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+        tool_calls = usage.get("tool_calls", 0)
+        if not tokens and not tool_calls:
+            return
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT INTO thread_usage (thread_id, tokens, tool_calls) VALUES (?, ?, ?) "
+                    "ON CONFLICT (thread_id) DO UPDATE SET tokens = tokens + excluded.tokens, "
+                    "tool_calls = tool_calls + excluded.tool_calls",
+                    (thread_id, tokens, tool_calls),
+                )
+                self._conn.commit()
+            else:
+                current = self._usage.setdefault(thread_id, [0, 0])
+                current[0] += tokens
+                current[1] += tool_calls
+
+
+def _shared_connection():
+    """A connection to CHECKPOINT_DB when limits should be shared across workers."""
+    if RATE_LIMIT_SHARED and CHECKPOINT_DB:
+        return connect(CHECKPOINT_DB)
+    return None
+
+
+rate_limiter = RateLimiter(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST, conn=_shared_connection())
+thread_budget = ThreadBudget(THREAD_TOKEN_BUDGET, THREAD_TOOL_CALL_BUDGET, conn=_shared_connection())
@@ -0,0 +1,187 @@
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from config import AGENT_ITERATIONS
+from intents import EMAIL, GUEST_LIST, RELATION, WHO_IS
+
+
+# Tools that only read, so a repeated call with the same arguments gets the same answer.
+MEMO_TOOLS = frozenset({"retrieval", "web_search", "get_mcp_tools"})
+
+# Requests that combine guests with outside information or several planning steps.
+PLANNING_WORDS = re.compile(
+    r"\b(plan|suggest|recommend|compare|theme|menu|seat|seating|ideas?|weather|trends?|news|web|internet|"
+    r"online|latest|draft|write|compose|invitations?|schedule|budget|venue)\b"
+)
+
+# Appended to a repeated call's earlier result, so the model answers from it instead of asking again.
+MEMO_NOTE = ("\n\n(You already made this exact call earlier in this turn; this is its result again. "
+             "Answer from it instead of repeating the call.)")
+# Tool output kept per result in a partial answer.
+PARTIAL_RESULT_CHARS = 1500
+
+
+def signature(call: Dict[str, Any]) -> Tuple[str, str]:
+    """Tool name plus its arguments, with string values case- and whitespace-normalized."""
+    args = {key: " ".join(value.lower().split()) if isinstance(value, str) else value
+            for key, value in (call.get("args") or {}).items()}
+    return call["name"], json.dumps(args, sort_keys=True, default=str)
+
+
+def current_turn(messages: List[Any]) -> List[Any]:
+    """Messages after the latest user message."""
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return messages[index + 1:]
+    return list(messages)
+
+
+def request_text(messages: List[Any]) -> str:
+    """The latest user message's text."""
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message.content if isinstance(message.content, str) else str(message.content)
+    return ""
+
+
+class LoopGuard:
+    """
+    Per-turn tool memo, loop detection and iteration budget for the agent.
+
+    Runs after every model call of the agent (its `post_model_hook`):
+
+    - A tool call identical to one made earlier in the turn (same tool,
+      same arguments up to case and spacing) is answered from the earlier
+      result, noted as a repeat, without running the tool again. Only
+      read-only tools (MEMO_TOOLS) are memoized.
+    - If the model repeats only calls it already made even after such a
+      note, it is looping: the turn ends right there.
+    - Each turn may make as many model calls as its request type's budget
+      (`budgets`: "lookup" for plain guest questions, "planning" for
+      requests that need planning or outside information, "default"
+      otherwise). A model call that still wants tools when the budget is
+      spent ends the turn.
+
+    A turn that ends early answers with what it found so far instead of
+    raising GraphRecursionError. The model calls a looping turn had left in
+    its budget are counted as saved.
+    """
+
+    def __init__(self, budgets: Dict[str, int]):
+        self.budgets = budgets
+        self.stats = {"memo_hits": 0, "loops_stopped": 0, "budget_stopped": 0, "llm_calls_saved": 0}
+        self._lock = threading.Lock()
+
+    def request_type(self, text: str) -> str:
+        """Classify a user message as "lookup", "planning" or "default"."""
+        text = text.lower()
+        if PLANNING_WORDS.search(text):
+            return "planning"
+        if EMAIL.search(text) or RELATION.search(text) or WHO_IS.search(text) or GUEST_LIST.search(text):
+            return "lookup"
+        return "default"
+
+    def budget(self, messages: List[Any]) -> int:
+        """Model calls allowed for the turn of the latest user message."""
+        return max(1, self.budgets[self.request_type(request_text(messages))])
+
+    def recursion_limit(self, messages: List[Any]) -> int:
+        """
+        Recursion limit for an agent run within the turn's budget.
+
+        A model call with tools takes three steps (model, this hook, tools),
+        the final one two; the limit leaves one spare so the budget, not
+        the limit, ends the turn.
+        """
+        return 3 * self.budget(messages) + 1
+
+    def post_model_hook(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Agent hook: answer repeated tool calls from the turn's memo, or end a looping or over-budget turn."""
+        messages = state["messages"]
+        response = messages[-1]
+        if not isinstance(response, AIMessage) or not response.tool_calls:
+            return {}
+        turn = current_turn(messages)
+        model_calls = sum(1 for m in turn if isinstance(m, AIMessage))
+        budget = self.budget(messages)
+
+        memo = self._memo(turn[:-1])
+        repeats = [call for call in response.tool_calls if call["name"] in MEMO_TOOLS and signature(call) in memo]
+        if repeats and len(repeats) == len(response.tool_calls) and _was_noted(turn):
+            saved = max(0, budget - model_calls)
+            with self._lock:
+                self.stats["loops_stopped"] += 1
+                self.stats["llm_calls_saved"] += saved
+            return {"messages": [self._stop(response, turn, "loop", saved)]}
+        if model_calls >= budget:
+            with self._lock:
+                self.stats["budget_stopped"] += 1
+            return {"messages": [self._stop(response, turn, "budget", 0)]}
+        if not repeats:
+            return {}
+
+        with self._lock:
+            self.stats["memo_hits"] += len(repeats)
+        return {"messages": [
+            ToolMessage(content=memo[signature(call)].content + MEMO_NOTE, name=call["name"],
+                        tool_call_id=call["id"], additional_kwargs={"memoized": True})
+            for call in repeats
+        ]}
+
+    def _memo(self, turn: List[Any]) -> Dict[Tuple[str, str], ToolMessage]:
+        """Signature -> result of every tool call made so far in the turn that didn't fail."""
+        results = {m.tool_call_id: m for m in turn if isinstance(m, ToolMessage) and m.status != "error"}
+        memo = {}
+        for message in turn:
+            if isinstance(message, AIMessage):
+                for call in message.tool_calls:
+                    if call["id"] in results:
+                        memo[signature(call)] = results[call["id"]]
+        return memo
+
+    def _stop(self, response: AIMessage, turn: List[Any], reason: str, saved: int) -> AIMessage:
+        """Replace the model's tool-calling response with the turn's best partial answer."""
+        return AIMessage(
+            content=partial_answer(response, turn, reason),
+            id=response.id,
+            response_metadata={**response.response_metadata, "stopped": reason, "llm_calls_saved": saved},
+            usage_metadata=response.usage_metadata,
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return memo hits, turns stopped early and model calls saved."""
+        with self._lock:
+            return {**self.stats, "budgets": dict(self.budgets)}
+
+
+def _was_noted(turn: List[Any]) -> bool:
+    """True if the model was already told it is repeating itself this turn."""
+    return any(isinstance(m, ToolMessage) and m.additional_kwargs.get("memoized") for m in turn)
+
+
+def partial_answer(response: AIMessage, turn: List[Any], reason: str) -> str:
+    """What the turn found before it was stopped: the model's own text, else its distinct tool results."""
+    if isinstance(response.content, str) and response.content.strip():
+        return response.content
+    seen, results = set(), []
+    for message in turn:
+        if isinstance(message, ToolMessage) and not message.additional_kwargs.get("memoized"):
+            content = str(message.content).strip()
+            if content and content not in seen:
+                seen.add(content)
+                if len(content) > PARTIAL_RESULT_CHARS:
+                    content = content[:PARTIAL_RESULT_CHARS].rstrip() + " ..."
+                results.append(f"**{message.name}**:\n{content}")
+    why = ("I kept repeating the same search" if reason == "loop"
+           else "this request needed more steps than I can take in one turn")
+    if not results:
+        return f"I couldn't finish this because {why}. Could you rephrase it or split it into smaller questions?"
+    return (f"I couldn't finish this because {why}, so here is what I found so far:\n\n" + "\n\n".join(results)
+            + "\n\nAsk a follow-up question and I'll pick it up from here.")
+
+
+loop_guard = LoopGuard(AGENT_ITERATIONS)
@@ -1,17 +1,131 @@
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
+from typing import Optional, List, Dict, Any, Literal, TypedDict
+from pydantic import BaseModel, Field
+
+from tenants import TENANT_PATTERN
 
 
 class ChatRequest(BaseModel):
     message: str
     thread_id: Optional[str] = "1"
+    owner: Optional[str] = None
+    # Host whose guest list the thread uses; kept for later turns once set.
+    tenant: Optional[str] = Field(None, pattern=TENANT_PATTERN)
+
+# A TypedDict rather than a model: histories are validated and serialized
+# entirely in pydantic-core, without a Python object per message.
+class HistoryItem(TypedDict):
+    type: Literal["human", "assistant", "system", "tool"]
+    content: str
+    timestamp: str
+
+class TurnUsage(BaseModel):
+    llm_calls: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    tool_calls: int = 0
+    cached_ratio: float = 0.0
+    speculative_retrieval: Optional[Literal["hit", "miss", "unused"]] = None
+    retrieval_saved_ms: float = 0.0
+    # Set when the agent stopped early: "loop" (repeating a tool call) or "budget".
+    stopped: Optional[Literal["loop", "budget"]] = None
+    llm_calls_saved: int = 0
+    tool_calls_memoized: int = 0
 
 class ChatResponse(BaseModel):
     response: str
     thread_id: str
     status: str
-    conversation_history: List[Dict[str, Any]]
+    conversation_history: List[HistoryItem]
+    usage: Optional[TurnUsage] = None
+
+class ConversationResponse(BaseModel):
+    thread_id: str
+    conversation_history: List[HistoryItem]
+    message_count: int
 
 class ResumeRequest(BaseModel):
     response_data: str
-    thread_id: Optional[str] = "1"
\ No newline at end of file
+    thread_id: Optional[str] = "1"
+
+class BatchItem(BaseModel):
+    thread_id: str
+    message: str
+
+class BatchChatRequest(BaseModel):
+    items: List[BatchItem]
+    owner: Optional[str] = None
+    tenant: Optional[str] = Field(None, pattern=TENANT_PATTERN)
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    thread_id: str
+    status: str
+    result: Optional[ChatResponse] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+
+class ThreadInfo(BaseModel):
+    thread_id: str
+    owner: Optional[str] = None
+    created_at: float
+    last_activity: float
+    message_count: int
+    interrupted: bool
+    status: str
+
+class ThreadListResponse(BaseModel):
+    threads: List[ThreadInfo]
+    next_offset: Optional[int] = None
+
+
+class InterruptInfo(BaseModel):
+    thread_id: str
+    interrupt_id: str
+    query: str
+    owner: Optional[str] = None
+    created_at: float
+    age_seconds: float
+
+class InterruptListResponse(BaseModel):
+    interrupts: List[InterruptInfo]
+    next_offset: Optional[int] = None
+
+class BulkResumeRequest(BaseModel):
+    items: List[ResumeRequest]
+
+class BulkResumeResponse(BaseModel):
+    jobs: List[JobResponse]
+    errors: List[Dict[str, str]]
+
+
+class Guest(BaseModel):
+    name: str
+    relation: Optional[str] = ""
+    description: Optional[str] = ""
+    email: Optional[str] = ""
+
+
+class GuestImportRequest(BaseModel):
+    guests: List[Guest] = Field(..., min_length=1)
+
+
+class TenantResponse(BaseModel):
+    tenant: str
+    open: bool
+    ingestion: Optional[Dict[str, Any]] = None
+
+
+class CassetteConfig(BaseModel):
+    mode: Optional[Literal["off", "record", "replay"]] = None
+    simulate_latency: Optional[bool] = None
+
+
+class ProfilingConfig(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = Field(None, ge=0.0, le=1.0)
+    interval_ms: Optional[float] = Field(None, ge=0.5, le=1000.0)
+    max_profiles: Optional[int] = Field(None, ge=1, le=1000)
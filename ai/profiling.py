@@ -0,0 +1,163 @@
+import random
+import sys
+import sysconfig
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional
+
+from config import PROFILE_INTERVAL_MS, PROFILE_MAX_PROFILES
+
+
+STDLIB = sysconfig.get_paths()["stdlib"] + "/"
+
+
+class StackSampler:
+    """
+    Statistical profiler for one thread.
+
+    A daemon thread reads the target thread's current frame every
+    `interval` seconds and counts the call stack, pyinstrument-style, so
+    time spent waiting (network, locks, executor futures) shows up next to
+    CPU time. Stacks are kept in folded form ("outer;inner;leaf"), which
+    flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.profile_id = uuid.uuid4().hex
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._start
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+
+class RequestProfiler:
+    """
+    Opt-in per-request profiling with a bounded store of recent profiles.
+
+    A request is profiled when it carries the profiling header, or when
+    sampling is switched on (admin endpoint) and it wins the `sample_rate`
+    draw. Finished profiles go into a ring buffer of the last `max_profiles`.
+    When sampling is off, the only per-request cost is one header lookup.
+    """
+
+    def __init__(self, max_profiles: int = 50, interval_ms: float = 5.0):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.interval_ms = interval_ms
+        self.profiles: deque = deque(maxlen=max_profiles)
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: Optional[bool] = None, sample_rate: Optional[float] = None,
+                  interval_ms: Optional[float] = None, max_profiles: Optional[int] = None) -> Dict[str, Any]:
+        """Update sampling settings; returns the current settings."""
+        with self._lock:
+            if enabled is not None:
+                self.enabled = enabled
+            if sample_rate is not None:
+                self.sample_rate = sample_rate
+            if interval_ms is not None:
+                self.interval_ms = interval_ms
+            if max_profiles is not None and max_profiles != self.profiles.maxlen:
+                self.profiles = deque(self.profiles, maxlen=max_profiles)
+            return self.settings()
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "interval_ms": self.interval_ms,
+            "max_profiles": self.profiles.maxlen,
+            "stored_profiles": len(self.profiles),
+        }
+
+    def should_profile(self, forced: bool) -> bool:
+        return forced or (self.enabled and random.random() < self.sample_rate)
+
+    def start(self) -> StackSampler:
+        """Start sampling the calling thread."""
+        return StackSampler(threading.get_ident(), self.interval_ms / 1000).start()
+
+    def finish(self, sampler: StackSampler, path: str) -> str:
+        """Stop a sampler and store its profile; returns the profile id."""
+        sampler.stop()
+        profile = {
+            "profile_id": sampler.profile_id,
+            "path": path,
+            "started_at": sampler.started_at,
+            "duration_ms": round(sampler.duration * 1000, 2),
+            "interval_ms": sampler.interval * 1000,
+            "samples": sampler.samples,
+            "stacks": sampler.stacks,
+        }
+        with self._lock:
+            self.profiles.append(profile)
+        return profile["profile_id"]
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries of stored profiles, newest first, with their top leaf frames."""
+        with self._lock:
+            profiles = list(self.profiles)
+        return [_summary(profile) for profile in reversed(profiles)]
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((p for p in self.profiles if p["profile_id"] == profile_id), None)
+
+
+def folded(profile: Dict[str, Any]) -> str:
+    """Render a profile as folded stacks ("frame;frame;frame count" per line)."""
+    return "\n".join(f"{stack} {count}" for stack, count in profile["stacks"].most_common()) + "\n"
+
+
+def _summary(profile: Dict[str, Any]) -> Dict[str, Any]:
+    leaves = Counter()
+    for stack, count in profile["stacks"].items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    total = profile["samples"] or 1
+    return {
+        **{key: value for key, value in profile.items() if key != "stacks"},
+        "top_frames": [
+            {"frame": frame, "share": round(count / total, 4)} for frame, count in leaves.most_common(10)
+        ],
+    }
+
+
+def _short_path(filename: str) -> str:
+    """Trim site-packages, stdlib and repo prefixes so frames stay readable."""
+    for marker in ("site-packages/", STDLIB, "/ai/"):
+        index = filename.rfind(marker)
+        if index != -1:
+            return filename[index + len(marker):]
+    return filename
+
+
+request_profiler = RequestProfiler(max_profiles=PROFILE_MAX_PROFILES, interval_ms=PROFILE_INTERVAL_MS)
@@ -1,4 +1,5 @@
 # Prompts for Party Invite Checklist Agent
+from langchain_core.messages import SystemMessage
 
 SYSTEM_PROMPT = """
 You are an advanced Party Planning Assistant with persistent memory capabilities. You can remember and reference previous conversations within the same thread. Your primary role is to help users organize their party events by:
@@ -59,6 +60,15 @@ When managing invitations and RSVPs, help with:
 Always maintain a professional yet friendly tone in all communications.
 """
 
+DRAFT_INVITATION_PROMPT = """
+You are drafting one personalized party invitation for the guest described below, as part of the host's request.
+
+- Address the guest by name and write in the host's voice, warm and matched to how well they know each other
+- Mention something from the guest's description so the invitation feels personal
+- Keep it to a short paragraph and follow any details the host gave (occasion, date, place, tone)
+- Reply with the invitation text only, without a subject line or notes to the host
+"""
+
 CONVERSATION_STARTERS = {
     "guest_discovery": [
         "Who would you like to invite to your party?",
@@ -121,6 +131,13 @@ def get_system_prompt():
     """Return the main system prompt for the party planning agent."""
     return SYSTEM_PROMPT
 
+# Built once so every model request starts with the same system message bytes.
+SYSTEM_MESSAGE = SystemMessage(content=SYSTEM_PROMPT)
+
+def get_system_message():
+    """Return the precomputed system message used as the static prompt prefix."""
+    return SYSTEM_MESSAGE
+
 def get_guest_search_prompt():
     """Return the prompt for guest search functionality."""
     return GUEST_SEARCH_PROMPT
@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import CHECKPOINT_DB
+from storage import connect
+
+
+@dataclass
+class ThreadRecord:
+    thread_id: str
+    owner: Optional[str]
+    created_at: float
+    last_activity: float
+    message_count: int = 0
+    interrupted: bool = False
+
+
+class ThreadRegistry:
+    """
+    Index of conversation threads kept next to the checkpointer.
+
+    In memory, threads sit in an OrderedDict ordered by last activity (a
+    touch moves the thread to the end), with per-owner and interrupted-only
+    OrderedDicts kept in the same order. Listing the N most recently active
+    threads walks the tail of one index, so it costs O(N) however many
+    threads exist. With a shared SQLite connection the same data lives in an
+    indexed `threads` table so every worker sees one registry.
+    """
+
+    def __init__(self, conn=None):
+        self._records: Dict[str, ThreadRecord] = {}
+        self._by_activity: "OrderedDict[str, None]" = OrderedDict()
+        self._by_owner: Dict[str, "OrderedDict[str, None]"] = {}
+        self._interrupted: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = conn
+        if conn is not None:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS threads ("
+                "thread_id TEXT PRIMARY KEY, owner TEXT, created_at REAL, last_activity REAL, "
+                "message_count INTEGER, interrupted INTEGER)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS threads_activity ON threads (last_activity)")
+            conn.execute("CREATE INDEX IF NOT EXISTS threads_owner ON threads (owner, last_activity)")
+            conn.execute("CREATE INDEX IF NOT EXISTS threads_interrupted ON threads (interrupted, last_activity)")
+            conn.commit()
+
+    def touch(self, thread_id: str, message_count: int, interrupted: bool, owner: Optional[str] = None):
+        """Record activity on a thread, creating its entry on first use."""
+        now = time.time()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT INTO threads VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (thread_id) DO UPDATE SET "
+                    "owner = COALESCE(excluded.owner, owner), last_activity = excluded.last_activity, "
+                    "message_count = excluded.message_count, interrupted = excluded.interrupted",
+                    (thread_id, owner, now, now, message_count, int(interrupted)),
+                )
+                self._conn.commit()
+                return
+
+            record = self._records.get(thread_id)
+            if record is None:
+                record = ThreadRecord(thread_id, owner, now, now)
+                self._records[thread_id] = record
+            elif owner and record.owner != owner:
+                if record.owner is not None:
+                    self._by_owner[record.owner].pop(thread_id, None)
+                record.owner = owner
+            record.last_activity = now
+            record.message_count = message_count
+            record.interrupted = interrupted
+
+            _move_to_end(self._by_activity, thread_id)
+            if record.owner is not None:
+                _move_to_end(self._by_owner.setdefault(record.owner, OrderedDict()), thread_id)
+            if interrupted:
+                _move_to_end(self._interrupted, thread_id)
+            else:
+                self._interrupted.pop(thread_id, None)
+
+    def get(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self._conn is not None:
+                rows = self._select("WHERE thread_id = ?", (thread_id,))
+                return rows[0] if rows else None
+            record = self._records.get(thread_id)
+            return _to_dict(record) if record else None
+
+    def list(
+        self,
+        owner: Optional[str] = None,
+        interrupted: Optional[bool] = None,
+        active_since: Optional[float] = None,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """
+        List threads, most recently active first.
+
+        Args:
+            owner: Only threads of this owner
+            interrupted: Only threads waiting (True) or not waiting (False) for human input
+            active_since: Only threads active at or after this Unix timestamp
+            limit: Page size
+            offset: Number of matching threads to skip
+
+        Returns:
+            Thread records as dicts
+        """
+        with self._lock:
+            if self._conn is not None:
+                return self._list_sql(owner, interrupted, active_since, limit, offset)
+
+            if owner is not None:
+                index = self._by_owner.get(owner, OrderedDict())
+            elif interrupted:
+                index = self._interrupted
+            else:
+                index = self._by_activity
+            records = self._iter_recent(index, owner, interrupted, active_since)
+            return [_to_dict(record) for record in islice(records, offset, offset + limit)]
+
+    def _iter_recent(self, index, owner, interrupted, active_since) -> Iterable[ThreadRecord]:
+        for thread_id in reversed(index):
+            record = self._records[thread_id]
+            if active_since is not None and record.last_activity < active_since:
+                return  # index is ordered by activity, nothing older can match
+            if owner is not None and record.owner != owner:
+                continue
+            if interrupted is not None and record.interrupted != interrupted:
+                continue
+            yield record
+
+    def _list_sql(self, owner, interrupted, active_since, limit, offset):
+        clauses, params = [], []
+        if owner is not None:
+            clauses.append("owner = ?")
+            params.append(owner)
+        if interrupted is not None:
+            clauses.append("interrupted = ?")
+            params.append(int(interrupted))
+        if active_since is not None:
+            clauses.append("last_activity >= ?")
+            params.append(active_since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._select(f"{where} ORDER BY last_activity DESC LIMIT ? OFFSET ?", (*params, limit, offset))
+
+    def _select(self, suffix: str, params: tuple) -> List[Dict[str, Any]]:
+        rows = self._conn.execute(
+            "SELECT thread_id, owner, created_at, last_activity, message_count, interrupted FROM threads " + suffix,
+            params,
+        ).fetchall()
+        return [_to_dict(ThreadRecord(*row[:5], interrupted=bool(row[5]))) for row in rows]
+
+
+def _move_to_end(index: "OrderedDict[str, None]", key: str):
+    index[key] = None
+    index.move_to_end(key)
+
+
+def _to_dict(record: ThreadRecord) -> Dict[str, Any]:
+    info = asdict(record)
+    info["status"] = "waiting_for_input" if record.interrupted else "ready"
+    return info
+
+
+thread_registry = ThreadRegistry(conn=connect(CHECKPOINT_DB) if CHECKPOINT_DB else None)
+
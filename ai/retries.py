@@ -0,0 +1,79 @@
+import threading
+from typing import Any, Dict
+
+from langgraph.types import RetryPolicy
+
+from breakers import CircuitOpenError
+from config import NODE_RETRY_ATTEMPTS, NODE_RETRY_INITIAL_INTERVAL, NODE_RETRY_MAX_INTERVAL
+
+
+# Exception class names from the model and search clients that are worth another try.
+TRANSIENT_ERRORS = {
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError", "ServiceUnavailableError",
+    "ReadTimeout", "ConnectTimeout", "ConnectError", "RemoteProtocolError",
+}
+
+
+def is_transient(error: Exception) -> bool:
+    """Return True for timeouts, connection errors, 408/429 and 5xx responses; an open breaker fails fast."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in TRANSIENT_ERRORS:
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and (status in (408, 429) or status >= 500)
+
+
+class NodeRetries:
+    """
+    Retry policy for graph nodes, with counters.
+
+    A node that fails on a transient error runs again after `initial_interval`
+    seconds, doubling (with jitter) up to `max_interval`, for `max_attempts`
+    tries in all. Other errors fail the turn at once. The agent gets the
+    policy for its own model and tool steps, so a retry repeats only the step
+    that failed; a turn that still fails keeps its checkpoints and can be
+    resumed from them (see helper.resume_failed_turn).
+    """
+
+    def __init__(self, max_attempts: int = 3, initial_interval: float = 0.5, max_interval: float = 8.0):
+        self.max_attempts = max_attempts
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.enabled = max_attempts > 1
+        self.stats = {"transient_errors": 0, "permanent_errors": 0, "by_error": {},
+                      "turns_resumed": 0, "resumes_failed": 0}
+        self._lock = threading.Lock()
+
+    def policy(self) -> RetryPolicy:
+        """LangGraph retry policy for a node or graph, counting failures through `should_retry`."""
+        return RetryPolicy(
+            initial_interval=self.initial_interval,
+            backoff_factor=2.0,
+            max_interval=self.max_interval,
+            max_attempts=max(1, self.max_attempts),
+            retry_on=self.should_retry,
+        )
+
+    def should_retry(self, error: Exception) -> bool:
+        """Count a node failure and return True if it is worth another attempt."""
+        transient = is_transient(error)
+        with self._lock:
+            self.stats["transient_errors" if transient else "permanent_errors"] += 1
+            name = type(error).__name__
+            self.stats["by_error"][name] = self.stats["by_error"].get(name, 0) + 1
+        return self.enabled and transient
+
+    def record_resume(self, ok: bool):
+        """Count a failed turn resumed from its checkpoint."""
+        with self._lock:
+            self.stats["turns_resumed" if ok else "resumes_failed"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return node failures by kind and error type, and resumed turns."""
+        with self._lock:
+            return {**self.stats, "by_error": dict(self.stats["by_error"]), "enabled": self.enabled,
+                    "max_attempts": self.max_attempts}
+
+
+node_retries = NodeRetries(NODE_RETRY_ATTEMPTS, NODE_RETRY_INITIAL_INTERVAL, NODE_RETRY_MAX_INTERVAL)
@@ -3,73 +3,290 @@ from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Document
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.core.node_parser import SentenceSplitter
 from llama_index.core.ingestion import IngestionPipeline
+from llama_index.core.vector_stores import FilterOperator, MetadataFilter, MetadataFilters
 from llama_index.llms.openai import OpenAI
 import chromadb
+from chromadb.config import Settings
 from llama_index.vector_stores.chroma import ChromaVectorStore
 import json
-import datasets
+import os
+import pyarrow as pa
+import pyarrow.compute as pc
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
 from dotenv import load_dotenv
+from config import (
+    CHROMA_MEMORY_LIMIT_BYTES, DEFAULT_TENANT, NUMPY_MAX_VECTORS, TENANT_VECTOR_DIR, VECTOR_BACKEND, VECTOR_DTYPE,
+    VECTOR_SNAPSHOT_DIR,
+)
+from guest_store import FIELDS, SCHEMA, from_records, get_guest_store, guest_metadata, normalize
+from tenants import current_tenant, tenant_indexes
 
 load_dotenv()
 
 
-def get_documents():
-    """Load and return documents from the guest dataset."""
-    
-    guest_dataset = datasets.load_dataset("agents-course/unit3-invitees", split="train")
+# Bumped whenever the stored documents change, so an older collection is re-ingested.
+COLLECTION_NAME = "invites_v3"
+
+def load_guests():
+    """Guest records of the default tenant as dicts (name, relation, description, email)."""
+    return get_guest_store().records()
+
+
+def build_documents(guests) -> List[Document]:
+    """
+    Build one Document per guest.
 
-    docs = [
+    Args:
+        guests: A guest store table, or records with name, relation, description and email
+
+    Returns:
+        Documents whose text lists the guest's fields, with `guest_metadata` as metadata
+    """
+    if isinstance(guests, pa.Table):
+        # Text and metadata columns come from Arrow; only the Documents themselves are built in Python.
+        table = normalize(guests) if guests.schema != SCHEMA else guests
+        text = pc.binary_join_element_wise(
+            *[pc.binary_join_element_wise(f"{field.capitalize()}: ", table[field], "") for field in FIELDS], "\n"
+        )
+        metadata = table.select(["name", "relation", "relation_category", "email", "email_domain"]).to_pylist()
+        return [Document(text=t, metadata=m) for t, m in zip(text.to_pylist(), metadata)]
+    return [
         Document(
-            page_content="\n".join([
+            text="\n".join([
                 f"Name: {guest['name']}",
-                f"Relation: {guest['relation']}",
-                f"Description: {guest['description']}",
-                f"Email: {guest['email']}"
+                f"Relation: {guest.get('relation') or ''}",
+                f"Description: {guest.get('description') or ''}",
+                f"Email: {guest.get('email') or ''}"
             ]),
-            metadata={"name": guest["name"]}
+            metadata=guest_metadata(guest)
         )
-        for guest in guest_dataset
+        for guest in guests
     ]
 
-    return docs
+
+def get_documents():
+    """Documents for the default tenant's guests."""
+    return build_documents(get_guest_store().table)
+
+
+@lru_cache(maxsize=1)
+def get_embed_model():
+    """The embedding model, shared by every tenant's index."""
+    return HuggingFaceEmbedding(model_name="BAAI/bge-small-en-v1.5")
+
+
+@lru_cache(maxsize=1)
+def get_chroma_client():
+    """
+    One Chroma client for every tenant's collection.
+
+    With CHROMA_MEMORY_LIMIT_BYTES set, Chroma unloads the least recently
+    used collections' segments once loaded ones exceed the limit, so memory
+    stays bounded however many tenants have been queried.
+    """
+    settings = Settings()
+    if CHROMA_MEMORY_LIMIT_BYTES:
+        settings = Settings(chroma_segment_cache_policy="LRU", chroma_memory_limit_bytes=CHROMA_MEMORY_LIMIT_BYTES)
+    return chromadb.PersistentClient(path="./invites_chroma_db", settings=settings)
 
 
-def initialize_retriever():
-    """Initialize and return the retriever for party invites."""
-    docs = get_documents()
+def collection_name(tenant: str) -> str:
+    """Chroma collection holding a tenant's guests (the default tenant keeps the original collection)."""
+    return COLLECTION_NAME if tenant == DEFAULT_TENANT else f"{COLLECTION_NAME}__{tenant}"
 
-    db = chromadb.PersistentClient(path="./invites_chroma_db")
-    chroma_collection = db.get_or_create_collection(name="invites")
 
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-    embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-small-en-v1.5")
+def snapshot_dir(tenant: str) -> str:
+    """NumPy snapshot directory holding a tenant's guests."""
+    return VECTOR_SNAPSHOT_DIR if tenant == DEFAULT_TENANT else os.path.join(TENANT_VECTOR_DIR, tenant)
+
+
+def use_numpy_backend(document_count: int) -> bool:
+    """Pick the memory-mapped NumPy store unless configured otherwise or the collection is too large."""
+    if VECTOR_BACKEND == "auto":
+        return document_count <= NUMPY_MAX_VECTORS
+    return VECTOR_BACKEND == "numpy"
+
+
+def initialize_index():
+    """
+    Initialize and return the vector index over party invites.
+
+    Documents are only built when the store is empty; once it has vectors,
+    startup is mapping the guest table and opening the store.
+    """
+    guests = get_guest_store()
+
+    embed_model = get_embed_model()
     splitter = SentenceSplitter()
 
-    pipeline = IngestionPipeline(
-        transformations=[
-            splitter,
-            embed_model
-        ],
-        vector_store=vector_store,
-    )
+    if use_numpy_backend(guests.count):
+        from vector_store import MemmapVectorStore
+
+        vector_store = MemmapVectorStore(VECTOR_SNAPSHOT_DIR, dtype=VECTOR_DTYPE)
+        pipeline = IngestionPipeline(transformations=[splitter, embed_model], vector_store=vector_store)
+        # One worker builds the snapshot; the others wait and then map the same file.
+        with vector_store.build_lock():
+            if vector_store.count() == 0:
+                nodes = pipeline.run(documents=build_documents(guests.table))
+    else:
+        chroma_collection = get_chroma_client().get_or_create_collection(name=COLLECTION_NAME)
+
+        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
 
-    if chroma_collection.count() == 0:
-        nodes = pipeline.run(documents=docs)
+        pipeline = IngestionPipeline(
+            transformations=[
+                splitter,
+                embed_model
+            ],
+            vector_store=vector_store,
+        )
+
+        if chroma_collection.count() == 0:
+            nodes = pipeline.run(documents=build_documents(guests.table))
 
     index = VectorStoreIndex.from_vector_store(
         vector_store=vector_store, embed_model=embed_model
     )
 
-    retriever = index.as_retriever(similarity_top_k=5)
-    
-    return retriever
+    return index
+
+
+class TenantIndex(NamedTuple):
+    index: VectorStoreIndex
+    retriever: Any
+
+
+def tenant_vector_store(tenant: str, new_documents: int = 0):
+    """
+    Return a tenant's vector store.
+
+    A tenant keeps the backend it was first ingested into: its NumPy
+    snapshot if that has vectors, else its Chroma collection if that has
+    any. A tenant without guests gets the backend `use_numpy_backend`
+    picks for `new_documents`.
+    """
+    from vector_store import MemmapVectorStore
+
+    snapshot = MemmapVectorStore(snapshot_dir(tenant), dtype=VECTOR_DTYPE)
+    if snapshot.count():
+        return snapshot
+    client = get_chroma_client()
+    try:
+        collection = client.get_collection(name=collection_name(tenant))
+    except Exception:
+        # Missing collection; the error type differs across Chroma versions.
+        collection = None
+    if collection is not None and collection.count():
+        return ChromaVectorStore(chroma_collection=collection)
+    if use_numpy_backend(new_documents):
+        return snapshot
+    return ChromaVectorStore(chroma_collection=client.get_or_create_collection(name=collection_name(tenant)))
+
+
+def open_tenant_index(tenant: str) -> TenantIndex:
+    """Open a tenant's index and unfiltered retriever (the default tenant is ingested from the dataset)."""
+    if tenant == DEFAULT_TENANT:
+        index = initialize_index()
+    else:
+        index = VectorStoreIndex.from_vector_store(vector_store=tenant_vector_store(tenant), embed_model=get_embed_model())
+    return TenantIndex(index, index.as_retriever(similarity_top_k=5))
+
+
+def ingest_guests(tenant: str, guests: Iterable[Dict[str, Any]]) -> int:
+    """
+    Add guest records to a tenant's guest store and index.
+
+    The store is the tenant's list of record; only guests it doesn't hold yet
+    (by name and email) are embedded, and they are added to it once they are
+    indexed, so a failed ingest can simply be retried.
+
+    Args:
+        tenant: Tenant id
+        guests: Records with name, relation, description and email
+
+    Returns:
+        Number of new guests ingested
+    """
+    store = get_guest_store(tenant)
+    table = store.missing(normalize(from_records(guests)))
+    if not table.num_rows:
+        return 0
+    docs = build_documents(table)
+    vector_store = tenant_vector_store(tenant, len(docs))
+    pipeline = IngestionPipeline(transformations=[SentenceSplitter(), get_embed_model()], vector_store=vector_store)
+    if hasattr(vector_store, "build_lock"):
+        with vector_store.build_lock():
+            pipeline.run(documents=docs)
+    else:
+        pipeline.run(documents=docs)
+    store.append(table)
+    return len(docs)
+
+
+def get_index(tenant: Optional[str] = None):
+    """Return the tenant's index (default: the current tenant), opening it on first use."""
+    return tenant_indexes.get(tenant or current_tenant.get()).index
+
+
+def get_retriever(tenant: Optional[str] = None):
+    """Return the tenant's unfiltered retriever (default: the current tenant), opening it on first use."""
+    return tenant_indexes.get(tenant or current_tenant.get()).retriever
+
+
+def build_filters(relation: Optional[str] = None, email_domain: Optional[str] = None,
+                  name: Optional[str] = None) -> Optional[MetadataFilters]:
+    """
+    Build metadata filters for guest retrieval.
+
+    Args:
+        relation: Relation category ("family", "friend", "colleague" or "other")
+        email_domain: Email domain, e.g. "gmail.com"
+        name: Exact guest name
+
+    Returns:
+        MetadataFilters (AND of the given fields), or None when no filter is set
+    """
+    filters = []
+    if relation:
+        filters.append(MetadataFilter(key="relation_category", value=relation.lower(), operator=FilterOperator.EQ))
+    if email_domain:
+        domain = email_domain.lower().lstrip("@")
+        filters.append(MetadataFilter(key="email_domain", value=domain, operator=FilterOperator.EQ))
+    if name:
+        filters.append(MetadataFilter(key="name", value=name, operator=FilterOperator.EQ))
+    return MetadataFilters(filters=filters) if filters else None
+
+
+def retrieve(query: str, relation: Optional[str] = None, email_domain: Optional[str] = None,
+             name: Optional[str] = None, top_k: int = 5, tenant: Optional[str] = None):
+    """
+    Retrieve guests, pushing any filters down into Chroma's `where` clause.
+
+    Filtered queries rank only the guests that match the filters, so e.g.
+    family members are found even when other guests are more similar to
+    the query.
+
+    Args:
+        query: Free-text search query
+        relation: Relation category filter
+        email_domain: Email domain filter
+        name: Exact guest name filter
+        top_k: Number of results
+        tenant: Whose guest list to search (default: the current tenant)
 
+    Returns:
+        Retrieved nodes with scores
+    """
+    filters = build_filters(relation, email_domain, name)
+    if filters is None and top_k == 5:
+        return get_retriever(tenant).retrieve(query)
+    return get_index(tenant).as_retriever(similarity_top_k=top_k, filters=filters).retrieve(query)
 
-retriever = initialize_retriever()
 
 if __name__ == "__main__":
 
-    test_nodes = retriever.retrieve("Who can come to the party?")
+    test_nodes = get_retriever().retrieve("Who can come to the party?")
     for node in test_nodes:
         print(f"Score: {node.score}")
         print(f"Content: {node.text}")
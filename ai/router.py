@@ -0,0 +1,320 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+
+# Exception class names that mean "try the secondary endpoint" rather than "fail the turn".
+FAILOVER_ERRORS = {
+    "RateLimitError", "APITimeoutError", "TimeoutError", "ReadTimeout", "ConnectTimeout", "CircuitOpenError",
+}
+
+
+def is_failover_error(error: Exception) -> bool:
+    """Return True for timeouts and 429 responses."""
+    if isinstance(error, TimeoutError):
+        return True
+    if getattr(error, "status_code", None) == 429:
+        return True
+    return type(error).__name__ in FAILOVER_ERRORS
+
+
+@dataclass
+class ModelTier:
+    """
+    A named model tier with an optional secondary endpoint.
+
+    Either pass the models directly or a `loader` returning
+    `(model, fallback)`; loaders run on the tier's first call so the model
+    client libraries aren't imported at startup. Calls to each endpoint go
+    through its circuit breaker when one is set; an open primary breaker
+    sends calls straight to the secondary.
+    """
+    name: str
+    model: Any = None
+    fallback: Optional[Any] = None
+    loader: Optional[Callable[[], tuple]] = None
+    input_cost_per_1k: float = 0.0
+    output_cost_per_1k: float = 0.0
+    cached_input_cost_per_1k: Optional[float] = None
+    breaker: Optional[Any] = None
+    fallback_breaker: Optional[Any] = None
+    latencies: deque = field(default_factory=lambda: deque(maxlen=200))
+    stats: Dict[str, float] = field(default_factory=lambda: {
+        "calls": 0, "errors": 0, "failovers": 0, "hedges": 0, "hedge_wins": 0,
+        "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "cost": 0.0,
+    })
+
+
+class ModelRouter:
+    """
+    Pick a chat model per agent step and fail over between endpoints.
+
+    Steps are classified from the message list: a step that follows a tool
+    result is a "synthesis" step, everything else is a "routing" step.
+    Each step maps to a tier; each tier has a primary model and an optional
+    secondary used on timeout/429 and for hedged requests. When a
+    `cassette` recorder is set, whole tier calls are recorded or replayed
+    through it.
+    """
+
+    def __init__(
+        self,
+        tiers: Dict[str, ModelTier],
+        routes: Dict[str, str],
+        hedge_percentile: float = 0.95,
+        hedge_min_samples: int = 20,
+        max_workers: int = 8,
+    ):
+        self.tiers = tiers
+        self.routes = routes
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self._tools = None
+        self.cassette = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-router")
+
+    def bind_tools(self, tools: List[Any]) -> "ModelRouter":
+        """Bind the same tool definitions to every model in every tier (lazy tiers bind on load)."""
+        self._tools = tools
+        for tier in self.tiers.values():
+            if tier.model is not None:
+                self._bind_tier(tier)
+        return self
+
+    def _bind_tier(self, tier: ModelTier):
+        if self._tools is None:
+            return
+        tier.model = _bind(tier.model, self._tools)
+        if tier.fallback is not None:
+            tier.fallback = _bind(tier.fallback, self._tools)
+
+    def _ensure_loaded(self, tier: ModelTier):
+        if tier.model is not None:
+            return
+        with self._lock:
+            if tier.model is None:
+                model, tier.fallback = tier.loader()
+                tier.model = model
+                self._bind_tier(tier)
+
+    def classify_step(self, messages: List[Any]) -> str:
+        """Classify the current agent step from the message list."""
+        if messages and isinstance(messages[-1], ToolMessage):
+            return "synthesis"
+        return "routing"
+
+    def tier_for(self, messages: List[Any]) -> ModelTier:
+        step = self.classify_step(messages)
+        return self.tiers[self.routes.get(step, next(iter(self.tiers)))]
+
+    def select_model(self, state: Dict[str, Any], runtime: Any = None):
+        """Dynamic model callable for `create_react_agent(model=...)`."""
+        tier = self.tier_for(state["messages"])
+        return RunnableLambda(
+            lambda messages, config=None: self.invoke_tier(tier, messages, config),
+            name=f"router_{tier.name}",
+        )
+
+    def invoke_tier(self, tier: ModelTier, messages: Any, config: Optional[dict] = None):
+        """Invoke a tier with hedging and failover, recording latency and cost."""
+        if self.cassette is not None and self.cassette.enabled:
+            key = self.cassette.key(tier.name, messages)
+            return self.cassette.call("model", key, self._invoke_tier, tier, messages, config)
+        return self._invoke_tier(tier, messages, config)
+
+    def _invoke_tier(self, tier: ModelTier, messages: Any, config: Optional[dict] = None):
+        self._ensure_loaded(tier)
+        start = time.perf_counter()
+        try:
+            response = self._hedged_invoke(tier, messages, config)
+        except Exception as e:
+            if tier.fallback is None or not is_failover_error(e):
+                self._record(tier, time.perf_counter() - start, None, error=True)
+                raise
+            with self._lock:
+                tier.stats["failovers"] += 1
+            response = _call(tier.fallback_breaker, tier.fallback, messages, config)
+        self._record(tier, time.perf_counter() - start, response)
+        return response
+
+    def _hedged_invoke(self, tier: ModelTier, messages: Any, config: Optional[dict]):
+        hedge_after = self._hedge_threshold(tier)
+        primary = self._submit(tier.breaker, tier.model, messages, config)
+        if hedge_after is None:
+            return primary.result()
+
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        # Primary is slower than the tier's p95: race a second request.
+        with self._lock:
+            tier.stats["hedges"] += 1
+        if tier.fallback is not None:
+            hedge = self._submit(tier.fallback_breaker, tier.fallback, messages, config)
+        else:
+            hedge = self._submit(tier.breaker, tier.model, messages, config)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            tier.stats["hedge_wins"] += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _submit(self, breaker: Optional[Any], model: Any, messages: Any, config: Optional[dict]):
+        ctx = contextvars.copy_context()
+        return self._executor.submit(ctx.run, _call, breaker, model, messages, config)
+
+    def _hedge_threshold(self, tier: ModelTier) -> Optional[float]:
+        with self._lock:
+            if len(tier.latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(tier.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile))]
+
+    def _record(self, tier: ModelTier, latency: float, response: Any, error: bool = False):
+        usage = getattr(response, "usage_metadata", None) or {}
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        with self._lock:
+            tier.stats["calls"] += 1
+            if error:
+                tier.stats["errors"] += 1
+                return
+            tier.latencies.append(latency)
+            tier.stats["input_tokens"] += input_tokens
+            tier.stats["cached_tokens"] += cached_tokens
+            tier.stats["output_tokens"] += output_tokens
+            cached_price = tier.input_cost_per_1k if tier.cached_input_cost_per_1k is None else tier.cached_input_cost_per_1k
+            tier.stats["cost"] += (
+                (input_tokens - cached_tokens) / 1000 * tier.input_cost_per_1k
+                + cached_tokens / 1000 * cached_price
+                + output_tokens / 1000 * tier.output_cost_per_1k
+            )
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return latency and cost counters per tier."""
+        report = {}
+        with self._lock:
+            for name, tier in self.tiers.items():
+                ordered = sorted(tier.latencies)
+                report[name] = {
+                    **tier.stats,
+                    "cost": round(tier.stats["cost"], 6),
+                    "cached_ratio": _ratio(tier.stats["cached_tokens"], tier.stats["input_tokens"]),
+                    "p50_latency": _percentile(ordered, 0.50),
+                    "p95_latency": _percentile(ordered, 0.95),
+                }
+        return report
+
+
+def _call(breaker: Optional[Any], model: Any, messages: Any, config: Optional[dict]):
+    if breaker is None:
+        return model.invoke(messages, config)
+    return breaker.call(model.invoke, messages, config)
+
+
+def _bind(model: Any, tools: List[Any]) -> Any:
+    try:
+        return model.bind_tools(tools)
+    except NotImplementedError:
+        # Local fake chat models don't implement tool binding.
+        return model
+
+
+def _ratio(part: float, total: float) -> float:
+    return round(part / total, 4) if total else 0.0
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 4)
+
+
+def build_router(tier_config: Dict[str, Dict[str, Any]], routes: Dict[str, str],
+                 model_factory: Callable[..., Any], breaker_for: Optional[Callable[[str], Any]] = None,
+                 **kwargs) -> ModelRouter:
+    """
+    Build a router from the `MODEL_TIERS` config.
+
+    Args:
+        tier_config: Tier name -> model settings (see config.MODEL_TIERS)
+        routes: Step name -> tier name
+        model_factory: Callable creating a chat model from (model_name, base_url, timeout),
+            called on each tier's first use
+        breaker_for: Optional callable returning the circuit breaker for a
+            tier's `breaker` / `fallback_breaker` name
+
+    Returns:
+        A ModelRouter with primary and secondary models per tier
+    """
+    def loader(spec):
+        def load():
+            fallback = None
+            if spec.get("fallback_model"):
+                fallback = model_factory(spec["fallback_model"], spec.get("fallback_base_url"), spec.get("timeout"))
+            return model_factory(spec["model"], spec.get("base_url"), spec.get("timeout")), fallback
+        return load
+
+    tiers = {}
+    for name, spec in tier_config.items():
+        tiers[name] = ModelTier(
+            name=name,
+            loader=loader(spec),
+            input_cost_per_1k=spec.get("input_cost_per_1k", 0.0),
+            output_cost_per_1k=spec.get("output_cost_per_1k", 0.0),
+            cached_input_cost_per_1k=spec.get("cached_input_cost_per_1k"),
+            breaker=breaker_for(spec["breaker"]) if breaker_for and spec.get("breaker") else None,
+            fallback_breaker=(
+                breaker_for(spec["fallback_breaker"]) if breaker_for and spec.get("fallback_breaker") else None
+            ),
+        )
+    return ModelRouter(tiers, routes, **kwargs)
+
+
+if __name__ == "__main__":
+    # Example usage with local fake chat models
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langchain_core.messages import HumanMessage
+
+    class SlowFake(FakeListChatModel):
+        delay: float = 0.0
+
+        def _call(self, *args, **kwargs):
+            time.sleep(self.delay)
+            return super()._call(*args, **kwargs)
+
+    router = ModelRouter(
+        tiers={
+            "fast": ModelTier("fast", SlowFake(responses=["routing"]), SlowFake(responses=["routing (secondary)"])),
+            "strong": ModelTier("strong", SlowFake(responses=["answer"], delay=0.01), SlowFake(responses=["answer (secondary)"])),
+        },
+        routes={"routing": "fast", "synthesis": "strong"},
+        hedge_min_samples=5,
+    )
+    routing_state = {"messages": [HumanMessage(content="Who can come?")]}
+    synthesis_state = {"messages": [ToolMessage(content="Name: Ada", tool_call_id="1")]}
+    for _ in range(10):
+        router.select_model(routing_state).invoke([])
+        router.select_model(synthesis_state).invoke([])
+
+    # Slow primary: the secondary is hedged in after the tier's p95 and wins.
+    router.tiers["strong"].model.delay = 0.5
+    print(router.select_model(synthesis_state).invoke([]).content)
+    print(router.get_stats())
@@ -0,0 +1,109 @@
+import json
+from typing import Any, Set
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # stdlib json fallback keeps the API usable without the extra
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # without brotli, clients asking for br get gzip
+    brotli = None
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to compact JSON bytes with orjson (stdlib json without it); Pydantic models are dumped."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson.
+
+    Return it directly from endpoints that build plain dicts: FastAPI then
+    skips `jsonable_encoder`, which walks the payload in Python. Endpoints
+    with a `response_model` already serialize through Pydantic's Rust core
+    and don't need it; Pydantic models passed here are dumped the same way.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if hasattr(content, "model_dump_json"):
+            return content.__pydantic_serializer__.to_json(content)
+        return dumps(content)
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 4):
+        super().__init__(app, minimum_size)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        data = self._compressor.process(body)
+        # Flush each chunk of a streaming response so JSON lines still arrive as they are produced.
+        return data + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+class CompressionMiddleware:
+    """
+    Compress responses of at least `minimum_size` bytes with br or gzip.
+
+    The encoding follows the request's Accept-Encoding: br when the client
+    accepts it and `brotli` is installed, else gzip, else none. Streaming
+    responses are compressed chunk by chunk; server-sent events are left
+    alone.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = accepted_encodings(Headers(scope=scope).get("Accept-Encoding", ""))
+        if brotli is not None and "br" in accepted:
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif "gzip" in accepted:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
+
+
+def accepted_encodings(header: str) -> Set[str]:
+    """Content codings from an Accept-Encoding header, without those refused with q=0."""
+    accepted = set()
+    for part in header.lower().split(","):
+        coding, _, params = part.partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding.strip():
+            accepted.add(coding.strip())
+    return accepted
@@ -0,0 +1,200 @@
+import contextvars
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from config import SPECULATION_MIN_OVERLAP, SPECULATION_WORKERS, SPECULATIVE_RETRIEVAL
+from tenants import current_tenant
+
+
+# Words that carry no meaning for matching a tool query against the user's message.
+STOPWORDS = frozenset("""
+a about all an and any anyone are as at be can could do does for from get give have help i if in is it know
+list me my of on or our please should show some tell that the their them there these they this to us was we
+what which who whom whose will with would you your
+""".split())
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def terms(text: str) -> set:
+    """Content words of a query, lowercased, with a plural "s" stripped."""
+    words = set()
+    for word in WORD.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        words.add(word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word)
+    return words
+
+
+def overlap(speculated: str, query: str) -> float:
+    """Share of the tool query's content words that also appear in the speculated query."""
+    wanted = terms(query)
+    if not wanted:
+        return 0.0
+    return len(wanted & terms(speculated)) / len(wanted)
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 4)
+
+
+@dataclass
+class Speculation:
+    query: str
+    future: Future
+    started: float
+    calls: int = 0
+    hit: bool = False
+    saved: float = 0.0
+
+
+class SpeculativeRetriever:
+    """
+    Start guest retrieval for a turn before the model asks for it.
+
+    Most guest-related turns begin with a model call that decides to call
+    `retrieval`, so the embedding and vector search only start after a full
+    LLM round-trip. `start` runs the retrieval on the raw user message in
+    the background while that first call is in flight; when the model's
+    `retrieval` call comes in without filters and its query shares at least
+    `min_overlap` of its content words with the user's message, `take`
+    returns the speculated result instead of searching again.
+
+    Each turn ends as a "hit" (a retrieval call used the speculation), a
+    "miss" (retrieval was called but didn't match) or "unused" (no
+    retrieval call). Saved latency is the part of the retrieval that ran
+    during the model call.
+    """
+
+    def __init__(self, retrieve: Callable[[str], Any], enabled: bool = False, min_overlap: float = 0.5,
+                 max_workers: int = 4, window: int = 500):
+        self.retrieve = retrieve
+        self.enabled = enabled
+        self.min_overlap = min_overlap
+        self.max_workers = max_workers
+        self.saved = deque(maxlen=window)
+        self.stats = {"speculations": 0, "skipped": 0, "resumed": 0, "hits": 0, "misses": 0, "unused": 0,
+                      "saved_seconds": 0.0, "wasted_seconds": 0.0}
+        self._pending: Dict[str, Speculation] = {}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative-retrieval")
+
+    def start(self, thread_id: str, message: str, resuming: bool = False):
+        """
+        Start retrieving for a turn's user message (no-op when disabled or all workers are busy).
+
+        A resumed turn (after an interrupt or a failure) already made its first
+        model call for this message, so it isn't speculated again.
+        """
+        if not self.enabled or not terms(message):
+            return
+        with self._lock:
+            if resuming:
+                self.stats["resumed"] += 1
+                return
+            if self._in_flight >= self.max_workers:
+                # Speculation only helps when it runs right away; don't queue behind other turns.
+                self.stats["skipped"] += 1
+                return
+            self._in_flight += 1
+            self.stats["speculations"] += 1
+            future = self._executor.submit(contextvars.copy_context().run, self._run, message)
+            self._pending[thread_id] = Speculation(message, future, time.perf_counter())
+
+    def _run(self, message: str):
+        start = time.perf_counter()
+        try:
+            return self.retrieve(message), time.perf_counter() - start
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def take(self, thread_id: str, query: str, relation: Optional[str] = None,
+             email_domain: Optional[str] = None) -> Optional[Any]:
+        """
+        Return the speculated result for a `retrieval` call, if it matches.
+
+        Args:
+            thread_id: Thread of the current turn
+            query: The model's retrieval query
+            relation: The call's relation filter (filtered calls never match)
+            email_domain: The call's email domain filter
+
+        Returns:
+            The speculated nodes, or None when the call must search itself
+        """
+        with self._lock:
+            speculation = self._pending.get(thread_id)
+            if speculation is None:
+                return None
+            speculation.calls += 1
+            if speculation.hit or relation or email_domain or overlap(speculation.query, query) < self.min_overlap:
+                return None
+            speculation.hit = True
+        requested = time.perf_counter()
+        try:
+            nodes, duration = speculation.future.result()
+        except Exception:
+            speculation.hit = False
+            return None
+        # Already finished: the whole retrieval was saved; still running: the part that overlapped.
+        speculation.saved = duration if speculation.started + duration <= requested else requested - speculation.started
+        return nodes
+
+    def finish(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """
+        End a turn's speculation and record its outcome.
+
+        Returns:
+            {"outcome": "hit" | "miss" | "unused", "saved_ms": ...}, or None without a speculation
+        """
+        with self._lock:
+            speculation = self._pending.pop(thread_id, None)
+        if speculation is None:
+            return None
+        outcome = "hit" if speculation.hit else "miss" if speculation.calls else "unused"
+        if outcome != "hit":
+            speculation.future.add_done_callback(self._record_waste)
+        with self._lock:
+            self.stats[{"hit": "hits", "miss": "misses", "unused": "unused"}[outcome]] += 1
+            if outcome == "hit":
+                self.stats["saved_seconds"] += speculation.saved
+                self.saved.append(speculation.saved)
+        return {"outcome": outcome, "saved_ms": round(speculation.saved * 1000, 1)}
+
+    def _record_waste(self, future: Future):
+        if future.exception() is None:
+            with self._lock:
+                self.stats["wasted_seconds"] += future.result()[1]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit rate (of turns that called retrieval) and latency saved per hit."""
+        with self._lock:
+            report = {**self.stats, "enabled": self.enabled}
+            retrieved = self.stats["hits"] + self.stats["misses"]
+            report["hit_rate"] = round(self.stats["hits"] / retrieved, 4) if retrieved else 0.0
+            report["saved_seconds"] = round(self.stats["saved_seconds"], 4)
+            report["wasted_seconds"] = round(self.stats["wasted_seconds"], 4)
+            ordered = sorted(self.saved)
+        report["saved_p50"] = _percentile(ordered, 0.50)
+        report["saved_p95"] = _percentile(ordered, 0.95)
+        return report
+
+
+def _retrieve(query: str):
+    from retriver import retrieve
+
+    # Runs in a copy of the turn's context, so this is the turn's tenant.
+    return retrieve(query, tenant=current_tenant.get())
+
+
+speculative_retrieval = SpeculativeRetriever(
+    _retrieve, enabled=SPECULATIVE_RETRIEVAL, min_overlap=SPECULATION_MIN_OVERLAP, max_workers=SPECULATION_WORKERS,
+)
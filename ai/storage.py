@@ -0,0 +1,21 @@
+import sqlite3
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """
+    Open a SQLite connection that can be shared by several API workers.
+
+    WAL mode lets readers in one process run while another process writes,
+    and the busy timeout makes concurrent writers wait instead of failing.
+
+    Args:
+        db_path: Path to the shared SQLite file (CHECKPOINT_DB)
+
+    Returns:
+        A connection usable from any thread in this process
+    """
+    conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
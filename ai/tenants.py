@@ -0,0 +1,166 @@
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from config import DEFAULT_TENANT, TENANT_INGEST_WORKERS, TENANT_POOL_SIZE
+
+
+# Tenant ids name Chroma collections (which must start and end with a letter
+# or digit) and snapshot directories.
+TENANT_PATTERN = r"^[A-Za-z0-9](?:[A-Za-z0-9_-]{0,61}[A-Za-z0-9])?$"
+
+# Tenant of the graph run in progress; tools read it to pick the guest list.
+current_tenant: contextvars.ContextVar[str] = contextvars.ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+
+@contextmanager
+def use_tenant(tenant: Optional[str]) -> Iterator[str]:
+    """Run the enclosed graph code (and the threads it starts) against `tenant`'s guest list."""
+    token = current_tenant.set(tenant or DEFAULT_TENANT)
+    try:
+        yield current_tenant.get()
+    finally:
+        current_tenant.reset(token)
+
+
+class TenantIndexPool:
+    """
+    LRU of open per-tenant guest indexes, plus per-tenant ingestion.
+
+    `get` returns a tenant's handle, opening it on first use; at most
+    `capacity` handles stay open and the least recently used one is dropped
+    when another is opened (tenants in `pinned` are never dropped). A
+    dropped tenant is reopened on its next query. Opening holds only one of
+    `open_stripes` locks, picked by the tenant's hash, so a slow open doesn't
+    stall queries for tenants that are already open and the locks don't grow
+    with the number of tenants seen.
+
+    Ingestion runs on its own worker pool, one job at a time per tenant.
+    Queries keep using the tenant's open handle until the job finishes,
+    then the handle is dropped so the next query sees the new guests.
+    """
+
+    def __init__(self, opener: Callable[[str], Any], ingester: Callable[[str, Any], int], capacity: int = 32,
+                 pinned: Iterable[str] = (), ingest_workers: int = 2, open_stripes: int = 64):
+        self.opener = opener
+        self.ingester = ingester
+        self.capacity = capacity
+        self.pinned = set(pinned)
+        self.stats = {"hits": 0, "opens": 0, "evictions": 0, "open_seconds": 0.0}
+        self._open: "OrderedDict[str, Any]" = OrderedDict()
+        self._open_locks = [threading.Lock() for _ in range(open_stripes)]
+        self._ingest_locks: Dict[str, threading.Lock] = {}
+        self._ingestions: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=ingest_workers, thread_name_prefix="tenant-ingest")
+
+    def get(self, tenant: str) -> Any:
+        """Return the tenant's open handle, opening it (and evicting the LRU tenant) if needed."""
+        with self._lock:
+            if tenant in self._open:
+                self._open.move_to_end(tenant)
+                self.stats["hits"] += 1
+                return self._open[tenant]
+            tenant_lock = self._open_locks[hash(tenant) % len(self._open_locks)]
+
+        with tenant_lock:
+            with self._lock:
+                if tenant in self._open:
+                    # Opened by another request while this one waited.
+                    self._open.move_to_end(tenant)
+                    self.stats["hits"] += 1
+                    return self._open[tenant]
+            start = time.perf_counter()
+            handle = self.opener(tenant)
+            with self._lock:
+                self._open[tenant] = handle
+                self.stats["opens"] += 1
+                self.stats["open_seconds"] += time.perf_counter() - start
+                self._evict_locked()
+        return handle
+
+    def _evict_locked(self):
+        candidates = [tenant for tenant in self._open if tenant not in self.pinned]
+        while len(self._open) > self.capacity and candidates:
+            del self._open[candidates.pop(0)]
+            self.stats["evictions"] += 1
+
+    def invalidate(self, tenant: str):
+        """Drop the tenant's handle so its next query reopens it."""
+        with self._lock:
+            self._open.pop(tenant, None)
+
+    def is_open(self, tenant: str) -> bool:
+        with self._lock:
+            return tenant in self._open
+
+    def submit_ingest(self, tenant: str, guests: Any) -> Dict[str, Any]:
+        """
+        Queue adding guests to a tenant's index.
+
+        Args:
+            tenant: Tenant id
+            guests: Guest records (name, relation, description, email)
+
+        Returns:
+            The tenant's ingestion status
+        """
+        with self._lock:
+            status = {"state": "queued", "guests": len(guests), "ingested": None, "error": None,
+                      "updated_at": time.time()}
+            self._ingestions[tenant] = status
+            self._ingest_locks.setdefault(tenant, threading.Lock())
+        self._executor.submit(self._ingest, tenant, guests, status)
+        return dict(status)
+
+    def _ingest(self, tenant: str, guests: Any, status: Dict[str, Any]):
+        with self._ingest_locks[tenant]:
+            status.update(state="running", updated_at=time.time())
+            try:
+                status["ingested"] = self.ingester(tenant, guests)
+                status["state"] = "completed"
+            except Exception as e:
+                status.update(state="failed", error=str(e))
+            finally:
+                status["updated_at"] = time.time()
+                self.invalidate(tenant)
+
+    def ingestion(self, tenant: str) -> Optional[Dict[str, Any]]:
+        """Status of the tenant's latest ingestion, or None."""
+        with self._lock:
+            status = self._ingestions.get(tenant)
+            return dict(status) if status else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return open handle count, LRU hit rate, opens and evictions."""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["opens"]
+            return {
+                **self.stats,
+                "open": len(self._open),
+                "capacity": self.capacity,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                "open_seconds": round(self.stats["open_seconds"], 4),
+                "ingesting": sum(1 for s in self._ingestions.values() if s["state"] in ("queued", "running")),
+            }
+
+
+def _open(tenant: str):
+    from retriver import open_tenant_index
+
+    return open_tenant_index(tenant)
+
+
+def _ingest(tenant: str, guests: Any) -> int:
+    from retriver import ingest_guests
+
+    return ingest_guests(tenant, guests)
+
+
+tenant_indexes = TenantIndexPool(
+    _open, _ingest, capacity=TENANT_POOL_SIZE, pinned=[DEFAULT_TENANT], ingest_workers=TENANT_INGEST_WORKERS,
+)
@@ -1,28 +1,72 @@
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from langchain_tavily import TavilySearch
-from retriver import retriever
-from langchain.tools import tool
+from functools import lru_cache
+from typing import Optional
+from langchain_core.tools import ToolException, tool
+from langgraph.config import get_config
 from langgraph.types import interrupt
 from dotenv import load_dotenv
-from config import MCP_CONFIG
+from config import MCP_CONFIG, TAVILY_API_BASE_URL
+from breakers import CircuitOpenError, circuit_breakers, mark_stale
+from cassettes import cassettes
+from speculation import speculative_retrieval
+from tenants import current_tenant
 import asyncio
 load_dotenv()
 
+# Relation categories stored as guest metadata (see guest_store.relation_category).
+RELATION_FILTERS = ("family", "friend", "colleague", "other")
+
 
 def get_mcp_tools(query: str) -> str:
     """
     Get MCP (Model Context Protocol) tools from GitHub server.
     
     Args:
-        config: Configuration object containing user authentication details
-        
+        query: Description of the MCP tools being looked for
+
     Returns:
         List of available MCP tools from the GitHub server
     """
-    client = MultiServerMCPClient(MCP_CONFIG)
-    mcp_tools = asyncio.run(client.get_tools())
+    from langchain_mcp_adapters.client import MultiServerMCPClient
+
+    def list_tools():
+        client = MultiServerMCPClient(MCP_CONFIG)
+        mcp_tools = asyncio.run(client.get_tools())
+        return "\n".join(f"{t.name}: {t.description}" for t in mcp_tools)
+
+    try:
+        result, stale_age = circuit_breakers.call_with_stale("mcp", "tools", cassettes.wrap("mcp", "tools", list_tools))
+    except CircuitOpenError as e:
+        return f"GitHub MCP tools are temporarily unavailable: {e}"
+    return mark_stale(result, stale_age, "GitHub MCP") if stale_age is not None else result
+
+
+@lru_cache(maxsize=1)
+def get_search_tool():
+    """Create the Tavily search client on first use."""
+    from langchain_tavily import TavilySearch
 
-    return "".join(mcp_tools)
+    return TavilySearch(max_results=3, api_base_url=TAVILY_API_BASE_URL)
+
+
+def search_web(query: str):
+    """Call Tavily, raising on service errors (TavilySearch returns them as {"error": ...})."""
+    try:
+        result = get_search_tool().invoke(query)
+    except ToolException as e:
+        # No results: Tavily answered, so this is a normal result, not an outage.
+        return str(e)
+    if isinstance(result, dict) and "error" in result:
+        error = result["error"]
+        raise error if isinstance(error, Exception) else RuntimeError(str(error))
+    return result
+
+
+def current_thread_id() -> Optional[str]:
+    """Thread of the graph run calling a tool (None outside a run)."""
+    try:
+        return get_config()["configurable"].get("thread_id")
+    except RuntimeError:
+        return None
 
 
 @tool
@@ -36,24 +80,41 @@ def web_search(query: str) -> str:
     Returns:
         Web search results with relevant information
     """
-    search_tool = TavilySearch(max_results=3)
-    return search_tool.invoke(query)
+    try:
+        result, stale_age = circuit_breakers.call_with_stale(
+            "tavily", query, cassettes.wrap("tavily", query, search_web), query,
+        )
+    except CircuitOpenError as e:
+        return f"Web search is temporarily unavailable: {e}. Answer from what you already know."
+    return mark_stale(result, stale_age, "Web search") if stale_age is not None else result
 
 
 @tool
-def retrieval(query: str) -> str:
+def retrieval(query: str, relation: Optional[str] = None, email_domain: Optional[str] = None) -> str:
     """
     Search for information about party invites and people who might attend.
     Returns relevant information about people, their relationships, and contact details.
     
     Args:
         query: The search query about people, relationships, or party attendees
+        relation: Only return guests in this relation category: "family", "friend", "colleague" or "other"
+        email_domain: Only return guests whose email address is at this domain, e.g. "gmail.com"
         
     Returns:
         Information about relevant people and their details
     """
+    if relation and relation.lower() not in RELATION_FILTERS:
+        return f"Unknown relation filter '{relation}'. Use one of: {', '.join(RELATION_FILTERS)}."
     try:
-        nodes = retriever.retrieve(query)
+        from retriver import retrieve
+
+        tenant = current_tenant.get()
+        nodes, stale_age = speculative_retrieval.take(current_thread_id(), query, relation, email_domain), None
+        if nodes is None:
+            nodes, stale_age = circuit_breakers.call_with_stale(
+                "retrieval", (tenant, query, relation, email_domain),
+                retrieve, query, relation=relation, email_domain=email_domain, tenant=tenant,
+            )
         
         if not nodes:
             return "No relevant information found in the party invites database."
@@ -67,6 +128,8 @@ def retrieval(query: str) -> str:
                 results.append(f"Metadata: {node.metadata}")
             results.append("---")
         
+        if stale_age is not None:
+            return mark_stale("\n".join(results), stale_age, "The guest index")
         return "\n".join(results)
     except Exception as e:
         return f"Error searching party invites: {str(e)}"
@@ -77,6 +140,7 @@ def human_assistance(query: str) -> str:
     print(f"\n🤝 Human assistance requested:")
     print(f"Query: {query}")
     human_response = interrupt({"query": query})
+    cassettes.record_turn("resume", human_response["data"])
     return human_response["data"]
 
 tools = [web_search, retrieval, human_assistance, get_mcp_tools] 
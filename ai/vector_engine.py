@@ -0,0 +1,347 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# Rows converted per matrix product for float16 snapshots; bounds the float32 copy.
+CHUNK_ROWS = 65_536
+
+# Metadata keys with few distinct values, stored as dictionary-coded columns with their
+# values in the manifest. Other keys (names, emails) get a column of 64-bit value hashes.
+DICTIONARY_KEYS = ("relation_category", "email_domain")
+
+
+class MemmapVectorIndex:
+    """
+    Brute-force vector index over a memory-mapped snapshot.
+
+    A snapshot is a directory holding L2-normalised embeddings as one
+    contiguous float16/float32 `.npy` array, records (id, text, metadata) as
+    JSON lines with an offsets array, and each metadata field as an int32
+    dictionary-code column (DICTIONARY_KEYS) or an int64 hash column for
+    filtering. Everything is opened with `mmap`, so API workers share the
+    same page-cache pages instead of each loading a copy. Queries are a
+    matrix-vector product and `argpartition` top-k; filters use Chroma's
+    `where` syntax and are applied as a mask before ranking.
+
+    Snapshots are written to a fresh directory and published by atomically
+    replacing the `CURRENT` pointer, so readers never see a partial write.
+    Every query checks `CURRENT` first, so a snapshot written by another
+    worker is served from its next query, and reads a single snapshot
+    throughout, so rows, scores and records always belong together.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+        self.reload()
+
+    @property
+    def count(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.count if snapshot else 0
+
+    def reload(self) -> bool:
+        """Open the current snapshot if it changed. Returns True when a snapshot is open."""
+        while True:
+            version = _read_current(self.root)
+            with self._lock:
+                if version is None or (self._snapshot and version == self._snapshot.version):
+                    return self._snapshot is not None
+                try:
+                    self._snapshot = _Snapshot(os.path.join(self.root, version), version)
+                    return True
+                except FileNotFoundError:
+                    # A newer snapshot replaced this one (and removed it) while we opened it.
+                    if _read_current(self.root) == version:
+                        raise
+
+    def snapshot(self) -> Optional["_Snapshot"]:
+        """The current snapshot, reopened first if another process published a new one."""
+        self.reload()
+        with self._lock:
+            return self._snapshot
+
+    def query(self, embedding: Sequence[float], k: int = 5,
+              where: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the k most similar rows.
+
+        Args:
+            embedding: Query embedding
+            k: Number of results
+            where: Optional Chroma-style metadata filter
+
+        Returns:
+            (row indices, cosine similarities), best first
+        """
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return snapshot.query(embedding, k, where)
+
+    def query_records(self, embedding: Sequence[float], k: int = 5,
+                      where: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """Like `query`, but return the rows' records, read from the snapshot that ranked them."""
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return [], np.zeros(0, dtype=np.float32)
+        rows, scores = snapshot.query(embedding, k, where)
+        return [snapshot.record(int(row)) for row in rows], scores
+
+
+class _Snapshot:
+    """The memory-mapped arrays of one snapshot version."""
+
+    def __init__(self, path: str, version: str):
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.version = version
+        self.count = manifest["count"]
+        # Plain ndarray views over the mappings skip np.memmap's per-index overhead.
+        self.vectors = np.asarray(np.load(os.path.join(path, "vectors.npy"), mmap_mode="r"))
+        self.offsets = np.asarray(np.load(os.path.join(path, "offsets.npy"), mmap_mode="r"))
+        self._records = np.asarray(np.memmap(os.path.join(path, "records.jsonl"), dtype=np.uint8, mode="r")) \
+            if self.count else np.zeros(0, dtype=np.uint8)
+        self.columns = {
+            key: (np.asarray(np.load(os.path.join(path, "columns", f"{i}.npy"), mmap_mode="r")),
+                  {value: code for code, value in enumerate(vocab)})
+            for i, (key, vocab) in enumerate(manifest["columns"].items())
+        }
+        self.hashed = {
+            key: np.asarray(np.load(os.path.join(path, "hashes", f"{i}.npy"), mmap_mode="r"))
+            for i, key in enumerate(manifest.get("hashed", []))
+        }
+        # Hashes that more than one value (or a value and "missing") map to, per hashed key;
+        # None for snapshots written before this was tracked, where any hash may be shared.
+        self.shared = {key: set(hashes) for key, hashes in manifest["shared"].items()} \
+            if "shared" in manifest else None
+
+    def query(self, embedding: Sequence[float], k: int,
+              where: Optional[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        if self.count == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        rows = None
+        if where:
+            rows = np.flatnonzero(self._mask(where))
+            if rows.size == 0:
+                return rows, np.zeros(0, dtype=np.float32)
+            scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+        else:
+            scores = self._scores(query)
+
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k] if k < scores.size else np.arange(scores.size)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return (rows[top] if rows is not None else top), scores[top]
+
+    def record(self, row: int) -> Dict[str, Any]:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self._records[start:end].tobytes())
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for row in range(self.count):
+            yield self.record(row)
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        if self.vectors.dtype == np.float32:
+            return self.vectors @ query
+        scores = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, CHUNK_ROWS):
+            end = min(start + CHUNK_ROWS, self.count)
+            scores[start:end] = self.vectors[start:end].astype(np.float32) @ query
+        return scores
+
+    def _mask(self, where: Dict[str, Any]) -> np.ndarray:
+        if "$and" in where:
+            return np.logical_and.reduce([self._mask(clause) for clause in where["$and"]])
+        if "$or" in where:
+            return np.logical_or.reduce([self._mask(clause) for clause in where["$or"]])
+        masks = []
+        for key, condition in where.items():
+            op, value = next(iter(condition.items())) if isinstance(condition, dict) else ("$eq", condition)
+            values = value if op in ("$in", "$nin") else [value]
+            if key in self.columns:
+                codes, lookup = self.columns[key]
+                mask = np.isin(codes, [lookup[v] for v in values if v in lookup])
+            elif key in self.hashed:
+                hashes = [_value_hash(v) for v in values]
+                mask = np.isin(self.hashed[key], hashes)
+                shared = hashes if self.shared is None else [h for h in hashes if h in self.shared.get(key, ())]
+                if shared:
+                    # Only rows whose hash another value shares need their record checked.
+                    for row in np.flatnonzero(np.isin(self.hashed[key], shared)):
+                        mask[row] = self.record(int(row))["metadata"].get(key) in values
+            else:
+                mask = np.zeros(self.count, dtype=bool)
+            masks.append(~mask if op in ("$ne", "$nin") else mask)
+        return np.logical_and.reduce(masks) if len(masks) > 1 else masks[0]
+
+
+def write_snapshot(root: str, ids: Sequence[str], embeddings, texts: Sequence[str],
+                   metadatas: Sequence[Dict[str, Any]], dtype: str = "float32",
+                   extra: Optional[Sequence[Dict[str, Any]]] = None, base: Optional[_Snapshot] = None) -> str:
+    """
+    Write a new snapshot and make it current.
+
+    With `base`, the new rows are appended to that snapshot's: its vectors
+    and columns are concatenated and its record bytes copied as they are,
+    without decoding them.
+
+    Args:
+        root: Snapshot directory
+        ids: Row ids
+        embeddings: (n, dim) array-like
+        texts: Row texts
+        metadatas: Row metadata dicts (str/int/float/bool values)
+        dtype: "float32", or "float16" for half the size at a per-query conversion cost
+        extra: Optional extra fields stored with each record
+        base: Snapshot whose rows come first
+
+    Returns:
+        The new snapshot version
+    """
+    os.makedirs(root, exist_ok=True)
+    version = f"snap-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(root, version)
+    os.makedirs(os.path.join(path, "columns"))
+    os.makedirs(os.path.join(path, "hashes"))
+
+    vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1) if len(ids) else np.zeros((0, 0))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True) if len(ids) else 1.0
+    vectors = (vectors / np.where(norms == 0, 1, norms)).astype(dtype)
+    rows = base.count if base else 0
+    if rows:
+        vectors = np.concatenate([base.vectors.astype(dtype, copy=False), vectors]) if len(ids) else \
+            np.asarray(base.vectors, dtype=dtype)
+    np.save(os.path.join(path, "vectors.npy"), vectors)
+
+    offsets = [int(base.offsets[-1]) if rows else 0]
+    with open(os.path.join(path, "records.jsonl"), "wb") as f:
+        if rows:
+            f.write(memoryview(base._records[:offsets[0]]))
+        for i, (id_, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+            record = {"id": id_, "text": text, "metadata": metadata, **(extra[i] if extra else {})}
+            line = json.dumps(record).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    offsets = np.asarray(offsets, dtype=np.int64)
+    np.save(os.path.join(path, "offsets.npy"), np.concatenate([base.offsets[:-1], offsets]) if rows else offsets)
+
+    columns, hashed = {}, []
+    # Shared hashes are only known if the base snapshot tracked them too.
+    shared = {} if base is None or base.shared is not None else None
+    keys = sorted({key for metadata in metadatas for key in metadata}
+                  | (set(base.columns) | set(base.hashed) if base else set()))
+    for key in keys:
+        if key in DICTIONARY_KEYS:
+            vocab = list(base.columns[key][1]) if base and key in base.columns else []
+            lookup = {value: code for code, value in enumerate(vocab)}
+            codes = np.full(len(ids), -1, dtype=np.int32)
+            for row, metadata in enumerate(metadatas):
+                value = metadata.get(key)
+                if value is None:
+                    continue
+                if value not in lookup:
+                    lookup[value] = len(vocab)
+                    vocab.append(value)
+                codes[row] = lookup[value]
+            if rows:
+                base_codes = base.columns[key][0] if key in base.columns else np.full(rows, -1, dtype=np.int32)
+                codes = np.concatenate([base_codes, codes])
+            np.save(os.path.join(path, "columns", f"{len(columns)}.npy"), codes)
+            columns[key] = vocab
+        else:
+            # 0 marks a missing value; a real value hashing to 0 makes 0 a shared hash.
+            hashes = np.fromiter((_value_hash(metadata[key]) if metadata.get(key) is not None else 0
+                                  for metadata in metadatas), dtype=np.int64, count=len(ids))
+            base_hashes = base.hashed[key] if rows and key in base.hashed else np.zeros(rows, dtype=np.int64)
+            if shared is not None:
+                shared[key] = _shared_hashes(key, metadatas, hashes, base_hashes, base)
+            np.save(os.path.join(path, "hashes", f"{len(hashed)}.npy"),
+                    np.concatenate([base_hashes, hashes]) if rows else hashes)
+            hashed.append(key)
+
+    manifest = {"count": rows + len(ids), "dim": int(vectors.shape[1]) if vectors.size else 0,
+                "dtype": dtype, "columns": columns, "hashed": hashed}
+    if shared is not None:
+        manifest["shared"] = shared
+    with open(os.path.join(path, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    previous = _read_current(root)
+    tmp = os.path.join(root, f"CURRENT.{version}")
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(root, "CURRENT"))
+    if previous:
+        # Open readers keep their mappings; the files are freed when they move on.
+        shutil.rmtree(os.path.join(root, previous), ignore_errors=True)
+    return version
+
+
+@contextmanager
+def snapshot_lock(root: str):
+    """Exclusive lock across processes, so only one worker builds the snapshot."""
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _shared_hashes(key: str, metadatas: Sequence[Dict[str, Any]], hashes: np.ndarray, base_hashes: np.ndarray,
+                   base: Optional[_Snapshot]) -> List[int]:
+    """
+    Hashes of `key` that more than one value maps to once the new rows are added.
+
+    New values are compared with each other and, for hashes the base rows
+    already have, with one base record per hash; the other base records
+    aren't decoded.
+    """
+    shared = set(base.shared.get(key, ())) if base is not None else set()
+    values = {}
+    for metadata, value_hash in zip(metadatas, hashes.tolist()):
+        value = metadata.get(key)
+        if value is None:
+            continue
+        value = json.dumps(value)
+        if value_hash == 0 or values.setdefault(value_hash, value) != value:
+            shared.add(value_hash)
+    if values and base_hashes.size:
+        unique, first = np.unique(base_hashes, return_index=True)
+        known = np.isin(np.fromiter(values, dtype=np.int64, count=len(values)), unique)
+        for value_hash in np.fromiter(values, dtype=np.int64, count=len(values))[known].tolist():
+            row = int(first[np.searchsorted(unique, value_hash)])
+            if json.dumps(base.record(row)["metadata"].get(key)) != values[value_hash]:
+                shared.add(value_hash)
+    return sorted(shared)
+
+
+def _value_hash(value: Any) -> int:
+    """Stable 64-bit hash of a metadata value (its JSON form, so 1, "1" and True differ)."""
+    return int.from_bytes(hashlib.blake2b(json.dumps(value).encode("utf-8"), digest_size=8).digest(), "little",
+                          signed=True)
+
+
+def _read_current(root: str) -> Optional[str]:
+    try:
+        with open(os.path.join(root, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,118 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from llama_index.core.schema import BaseNode, TextNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from pydantic import PrivateAttr
+
+from vector_engine import MemmapVectorIndex, snapshot_lock, write_snapshot
+
+
+# llama_index filter operators the engine supports, as Chroma-style `where` operators.
+OPERATORS = {
+    FilterOperator.EQ: "$eq",
+    FilterOperator.NE: "$ne",
+    FilterOperator.IN: "$in",
+    FilterOperator.NIN: "$nin",
+}
+
+
+class MemmapVectorStore(BasePydanticVectorStore):
+    """
+    llama_index vector store backed by a MemmapVectorIndex snapshot.
+
+    Drop-in for ChromaVectorStore in `retriver.initialize_index`. `add`
+    writes a new snapshot with the nodes appended to the current one's rows,
+    which are copied in bulk; queries run against the memory-mapped arrays of
+    the current snapshot (picking up one another worker published) with
+    metadata filters applied as a mask.
+    """
+
+    stores_text: bool = True
+    root: str
+    dtype: str = "float32"
+
+    _index: MemmapVectorIndex = PrivateAttr()
+
+    def __init__(self, root: str, dtype: str = "float32", **kwargs: Any):
+        super().__init__(root=root, dtype=dtype, **kwargs)
+        self._index = MemmapVectorIndex(root)
+
+    @property
+    def client(self) -> MemmapVectorIndex:
+        return self._index
+
+    def count(self) -> int:
+        self._index.reload()
+        return self._index.count
+
+    def build_lock(self):
+        return snapshot_lock(self.root)
+
+    def add(self, nodes: Sequence[BaseNode], **kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        write_snapshot(
+            self.root,
+            ids=[node.node_id for node in nodes],
+            embeddings=[node.get_embedding() for node in nodes],
+            texts=[node.get_content() for node in nodes],
+            metadatas=[_flat_metadata(node.metadata) for node in nodes],
+            dtype=self.dtype,
+            extra=[{"ref_doc_id": node.ref_doc_id} for node in nodes],
+            base=self._index.snapshot(),
+        )
+        self._index.reload()
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        snapshot = self._index.snapshot()
+        if snapshot is None:
+            return
+        keep = [(row, r) for row, r in enumerate(snapshot.records()) if r.get("ref_doc_id") != ref_doc_id]
+        if len(keep) == snapshot.count:
+            return
+        write_snapshot(
+            self.root,
+            ids=[r["id"] for _, r in keep],
+            embeddings=[snapshot.vectors[row] for row, _ in keep],
+            texts=[r["text"] for _, r in keep],
+            metadatas=[r["metadata"] for _, r in keep],
+            dtype=self.dtype,
+            extra=[{"ref_doc_id": r.get("ref_doc_id")} for _, r in keep],
+        )
+        self._index.reload()
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        records, scores = self._index.query_records(
+            query.query_embedding, query.similarity_top_k, _to_where(query.filters) if query.filters else None
+        )
+        nodes, ids = [], []
+        for record in records:
+            nodes.append(TextNode(id_=record["id"], text=record["text"], metadata=record["metadata"]))
+            ids.append(record["id"])
+        return VectorStoreQueryResult(nodes=nodes, similarities=[float(s) for s in scores], ids=ids)
+
+
+def _flat_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in metadata.items() if isinstance(v, (str, int, float, bool))}
+
+
+def _to_where(filters: MetadataFilters) -> Optional[Dict[str, Any]]:
+    clauses = []
+    for f in filters.filters:
+        if isinstance(f, MetadataFilters):
+            clauses.append(_to_where(f))
+        elif f.operator in OPERATORS:
+            clauses.append({f.key: {OPERATORS[f.operator]: f.value}})
+        else:
+            raise ValueError(f"Unsupported filter operator for the NumPy vector store: {f.operator}")
+    if len(clauses) == 1:
+        return clauses[0]
+    condition = "$or" if str(getattr(filters.condition, "value", filters.condition)).lower() == "or" else "$and"
+    return {condition: clauses}
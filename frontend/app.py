@@ -15,12 +15,17 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Load CSS styles
-with open("styles/theme.css") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+@st.cache_resource
+def load_styles():
+    """Read the CSS files once per server process."""
+    css = []
+    for path in ("styles/theme.css", "styles/chat.css"):
+        with open(path) as f:
+            css.append(f.read())
+    return f"<style>{''.join(css)}</style>"
 
-with open("styles/chat.css") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+# Load CSS styles
+st.markdown(load_styles(), unsafe_allow_html=True)
 
 # Initialize session state
 if "messages" not in st.session_state:
@@ -37,7 +42,8 @@ if "pending_input" not in st.session_state:
     st.session_state.pending_input = None
 
 # Render components
-render_sidebar()
+with st.sidebar:
+    render_sidebar()
 
 # Main content
 st.markdown('<h1 class="main-header">🎉 Party Planning Assistant</h1>', unsafe_allow_html=True)
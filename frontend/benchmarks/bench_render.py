@@ -0,0 +1,54 @@
+"""
+Measure Streamlit rerun time with long chat histories.
+
+Run from the frontend directory:
+    python benchmarks/bench_render.py
+
+Reports the full-app rerun time and the chat fragment's own render time
+(`chat_render_ms`) for several history sizes.
+"""
+import sys
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+FRONTEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(FRONTEND_DIR))
+
+
+def make_messages(count: int):
+    roles = ["user", "assistant", "tool"]
+    return [
+        {
+            "role": roles[i % 3],
+            "content": f"Message {i}: " + "Who should I invite to the birthday party? " * 5,
+            "timestamp": "12:00:00",
+            "tool_name": "retrieval",
+        }
+        for i in range(count)
+    ]
+
+
+def bench(count: int, reruns: int = 5):
+    app = AppTest.from_file(str(FRONTEND_DIR / "app.py"), default_timeout=60)
+    app.run()
+    app.session_state.messages = make_messages(count)
+
+    timings, chat_ms = [], []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        timings.append((time.perf_counter() - start) * 1000)
+        chat_ms.append(app.session_state.chat_render_ms)
+    timings.sort()
+    chat_ms.sort()
+    print(f"{count:>6} messages | rerun median {timings[len(timings) // 2]:8.1f} ms | "
+          f"chat fragment median {chat_ms[len(chat_ms) // 2]:6.1f} ms")
+
+
+if __name__ == "__main__":
+    import os
+    os.chdir(FRONTEND_DIR)
+    for count in (10, 500, 2000):
+        bench(count)
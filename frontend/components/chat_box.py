@@ -1,19 +1,42 @@
 import streamlit as st
 import requests
+import time
 from datetime import datetime
-from config import AI_SERVICE_URL
+from functools import lru_cache
+from config import AI_SERVICE_URL, JOB_POLL_INTERVAL, JOB_MAX_WAIT, CHAT_WINDOW_SIZE
 
 
+def wait_for_job(job: dict, max_wait: int = JOB_MAX_WAIT):
+    """Poll a background job until it finishes and return its result."""
+    deadline = time.time() + max_wait
+    while job["status"] in ("queued", "running"):
+        if time.time() > deadline:
+            requests.post(f"{AI_SERVICE_URL}/chat/jobs/{job['job_id']}/cancel", timeout=5)
+            return {"error": "Request timed out. Please try again."}
+        time.sleep(JOB_POLL_INTERVAL)
+        response = requests.get(f"{AI_SERVICE_URL}/chat/jobs/{job['job_id']}", timeout=5)
+        if response.status_code != 200:
+            return {"error": f"API error: {response.status_code}"}
+        job = response.json()
+
+    if job["status"] == "completed":
+        return job["result"]
+    if job["status"] == "cancelled":
+        return {"error": "Request was cancelled"}
+    return {"error": job.get("error") or "Request failed"}
+
 def send_chat_message(message: str, thread_id: str):
-    """Send a message to the FastAPI backend."""
+    """Send a message to the FastAPI backend as a background job and wait for the result."""
     try:
         response = requests.post(
-            f"{AI_SERVICE_URL}/chat",
+            f"{AI_SERVICE_URL}/chat/jobs",
             json={"message": message, "thread_id": thread_id},
-            timeout=30
+            timeout=10
         )
-        if response.status_code == 200:
-            return response.json()
+        if response.status_code == 202:
+            return wait_for_job(response.json())
+        elif response.status_code == 429:
+            return {"error": response.json().get("detail", "Too many requests")}
         else:
             return {"error": f"API error: {response.status_code}"}
     except requests.exceptions.Timeout:
@@ -21,39 +44,64 @@ def send_chat_message(message: str, thread_id: str):
     except Exception as e:
         return {"error": f"Connection error: {str(e)}"}
 
+@lru_cache(maxsize=4096)
+def render_message_html(role: str, content: str, timestamp: str, tool_name: str = "Unknown") -> str:
+    """Build the HTML block for one chat message (cached, messages never change once added)."""
+    if role == "user":
+        return f"""
+        <div class="chat-message user-message">
+            <strong>👤 You ({timestamp}):</strong><br>
+            {content}
+        </div>
+        """
+    elif role == "assistant":
+        return f"""
+        <div class="chat-message assistant-message">
+            <strong>🤖 Assistant ({timestamp}):</strong><br>
+            {content}
+        </div>
+        """
+    elif role == "tool":
+        return f"""
+        <div class="chat-message tool-message">
+            <strong>🔧 Tool: {tool_name} ({timestamp}):</strong><br>
+            {content[:200]}{"..." if len(content) > 200 else ""}
+        </div>
+        """
+    return ""
+
+def load_older_messages():
+    """Widen the chat window by one page."""
+    st.session_state.chat_window += CHAT_WINDOW_SIZE
+
+def render_messages():
+    """Render the visible tail of the conversation, with on-demand loading of older messages."""
+    if "chat_window" not in st.session_state:
+        st.session_state.chat_window = CHAT_WINDOW_SIZE
+
+    messages = st.session_state.messages
+    hidden = max(0, len(messages) - st.session_state.chat_window)
+    if hidden:
+        st.button(f"⬆️ Load older messages ({hidden} hidden)", on_click=load_older_messages)
+
+    # One markdown element for the whole window instead of one per message
+    html = "".join(
+        render_message_html(m["role"], m["content"], m.get("timestamp", ""), m.get("tool_name", "Unknown"))
+        for m in messages[hidden:]
+    )
+    if html:
+        st.markdown(html, unsafe_allow_html=True)
+
+@st.fragment
 def render_chat_box():
-    """Render the chat interface."""
+    """Render the chat interface. Runs as a fragment so chatting doesn't rerun the rest of the page."""
+    started = time.perf_counter()
     st.markdown("## 💬 Chat with Your Party Assistant")
 
     # Display chat messages
-    chat_container = st.container()
-    with chat_container:
-        for message in st.session_state.messages:
-            role = message["role"]
-            content = message["content"]
-            timestamp = message.get("timestamp", "")
-            
-            if role == "user":
-                st.markdown(f"""
-                <div class="chat-message user-message">
-                    <strong>👤 You ({timestamp}):</strong><br>
-                    {content}
-                </div>
-                """, unsafe_allow_html=True)
-            elif role == "assistant":
-                st.markdown(f"""
-                <div class="chat-message assistant-message">
-                    <strong>🤖 Assistant ({timestamp}):</strong><br>
-                    {content}
-                </div>
-                """, unsafe_allow_html=True)
-            elif role == "tool":
-                st.markdown(f"""
-                <div class="chat-message tool-message">
-                    <strong>🔧 Tool: {message.get('tool_name', 'Unknown')} ({timestamp}):</strong><br>
-                    {content[:200]}{"..." if len(content) > 200 else ""}
-                </div>
-                """, unsafe_allow_html=True)
+    with st.container():
+        render_messages()
+    st.session_state.chat_render_ms = (time.perf_counter() - started) * 1000
 
     # Chat input
     if not st.session_state.waiting_for_human:
@@ -95,8 +143,10 @@ def render_chat_box():
                         "timestamp": datetime.now().strftime("%H:%M:%S")
                     })
             
-            # Refresh to show complete conversation
-            st.rerun()
+            # Refresh to show complete conversation; the interrupt box needs a full rerun
+            if st.session_state.waiting_for_human:
+                st.rerun()
+            st.rerun(scope="fragment")
 
     # Handle example processing
     if "example_processing" in st.session_state and st.session_state.example_processing:
@@ -1,6 +1,7 @@
 import streamlit as st
 from datetime import datetime
 
+@st.fragment
 def render_example_prompts():
     """Render example prompts section."""
     st.markdown("## 💡 Example Prompts")
@@ -1,5 +1,6 @@
 import streamlit as st
 
+@st.fragment
 def render_feature_highlights():
     """Render feature highlights section."""
     col1, col2, col3 = st.columns(3)
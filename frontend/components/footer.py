@@ -30,6 +30,13 @@ def render_footer():
         **API Endpoints:**
         - `POST /chat`: Send messages to chatbot
         - `POST /resume`: Resume interrupted conversations  
+        - `POST /chat/batch`: Run many turns concurrently (JSONL stream)
+        - `POST /chat/jobs`: Run a chat turn in the background
+        - `GET /chat/jobs/{job_id}`: Poll a background job
         - `GET /conversation/{thread_id}`: Get conversation history
+        - `GET /threads`: List recent threads
+        - `GET /interrupts`: Pending human-input requests (`/interrupts/stream` for SSE)
+        - `POST /interrupts/resume`: Answer many interrupts at once
         - `GET /status/{thread_id}`: Check thread status
+        - `GET /admin/profiles`: Recent request profiles (folded stacks per id)
         """)
\ No newline at end of file
@@ -2,17 +2,20 @@ import streamlit as st
 import requests
 import time
 from config import AI_SERVICE_URL
+from components.chat_box import wait_for_job
 
 def resume_conversation(response_data: str, thread_id: str):
     """Resume conversation after interruption."""
     try:
         response = requests.post(
-            f"{AI_SERVICE_URL}/resume",
+            f"{AI_SERVICE_URL}/resume/jobs",
             json={"response_data": response_data, "thread_id": thread_id},
-            timeout=30
+            timeout=10
         )
-        if response.status_code == 200:
-            return response.json()
+        if response.status_code == 202:
+            return wait_for_job(response.json())
+        elif response.status_code == 429:
+            return {"error": response.json().get("detail", "Too many requests")}
         else:
             return {"error": f"API error: {response.status_code}"}
     except Exception as e:
@@ -28,15 +31,20 @@ def check_thread_status(thread_id: str):
     except:
         return {"waiting_for_input": False}
 
+@st.fragment
 def render_interrupt_box():
     """Render the human-in-the-loop interface."""
     # Check for interruption status
     try:
         thread_status = check_thread_status(st.session_state.current_thread)
         is_interrupted = thread_status.get("waiting_for_input", False)
-        if is_interrupted and not st.session_state.waiting_for_human:
+        if is_interrupted:
             st.session_state.waiting_for_human = True
-            st.session_state.interrupt_query = "Human assistance requested for complex decision"
+            st.session_state.interrupt_query = (
+                thread_status.get("query")
+                or st.session_state.get("interrupt_query")
+                or "Human assistance requested for complex decision"
+            )
     except Exception:
         is_interrupted = False
 
@@ -1 +1,11 @@
-AI_SERVICE_URL = "http://ai-service:8000"
\ No newline at end of file
+AI_SERVICE_URL = "http://ai-service:8000"
+
+# Background job polling for /chat/jobs
+JOB_POLL_INTERVAL = 1.0
+JOB_MAX_WAIT = 300
+
+# Number of most recent chat messages rendered; older ones load on demand
+CHAT_WINDOW_SIZE = 30
+
+# Seconds the sidebar's backend health check result is reused
+HEALTH_CHECK_TTL = 15